@@ -0,0 +1 @@
+# Benchmarks for Fastest Finger First
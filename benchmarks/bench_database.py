@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Benchmark database cho Fastest Finger First
+So sánh thông lượng giữa mở kết nối mỗi lần gọi (cách cũ) và kết nối lâu dài
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import tempfile
+from pathlib import Path
+
+# Thêm thư mục gốc vào path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from server.database import GameDatabase
+from server.storage import MemoryStorage
+
+def legacy_add_player(db_file: str, username: str):
+    """Thêm người chơi theo cách cũ: mở kết nối mới cho mỗi lần gọi"""
+    with sqlite3.connect(db_file) as conn:
+        cursor = conn.cursor()
+        cursor.execute("INSERT OR IGNORE INTO players (username) VALUES (?)", (username,))
+        conn.commit()
+
+def legacy_save_question_result(db_file: str, game_id: int, player_answers: dict):
+    """Lưu kết quả câu hỏi theo cách cũ"""
+    with sqlite3.connect(db_file) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO used_questions (game_id, question_text, correct_answer, player_answers) "
+            "VALUES (?, ?, ?, ?)",
+            (game_id, "1 + 1 = ?", "B", json.dumps(player_answers))
+        )
+        conn.commit()
+
+def legacy_save_game_result(db_file: str, game_id: int, player_results: list):
+    """Lưu kết quả trận theo cách cũ: hai câu lệnh cho mỗi người chơi"""
+    with sqlite3.connect(db_file) as conn:
+        cursor = conn.cursor()
+        for result in player_results:
+            cursor.execute(
+                "INSERT INTO game_details (game_id, player_username, score, correct_answers, "
+                "wrong_answers, average_response_time) VALUES (?, ?, ?, ?, ?, ?)",
+                (game_id, result['username'], result['score'], result['correct_answers'],
+                 result['wrong_answers'], result['average_response_time'])
+            )
+            cursor.execute(
+                "UPDATE players SET total_games = total_games + 1, total_score = total_score + ?, "
+                "best_score = CASE WHEN ? > best_score THEN ? ELSE best_score END WHERE username = ?",
+                (result['score'], result['score'], result['score'], result['username'])
+            )
+        conn.commit()
+
+def _timed(label: str, count: int, func):
+    """Đo thời gian chạy và in số thao tác mỗi giây"""
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<44} {count:>7} ops  {elapsed:8.3f}s  {count / elapsed:10.0f} ops/s")
+    return elapsed
+
+def bench_joins_and_questions(count: int):
+    """So sánh add_player và save_question_result trước/sau"""
+    player_answers = {f"Player{i}": {'answer': 'A', 'response_time': 1.5} for i in range(10)}
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        legacy_file = os.path.join(tmp_dir, 'legacy.db')
+        GameDatabase(legacy_file).close()
+        # Cơ sở dữ liệu cũ dùng journal mặc định
+        with sqlite3.connect(legacy_file) as conn:
+            conn.execute("PRAGMA journal_mode = DELETE")
+        
+        before_join = _timed("add_player (connection per call)", count,
+                             lambda: [legacy_add_player(legacy_file, f"user{i}") for i in range(count)])
+        before_question = _timed("save_question_result (connection per call)", count,
+                                 lambda: [legacy_save_question_result(legacy_file, 1, player_answers)
+                                          for _ in range(count)])
+        
+        database = GameDatabase(os.path.join(tmp_dir, 'persistent.db'))
+        after_join = _timed("add_player (persistent WAL)", count,
+                            lambda: [database.add_player(f"user{i}") for i in range(count)])
+        after_question = _timed("save_question_result (persistent WAL)", count,
+                                lambda: [database.save_question_result(1, "1 + 1 = ?", "B", player_answers)
+                                         for _ in range(count)])
+        database.close()
+    
+    print(f"Speedup add_player: {before_join / after_join:.1f}x, "
+          f"save_question_result: {before_question / after_question:.1f}x")
+
+def bench_game_end(room_sizes):
+    """Đo độ trễ lưu kết quả cuối trận theo số người chơi trong phòng"""
+    print(f"{'players':>8} {'per-row loop (s)':>18} {'batched SQL (s)':>16} {'with leaderboard (s)':>21} {'memory backend (s)':>19}")
+    
+    for room_size in room_sizes:
+        player_results = [
+            {'username': f"user{i}", 'score': i % 150, 'correct_answers': i % 10,
+             'wrong_answers': 0, 'average_response_time': 1.5}
+            for i in range(room_size)
+        ]
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            legacy_file = os.path.join(tmp_dir, 'legacy.db')
+            database = GameDatabase(legacy_file)
+            for result in player_results:
+                database.add_player(result['username'])
+            database.close()
+            
+            start = time.perf_counter()
+            legacy_save_game_result(legacy_file, 1, player_results)
+            legacy_elapsed = time.perf_counter() - start
+            
+            database = GameDatabase(os.path.join(tmp_dir, 'batched.db'))
+            for result in player_results:
+                database.add_player(result['username'])
+            start = time.perf_counter()
+            database.write_game_result(1, player_results)
+            batched_elapsed = time.perf_counter() - start
+            
+            # Trận thứ hai: lưu đầy đủ gồm cả bảng xếp hạng và cache
+            start = time.perf_counter()
+            database.save_game_result(2, player_results)
+            full_elapsed = time.perf_counter() - start
+            database.close()
+        
+        # Cùng thao tác trên backend bộ nhớ: phần chênh lệch là chi phí ghi xuống SQLite
+        memory = MemoryStorage(snapshot_file=None)
+        for result in player_results:
+            memory.add_player(result['username'])
+        memory.save_game_result(1, player_results)
+        start = time.perf_counter()
+        memory.save_game_result(2, player_results)
+        memory_elapsed = time.perf_counter() - start
+        
+        print(f"{room_size:>8} {legacy_elapsed:>18.4f} {batched_elapsed:>16.4f} {full_elapsed:>21.4f} "
+              f"{memory_elapsed:>19.4f}")
+
+def main():
+    """Chạy benchmark"""
+    parser = argparse.ArgumentParser(description='Database benchmark')
+    parser.add_argument('--count', '-n', type=int, default=2000, help='Operations per case')
+    parser.add_argument('--room-sizes', type=int, nargs='+', default=[10, 100, 1000, 10000],
+                        help='Room sizes for the end-of-game benchmark')
+    args = parser.parse_args()
+    
+    bench_joins_and_questions(args.count)
+    print()
+    bench_game_end(args.room_sizes)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""
+Client asyncio cho Fastest Finger First
+Cùng giao thức với client/network.py (JSON mỗi dòng) nhưng không dùng thread
+hay callback UI, để chạy hàng trăm phiên trong một process (load test, bot,
+tích hợp overlay)
+"""
+
+import json
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, AsyncIterator, Dict, List, Optional
+from client.config import SERVER_HOST, SERVER_PORT, ENCODING, DELIMITER, DISPATCH_QUEUE_SIZE, MessageType
+
+# Độ dài tối đa một message (byte)
+MAX_FRAME_SIZE = 1024 * 1024
+
+class ServerError(Exception):
+    """Server trả về message lỗi"""
+    pass
+
+class AsyncGameClient:
+    """Một phiên chơi trên asyncio
+    
+    Các message nhận được vừa cập nhật trạng thái (câu hỏi hiện tại, bảng xếp
+    hạng, resume token), vừa được đưa vào hàng đợi sự kiện để đọc bằng
+    `async for message in client`. Hàng đợi có giới hạn: khi đầy, sự kiện cũ
+    nhất bị bỏ để phiên không đọc sự kiện (vd. bot) không làm nghẽn socket.
+    """
+    
+    def __init__(self, username: str, host: str = SERVER_HOST, port: int = SERVER_PORT,
+                 max_events: int = DISPATCH_QUEUE_SIZE):
+        self.username = username
+        self.host = host
+        self.port = port
+        self.logger = logging.getLogger(__name__)
+        
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self._read_task: Optional[asyncio.Task] = None
+        self.is_connected = False
+        
+        # Trạng thái phiên
+        self.resume_token = None
+        self.last_score_seq = 0
+        self.current_question: Optional[Dict] = None
+        self.question_received_at: Optional[float] = None  # time.perf_counter() lúc nhận câu hỏi
+        self.leaderboard: List[Dict] = []
+        self.final_results: Optional[Dict] = None
+        self._answer_seq = 0
+        self._last_question_id = 0
+        
+        # Người chờ theo loại message và theo answer_id
+        self._waiters: Dict[str, List[asyncio.Future]] = {}
+        self._answer_waiters: Dict[int, asyncio.Future] = {}
+        
+        # Hàng đợi sự kiện cho async iterator
+        self._events = deque(maxlen=max_events)
+        self._events_changed: Optional[asyncio.Event] = None
+        self.dropped_events = 0
+    
+    async def __aenter__(self) -> 'AsyncGameClient':
+        await self.connect()
+        return self
+    
+    async def __aexit__(self, *exc):
+        await self.close()
+    
+    async def connect(self, timeout: Optional[float] = None) -> Dict:
+        """Mở kết nối và đăng nhập bằng username (hoặc resume token nếu có)"""
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, limit=MAX_FRAME_SIZE), timeout
+        )
+        self.is_connected = True
+        self._events_changed = asyncio.Event()
+        self._read_task = asyncio.create_task(self._read_loop())
+        
+        data = {'username': self.username}
+        if self.resume_token:
+            data.update(resume_token=self.resume_token, last_seq=self.last_score_seq)
+        return await self.request(MessageType.CONNECT, data, timeout=timeout)
+    
+    async def join(self, timeout: Optional[float] = None) -> Dict:
+        """Tham gia phòng chơi"""
+        return await self.request(MessageType.JOIN_ROOM, {}, timeout=timeout)
+    
+    async def wait_question(self, timeout: Optional[float] = None) -> Dict:
+        """Chờ câu hỏi tiếp theo (câu chưa được trả về bởi lần gọi trước)"""
+        question = self.current_question
+        if question is None or question.get('question_id', 0) <= self._last_question_id:
+            question = await self.wait_for(MessageType.QUESTION, timeout)
+        self._last_question_id = question.get('question_id', self._last_question_id + 1)
+        return question
+    
+    async def submit_answer(self, answer: str, timeout: Optional[float] = None) -> Dict:
+        """Gửi đáp án cho câu hỏi hiện tại và chờ xác nhận (có received_at của server)"""
+        self._answer_seq += 1
+        answer_id = self._answer_seq
+        future = asyncio.get_running_loop().create_future()
+        self._answer_waiters[answer_id] = future
+        
+        try:
+            await self.send(MessageType.ANSWER, {
+                'answer': answer,
+                'question_id': (self.current_question or {}).get('question_id'),
+                'answer_id': answer_id
+            })
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._answer_waiters.pop(answer_id, None)
+    
+    async def request(self, message_type: str, data: Dict, timeout: Optional[float] = None) -> Dict:
+        """Gửi message và chờ message trả lời cùng loại (ERROR thì báo ServerError)"""
+        future = self._add_waiter(message_type)
+        try:
+            await self.send(message_type, data)
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._remove_waiter(message_type, future)
+    
+    async def wait_for(self, message_type: str, timeout: Optional[float] = None) -> Dict:
+        """Chờ message tiếp theo thuộc một loại"""
+        future = self._add_waiter(message_type)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._remove_waiter(message_type, future)
+    
+    async def send(self, message_type: str, data: Dict[str, Any] = None):
+        """Gửi message đến server"""
+        if not self.is_connected:
+            raise ConnectionError("Not connected to server")
+        
+        message = {
+            'type': message_type,
+            'data': data or {},
+            'timestamp': time.time()
+        }
+        self.writer.write((json.dumps(message, ensure_ascii=False) + DELIMITER).encode(ENCODING))
+        await self.writer.drain()
+    
+    async def close(self):
+        """Đóng kết nối"""
+        self.is_connected = False
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+        if self._read_task is not None and self._read_task is not asyncio.current_task():
+            self._read_task.cancel()
+            try:
+                await self._read_task
+            except asyncio.CancelledError:
+                pass
+        self._fail_waiters(ConnectionError("Connection closed"))
+    
+    def __aiter__(self) -> AsyncIterator[Dict]:
+        return self.events()
+    
+    async def events(self) -> AsyncIterator[Dict]:
+        """Các message nhận được ({'type', 'data', 'timestamp'}), dừng khi mất kết nối"""
+        while True:
+            while self._events:
+                yield self._events.popleft()
+            if not self.is_connected:
+                return
+            self._events_changed.clear()
+            await self._events_changed.wait()
+    
+    def _add_waiter(self, message_type: str) -> asyncio.Future:
+        """Đăng ký chờ một loại message"""
+        if not self.is_connected:
+            raise ConnectionError("Not connected to server")
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(message_type, []).append(future)
+        return future
+    
+    def _remove_waiter(self, message_type: str, future: asyncio.Future):
+        """Hủy đăng ký chờ"""
+        waiters = self._waiters.get(message_type)
+        if waiters and future in waiters:
+            waiters.remove(future)
+    
+    def _fail_waiters(self, error: Exception):
+        """Báo lỗi cho tất cả người đang chờ"""
+        for future in [f for waiters in self._waiters.values() for f in waiters] + list(self._answer_waiters.values()):
+            if not future.done():
+                future.set_exception(error)
+        self._waiters.clear()
+    
+    async def _read_loop(self):
+        """Đọc và xử lý message từ server"""
+        delimiter = DELIMITER.encode(ENCODING)
+        try:
+            while True:
+                frame = await self.reader.readuntil(delimiter)
+                if frame.strip():
+                    self._handle_frame(frame)
+        except (asyncio.IncompleteReadError, ConnectionError, OSError) as e:
+            self.logger.info(f"Connection to server closed: {e}")
+        except asyncio.LimitOverrunError as e:
+            self.logger.error(f"Message too large: {e}")
+        finally:
+            self.is_connected = False
+            self._fail_waiters(ConnectionError("Connection lost"))
+            if self._events_changed is not None:
+                self._events_changed.set()
+    
+    def _handle_frame(self, frame: bytes):
+        """Giải mã message, cập nhật trạng thái và báo cho người chờ"""
+        try:
+            message = json.loads(frame.decode(ENCODING))
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            self.logger.error(f"Invalid JSON message: {e}")
+            return
+        
+        message_type = message.get('type')
+        data = message.get('data', {})
+        
+        if message_type == MessageType.SCORE_UPDATE:
+            # Bỏ qua bản cập nhật đã nhận (được phát lại khi resume)
+            seq = data.get('seq')
+            if seq is not None:
+                if seq <= self.last_score_seq:
+                    return
+                self.last_score_seq = seq
+        self._update_state(message_type, data)
+        
+        if message_type == MessageType.ERROR:
+            self._resolve_error(data)
+        elif message_type == MessageType.ANSWER and data.get('answer_id') in self._answer_waiters:
+            future = self._answer_waiters.pop(data['answer_id'])
+            if not future.done():
+                future.set_result(data)
+        
+        for future in self._waiters.pop(message_type, []):
+            if not future.done():
+                future.set_result(data)
+        
+        if len(self._events) == self._events.maxlen:
+            self.dropped_events += 1
+        self._events.append(message)
+        self._events_changed.set()
+    
+    def _update_state(self, message_type: str, data: Dict):
+        """Cập nhật trạng thái phiên từ message"""
+        if message_type == MessageType.CONNECT and data.get('resume_token'):
+            if not data.get('resumed'):
+                self.last_score_seq = 0
+            self.resume_token = data['resume_token']
+        elif message_type == MessageType.QUESTION:
+            self.current_question = data
+            self.question_received_at = time.perf_counter()
+        elif message_type in (MessageType.SCORE_UPDATE, MessageType.LEADERBOARD, MessageType.INFO):
+            self.leaderboard = data.get('leaderboard') or self.leaderboard
+        elif message_type == MessageType.GAME_END:
+            self.final_results = data.get('final_results', {})
+            self.leaderboard = data.get('leaderboard', self.leaderboard)
+            self.current_question = None
+    
+    def _resolve_error(self, data: Dict):
+        """Chuyển message lỗi thành ServerError cho người đang chờ tương ứng"""
+        error = ServerError(data.get('message', 'Unknown error'))
+        answer_id = data.get('answer_id')
+        if answer_id is not None:
+            future = self._answer_waiters.pop(answer_id, None)
+            if future is not None and not future.done():
+                future.set_exception(error)
+            return
+        
+        # Lỗi không gắn với đáp án là trả lời cho request đang chờ (CONNECT, JOIN_ROOM...)
+        for message_type in (MessageType.CONNECT, MessageType.JOIN_ROOM):
+            for future in self._waiters.pop(message_type, []):
+                if not future.done():
+                    future.set_exception(error)
@@ -3,50 +3,75 @@ Client chính cho Fastest Finger First
 Kết hợp ViewModel và UI để tạo ứng dụng hoàn chỉnh
 """
 
+import time
+
+# Mốc thời gian cho --profile-startup, lấy trước khi import các module còn lại
+_MODULE_STARTED_AT = time.perf_counter()
+
 import sys
 import logging
 import threading
-import time
-import os
-from pathlib import Path
-from typing import Optional
-
-# Add the project root to Python path for proper imports
-project_root = Path(__file__).parent.parent
-if str(project_root) not in sys.path:
-    sys.path.insert(0, str(project_root))
+from typing import List, Optional, Tuple
 
 from client.view_model import GameViewModel
-from client.config import UI_TYPE, REFRESH_RATE
+from client.config import UI_TYPE, REFRESH_RATE, ClientState
+
+_MODULE_IMPORTED_AT = time.perf_counter()
+
+class StartupProfile:
+    """Thời điểm các bước khởi động client (bật bằng --profile-startup)"""
+    
+    def __init__(self):
+        self.started_at = _MODULE_STARTED_AT
+        self.marks: List[Tuple[str, float]] = [('import client', _MODULE_IMPORTED_AT)]
+        self.reported = False
+        self.lock = threading.Lock()  # Mốc 'connected' được ghi từ thread điều phối
+    
+    def mark(self, name: str):
+        """Ghi lại thời điểm kết thúc một bước"""
+        self.marks.append((name, time.perf_counter()))
+    
+    def elapsed_ms(self, name: str) -> Optional[float]:
+        """Thời gian từ lúc import client đến khi kết thúc bước `name` (ms)"""
+        for mark_name, at in self.marks:
+            if mark_name == name:
+                return (at - self.started_at) * 1000
+        return None
+    
+    def report(self) -> str:
+        """Bảng thời gian từng bước và tổng thời gian tích lũy"""
+        lines = []
+        previous = self.started_at
+        for name, at in self.marks:
+            lines.append(f"startup: {name:<16} +{(at - previous) * 1000:8.1f} ms  (total {(at - self.started_at) * 1000:8.1f} ms)")
+            previous = at
+        return "\n".join(lines)
 
 class GameClient:
     """Client chính quản lý game"""
     
-    def __init__(self, ui_type: str = UI_TYPE):
+    def __init__(self, ui_type: str = UI_TYPE, host: str = None, port: int = None,
+                 profile: Optional[StartupProfile] = None):
         self.view_model = GameViewModel()
         self.ui_type = ui_type
+        self.host = host
+        self.port = port
         self.ui = None
         self.running = False
         self.logger = logging.getLogger(__name__)
+        self.profile = profile
         
-        # Thiết lập logging
-        self._setup_logging()
-        
-        # Khởi tạo UI
-        self._init_ui()
-        
-        # Đăng ký callbacks
+        # Đăng ký callbacks (UI được import và khởi tạo trong start(), sau khi đã kết nối)
         self._register_callbacks()
+        self._mark('init client')
     
-    def _setup_logging(self):
-        """Thiết lập logging"""
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        )
+    def _mark(self, name: str):
+        """Ghi mốc khởi động nếu đang đo"""
+        if self.profile:
+            self.profile.mark(name)
     
     def _init_ui(self):
-        """Khởi tạo UI"""
+        """Import và khởi tạo UI (tkinter chỉ được import khi dùng GUI)"""
         try:
             if self.ui_type == 'gui':
                 from ui.gui_ui import GUIInterface
@@ -68,6 +93,8 @@ class GameClient:
             except ImportError:
                 self.logger.error("No UI interface available")
                 sys.exit(1)
+        
+        self._mark('import ui')
     
     def _register_callbacks(self):
         """Đăng ký các callback cho UI"""
@@ -79,18 +106,22 @@ class GameClient:
         self.view_model.register_ui_callback('game_ended', self._on_game_ended)
         self.view_model.register_ui_callback('error_occurred', self._on_error_occurred)
         self.view_model.register_ui_callback('info_received', self._on_info_received)
+        self.view_model.register_ui_callback('latency_updated', self._on_latency_updated)
     
     def start(self, username: str = None):
         """Khởi động client"""
         self.running = True
         
         try:
-            # Kết nối đến server
-            if not self.view_model.connect_to_server(username):
+            # Kết nối đến server trước khi tải UI để server xử lý đăng nhập trong lúc UI khởi tạo
+            if not self.view_model.connect_to_server(username, self.host, self.port):
                 self.logger.error("Failed to connect to server")
                 return False
+            self._mark('open socket')
             
-            # Khởi động UI
+            # Khởi động UI (GUI chạy mainloop trong start() nên báo cáo khởi động trước đó)
+            self._init_ui()
+            self._report_startup()
             if self.ui:
                 self.ui.start()
             
@@ -124,12 +155,10 @@ class GameClient:
                 if self.ui:
                     self.ui.update()
                 
-                # Kiểm tra kết nối
-                if not self.view_model.is_connected():
-                    self.logger.warning("Lost connection to server")
-                    if not self.view_model.network.reconnect():
-                        self.logger.error("Failed to reconnect")
-                        break
+                # Kiểm tra kết nối (kết nối lại chạy trong nền, không chặn vòng lặp UI)
+                if not self.view_model.is_connected() and not self.view_model.is_reconnecting():
+                    self.logger.error("Lost connection to server")
+                    break
                 
                 time.sleep(REFRESH_RATE)
                 
@@ -137,10 +166,25 @@ class GameClient:
                 self.logger.error(f"Error in main loop: {e}")
                 time.sleep(1)
     
+    def _report_startup(self):
+        """In bảng thời gian khởi động ra stderr khi đã kết nối và đã tải UI"""
+        profile = self.profile
+        if not profile:
+            return
+        with profile.lock:
+            if profile.reported or profile.elapsed_ms('connected') is None \
+                    or profile.elapsed_ms('import ui') is None:
+                return
+            profile.reported = True
+        print(profile.report(), file=sys.stderr, flush=True)
+    
     # UI Callbacks
     def _on_state_changed(self, new_state: str):
         """Xử lý thay đổi trạng thái"""
         self.logger.info(f"State changed to: {new_state}")
+        if new_state == ClientState.CONNECTED and self.profile and self.profile.elapsed_ms('connected') is None:
+            self._mark('connected')
+            self._report_startup()
         if self.ui:
             self.ui.on_state_changed(new_state)
     
@@ -184,6 +228,19 @@ class GameClient:
         self.logger.info(f"Info: {info_message}")
         if self.ui:
             self.ui.on_info_received(info_message)
+    
+    def _on_latency_updated(self, stats: dict):
+        """Xử lý số đo độ trễ mới"""
+        self.logger.info(f"Answer latency: {stats}")
+        if self.ui:
+            self.ui.on_latency_updated(stats)
+
+def setup_logging(level: int = logging.INFO):
+    """Thiết lập logging (do entry point gọi, không làm khi import module)"""
+    logging.basicConfig(
+        level=level,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
 
 def main():
     """Hàm main để chạy client"""
@@ -197,16 +254,15 @@ def main():
                        help='Server host')
     parser.add_argument('--port', type=int, default=5555, 
                        help='Server port')
+    parser.add_argument('--profile-startup', action='store_true',
+                       help='Report import and init timings once connected')
     
     args = parser.parse_args()
-    
-    # Cập nhật cấu hình
-    import client.config as client_config
-    client_config.SERVER_HOST = args.host
-    client_config.SERVER_PORT = args.port
+    setup_logging()
     
     # Tạo và chạy client
-    client = GameClient(ui_type=args.ui)
+    profile = StartupProfile() if args.profile_startup else None
+    client = GameClient(ui_type=args.ui, host=args.host, port=args.port, profile=profile)
     
     try:
         client.start(username=args.username)
@@ -6,16 +6,22 @@ Cấu hình client cho Fastest Finger First
 SERVER_HOST = 'localhost'
 SERVER_PORT = 5555
 BUFFER_SIZE = 4096
-RECONNECT_ATTEMPTS = 3
-RECONNECT_DELAY = 2
+AUTO_RECONNECT = True  # Tự kết nối lại trong nền khi mất kết nối
+RECONNECT_ATTEMPTS = 8
+RECONNECT_BASE_DELAY = 0.5  # Thời gian chờ trước lần thử đầu (giây), nhân đôi sau mỗi lần
+RECONNECT_MAX_DELAY = 10.0  # Thời gian chờ tối đa giữa hai lần thử (giây)
+DISPATCH_QUEUE_SIZE = 1000  # Số message tối đa chờ xử lý trước khi chặn thread nhận
 
 # Cấu hình giao diện
 UI_TYPE = 'console'  # 'console' hoặc 'gui'
 REFRESH_RATE = 0.1  # Tần suất cập nhật UI (giây)
+GUI_FRAME_INTERVAL_MS = 16  # Khoảng cách tối thiểu giữa hai lần vẽ lại GUI (ms, ~60 khung hình/giây)
+LEADERBOARD_VISIBLE_ROWS = 10  # Số dòng bảng xếp hạng hiển thị cùng lúc
 
 # Cấu hình game
 DEFAULT_USERNAME = 'Player'
 AUTO_JOIN_ROOM = True
+TELEMETRY_ENABLED = False  # Gửi số đo độ trễ (vẽ, phản xạ, round-trip) cho server sau mỗi đáp án
 
 # Giao thức truyền tin
 ENCODING = 'utf-8'
@@ -35,11 +41,15 @@ class MessageType:
     GAME_END = 'game_end'
     ERROR = 'error'
     INFO = 'info'
+    HISTORY = 'history'
+    RECENT_GAMES = 'recent_games'
+    TELEMETRY = 'telemetry'
 
 # Trạng thái client
 class ClientState:
     DISCONNECTED = 'disconnected'
     CONNECTING = 'connecting'
+    RECONNECTING = 'reconnecting'
     CONNECTED = 'connected'
     IN_ROOM = 'in_room'
     PLAYING = 'playing'
@@ -0,0 +1,138 @@
+"""
+Hàng đợi điều phối message cho client Fastest Finger First
+Tách thread nhận socket khỏi ViewModel/UI: thread mạng chỉ đọc và giải mã,
+các handler chạy trên một thread riêng; bản cập nhật cũ bị thay bằng bản mới
+"""
+
+import logging
+import threading
+from collections import deque
+from typing import Callable, Dict, Optional
+from client.config import DISPATCH_QUEUE_SIZE
+
+class MessageDispatcher:
+    """Chạy các handler tuần tự trên thread điều phối
+    
+    Mục có `coalesce_key` (vd. bảng xếp hạng, trạng thái game) chỉ giữ bản
+    mới nhất: bản cũ còn trong hàng đợi bị xóa và bản mới xếp ở cuối, nên thứ
+    tự so với các message khác vẫn đúng và hàng đợi không dài quá số khóa.
+    Khi hàng đợi đầy, bên gửi bị chặn (áp lực ngược về TCP) thay vì làm mất
+    message; riêng handler gửi tiếp từ chính thread điều phối thì không bị
+    chặn, vì thread đó là thread duy nhất làm hàng đợi ngắn đi.
+    """
+    
+    def __init__(self, max_backlog: int = DISPATCH_QUEUE_SIZE):
+        self.max_backlog = max_backlog
+        self.logger = logging.getLogger(__name__)
+        
+        self._queue = deque()
+        self._latest: Dict[str, tuple] = {}
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread = None
+        
+        # Số liệu theo dõi
+        self.metrics = {
+            'submitted': 0,
+            'dispatched': 0,
+            'coalesced': 0,
+            'blocked_submits': 0,
+            'max_backlog': 0
+        }
+    
+    def start(self):
+        """Khởi động thread điều phối (nếu chưa chạy)"""
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._dispatch_loop, name="MessageDispatcher", daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout: Optional[float] = None):
+        """Dừng thread điều phối sau khi chạy hết các mục đang chờ"""
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self._thread = None
+    
+    def submit(self, func: Callable, *args, coalesce_key: Optional[str] = None):
+        """Đưa một lời gọi vào hàng đợi (gọi từ thread mạng)"""
+        if not self._running:
+            self.start()
+        
+        with self._condition:
+            self.metrics['submitted'] += 1
+            
+            if coalesce_key is not None:
+                previous = self._latest.pop(coalesce_key, None)
+                if previous is not None:
+                    # Xóa bản cũ chưa chạy, nhường chỗ trong hàng đợi cho bản mới
+                    self._remove(previous)
+                    self.metrics['coalesced'] += 1
+            
+            if len(self._queue) >= self.max_backlog and threading.current_thread() is not self._thread:
+                self.metrics['blocked_submits'] += 1
+                while len(self._queue) >= self.max_backlog and self._running:
+                    self._condition.wait()
+            
+            entry = (func, args, coalesce_key)
+            self._queue.append(entry)
+            if coalesce_key is not None:
+                self._latest[coalesce_key] = entry
+            self.metrics['max_backlog'] = max(self.metrics['max_backlog'], len(self._queue))
+            self._condition.notify_all()
+    
+    def _remove(self, entry: tuple):
+        """Xóa một mục khỏi hàng đợi (so sánh theo đối tượng, không so nội dung)"""
+        for index, queued in enumerate(self._queue):
+            if queued is entry:
+                del self._queue[index]
+                return
+    
+    def _next_entry(self) -> Optional[tuple]:
+        """Lấy mục tiếp theo, None khi đã dừng và hết hàng đợi"""
+        with self._condition:
+            while True:
+                if self._queue:
+                    entry = self._queue.popleft()
+                    if entry[2] is not None:
+                        del self._latest[entry[2]]
+                    self._condition.notify_all()
+                    return entry
+                if not self._running:
+                    return None
+                self._condition.wait()
+    
+    def _dispatch_loop(self):
+        """Vòng lặp chạy handler"""
+        while True:
+            entry = self._next_entry()
+            if entry is None:
+                break
+            
+            func, args = entry[0], entry[1]
+            try:
+                func(*args)
+            except Exception as e:
+                self.logger.error(f"Error dispatching message: {e}")
+            
+            with self._condition:
+                self.metrics['dispatched'] += 1
+                self._condition.notify_all()
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Chờ đến khi hàng đợi rỗng và mục cuối đã chạy xong"""
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: not self._queue and self.metrics['dispatched'] + self.metrics['coalesced']
+                >= self.metrics['submitted'],
+                timeout
+            )
+    
+    def get_metrics(self) -> Dict:
+        """Lấy số liệu của hàng đợi"""
+        with self._condition:
+            return dict(self.metrics, backlog=len(self._queue))
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Bộ tạo tải cho Fastest Finger First
+Giả lập N người chơi trong một process (asyncio) với tốc độ vào phòng, phân
+bố thời gian trả lời, tỉ lệ đúng và tỉ lệ rớt mạng cấu hình được, rồi báo cáo
+độ trễ kết nối, độ lệch khi phát câu hỏi và độ trễ xác nhận đáp án
+"""
+
+import sys
+import json
+import math
+import time
+import random
+import asyncio
+import argparse
+import logging
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+# Thêm thư mục gốc vào path khi chạy trực tiếp
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from client.config import SERVER_HOST, SERVER_PORT
+from client.async_client import AsyncGameClient, ServerError
+
+REPORT_PERCENTILES = (50, 90, 99)
+DELAY_DISTRIBUTIONS = ['uniform', 'normal', 'lognormal', 'exponential']
+OPTION_LETTERS = 'ABCD'
+
+def percentile(values: Sequence[float], q: float) -> Optional[float]:
+    """Phân vị q (%) theo nội suy tuyến tính, None nếu không có dữ liệu"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+def summarize(values: Sequence[float]) -> Dict[str, Optional[float]]:
+    """Số mẫu, các phân vị và giá trị lớn nhất (mili giây)"""
+    summary = {'count': len(values)}
+    for q in REPORT_PERCENTILES:
+        value = percentile(values, q)
+        summary[f"p{q}_ms"] = value * 1000 if value is not None else None
+    summary['max_ms'] = max(values) * 1000 if values else None
+    return summary
+
+def delay_sampler(distribution: str, mean: float, spread: float, rng: random.Random) -> Callable[[], float]:
+    """Hàm lấy mẫu thời gian suy nghĩ trước khi trả lời (giây, không âm)"""
+    if distribution == 'uniform':
+        return lambda: max(0.0, rng.uniform(mean - spread, mean + spread))
+    if distribution == 'normal':
+        return lambda: max(0.0, rng.gauss(mean, spread))
+    if distribution == 'lognormal':
+        # Chọn tham số để trung bình đúng bằng mean, spread là độ lệch chuẩn của log
+        mu = math.log(max(mean, 1e-6)) - spread ** 2 / 2
+        return lambda: rng.lognormvariate(mu, spread)
+    if distribution == 'exponential':
+        return lambda: rng.expovariate(1 / mean) if mean > 0 else 0.0
+    raise ValueError(f"Unknown delay distribution: {distribution}")
+
+class LoadStats:
+    """Số liệu gom từ tất cả người chơi giả lập"""
+    
+    def __init__(self):
+        self.connect_latencies: List[float] = []
+        self.resume_latencies: List[float] = []
+        self.ack_latencies: List[float] = []
+        self.question_receipts: Dict[int, List[float]] = {}
+        self.counters = {
+            'players_connected': 0,
+            'connect_failures': 0,
+            'questions_received': 0,
+            'answers_acked': 0,
+            'answers_rejected': 0,
+            'disconnects': 0,
+            'resumes': 0,
+            'resume_failures': 0
+        }
+    
+    def record_question(self, question_id: int, received_at: float):
+        """Ghi thời điểm một người chơi nhận câu hỏi (đồng hồ chung của process)"""
+        self.question_receipts.setdefault(question_id, []).append(received_at)
+        self.counters['questions_received'] += 1
+    
+    def report(self) -> Dict:
+        """Báo cáo tổng hợp
+        
+        Độ lệch phát câu hỏi (fan-out skew) của một câu là khoảng cách giữa
+        người nhận đầu tiên và cuối cùng; `fanout_lag` là độ trễ của từng lần
+        nhận so với người nhận đầu tiên của câu đó.
+        """
+        skews = [max(times) - min(times) for times in self.question_receipts.values() if len(times) > 1]
+        lags = [t - min(times) for times in self.question_receipts.values() for t in times]
+        return {
+            **self.counters,
+            'questions': len(self.question_receipts),
+            'connect_latency': summarize(self.connect_latencies),
+            'resume_latency': summarize(self.resume_latencies),
+            'answer_ack_latency': summarize(self.ack_latencies),
+            'fanout_skew': summarize(skews),
+            'fanout_lag': summarize(lags)
+        }
+
+class SimulatedPlayer:
+    """Một người chơi giả lập: vào phòng, trả lời từng câu, thỉnh thoảng rớt mạng"""
+    
+    def __init__(self, username: str, host: str, port: int, stats: LoadStats, rng: random.Random,
+                 answer_delay: Callable[[], float], accuracy: float, churn: float,
+                 max_questions: int = 0, timeout: float = 10.0):
+        self.username = username
+        self.stats = stats
+        self.rng = rng
+        self.answer_delay = answer_delay
+        self.accuracy = accuracy
+        self.churn = churn
+        self.max_questions = max_questions
+        self.timeout = timeout
+        self.logger = logging.getLogger(__name__)
+        
+        # Người chơi giả lập không đọc sự kiện nên không cần giữ lại
+        self.client = AsyncGameClient(username, host, port, max_events=0)
+    
+    async def run(self, stop: asyncio.Event):
+        """Chạy đến khi trận kết thúc, đủ số câu hoặc có tín hiệu dừng"""
+        try:
+            start = time.perf_counter()
+            await self.client.connect(timeout=self.timeout)
+            await self.client.join(timeout=self.timeout)
+            self.stats.connect_latencies.append(time.perf_counter() - start)
+            self.stats.counters['players_connected'] += 1
+        except (ServerError, ConnectionError, OSError, asyncio.TimeoutError) as e:
+            self.logger.warning(f"{self.username} failed to connect: {e}")
+            self.stats.counters['connect_failures'] += 1
+            await self.client.close()
+            return
+        
+        answered = 0
+        try:
+            while not stop.is_set() and self.client.final_results is None:
+                if self.max_questions and answered >= self.max_questions:
+                    break
+                
+                try:
+                    question = await self.client.wait_question(timeout=0.5)
+                except asyncio.TimeoutError:
+                    continue
+                self.stats.record_question(question.get('question_id', 0), self.client.question_received_at)
+                
+                await asyncio.sleep(self.answer_delay())
+                await self._answer(question)
+                answered += 1
+                
+                if self.rng.random() < self.churn:
+                    await self._churn()
+        except ConnectionError as e:
+            self.logger.warning(f"{self.username} lost connection: {e}")
+        finally:
+            await self.client.close()
+    
+    def _choose_answer(self, question: Dict) -> str:
+        """Chọn đáp án đúng với xác suất `accuracy`"""
+        options = OPTION_LETTERS[:max(1, len(question.get('options', OPTION_LETTERS)))]
+        correct = question.get('correct_answer')
+        if correct and self.rng.random() < self.accuracy:
+            return correct
+        wrong = [letter for letter in options if letter != correct]
+        return self.rng.choice(wrong or options)
+    
+    async def _answer(self, question: Dict):
+        """Gửi đáp án và đo độ trễ đến khi nhận xác nhận"""
+        start = time.perf_counter()
+        try:
+            await self.client.submit_answer(self._choose_answer(question), timeout=self.timeout)
+            self.stats.ack_latencies.append(time.perf_counter() - start)
+            self.stats.counters['answers_acked'] += 1
+        except (ServerError, asyncio.TimeoutError):
+            # Câu hỏi đã đóng hoặc server không trả lời kịp
+            self.stats.counters['answers_rejected'] += 1
+    
+    async def _churn(self):
+        """Ngắt kết nối rồi kết nối lại bằng resume token"""
+        self.stats.counters['disconnects'] += 1
+        await self.client.close()
+        await asyncio.sleep(self.rng.uniform(0.1, 1.0))
+        
+        start = time.perf_counter()
+        try:
+            data = await self.client.connect(timeout=self.timeout)
+            if not data.get('resumed'):
+                await self.client.join(timeout=self.timeout)
+            self.stats.resume_latencies.append(time.perf_counter() - start)
+            self.stats.counters['resumes'] += 1
+        except (ServerError, OSError, asyncio.TimeoutError) as e:
+            self.logger.warning(f"{self.username} failed to resume: {e}")
+            self.stats.counters['resume_failures'] += 1
+            raise ConnectionError("Resume failed")
+
+async def run_load(host: str = SERVER_HOST, port: int = SERVER_PORT, players: int = 50,
+                   join_rate: float = 20.0, delay_distribution: str = 'lognormal',
+                   delay_mean: float = 3.0, delay_spread: float = 0.5, accuracy: float = 0.7,
+                   churn: float = 0.0, duration: float = 60.0, max_questions: int = 0,
+                   prefix: str = 'load', seed: Optional[int] = None) -> Dict:
+    """Chạy bài tải và trả về báo cáo"""
+    rng = random.Random(seed)
+    stats = LoadStats()
+    stop = asyncio.Event()
+    
+    tasks = []
+    started = time.perf_counter()
+    for index in range(players):
+        player_rng = random.Random(rng.random())
+        player = SimulatedPlayer(
+            f"{prefix}{index:05d}", host, port, stats, player_rng,
+            delay_sampler(delay_distribution, delay_mean, delay_spread, player_rng),
+            accuracy, churn, max_questions
+        )
+        tasks.append(asyncio.create_task(player.run(stop)))
+        if join_rate > 0:
+            await asyncio.sleep(1 / join_rate)
+    
+    remaining = duration - (time.perf_counter() - started)
+    if remaining > 0:
+        await asyncio.wait(tasks, timeout=remaining)
+    stop.set()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    
+    report = stats.report()
+    report['elapsed_s'] = time.perf_counter() - started
+    return report
+
+def print_report(report: Dict):
+    """In báo cáo dạng bảng"""
+    print("=" * 60)
+    print("LOAD TEST REPORT")
+    print("=" * 60)
+    for key, value in report.items():
+        if not isinstance(value, dict):
+            print(f"{key:<22} {value:.2f}" if isinstance(value, float) else f"{key:<22} {value}")
+    
+    print()
+    print(f"{'latency':<22}{'count':>8}" + ''.join(f"{f'p{q}':>10}" for q in REPORT_PERCENTILES) + f"{'max':>10}")
+    for key, summary in report.items():
+        if isinstance(summary, dict):
+            cells = [summary[f"p{q}_ms"] for q in REPORT_PERCENTILES] + [summary['max_ms']]
+            print(f"{key:<22}{summary['count']:>8}" + ''.join(
+                f"{cell:>8.1f}ms" if cell is not None else f"{'-':>10}" for cell in cells
+            ))
+
+def main():
+    """Chạy bộ tạo tải từ dòng lệnh"""
+    parser = argparse.ArgumentParser(description='Simulate many players against a running server')
+    parser.add_argument('--host', type=str, default=SERVER_HOST, help='Server host')
+    parser.add_argument('--port', type=int, default=SERVER_PORT, help='Server port')
+    parser.add_argument('--players', '-n', type=int, default=50, help='Number of simulated players')
+    parser.add_argument('--join-rate', type=float, default=20.0, help='Players joining per second (0 = all at once)')
+    parser.add_argument('--delay-dist', choices=DELAY_DISTRIBUTIONS, default='lognormal',
+                        help='Answer delay distribution')
+    parser.add_argument('--delay-mean', type=float, default=3.0, help='Mean answer delay (seconds)')
+    parser.add_argument('--delay-spread', type=float, default=0.5,
+                        help='Delay spread (stddev, half-width for uniform, log stddev for lognormal)')
+    parser.add_argument('--accuracy', type=float, default=0.7, help='Probability of answering correctly')
+    parser.add_argument('--churn', type=float, default=0.0,
+                        help='Probability a player disconnects and resumes after each answer')
+    parser.add_argument('--duration', type=float, default=60.0, help='Maximum test duration (seconds)')
+    parser.add_argument('--questions', type=int, default=0, help='Stop each player after this many questions')
+    parser.add_argument('--prefix', type=str, default='load', help='Username prefix')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    
+    report = asyncio.run(run_load(
+        args.host, args.port, args.players, args.join_rate, args.delay_dist, args.delay_mean,
+        args.delay_spread, args.accuracy, args.churn, args.duration, args.questions, args.prefix, args.seed
+    ))
+    
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+if __name__ == "__main__":
+    main()
@@ -5,43 +5,58 @@ Module xử lý kết nối mạng cho client
 import socket
 import json
 import time
+import random
 import threading
 import logging
 from typing import Optional, Callable, Dict, Any
 from client.config import (
     SERVER_HOST, SERVER_PORT, BUFFER_SIZE, ENCODING, DELIMITER,
-    RECONNECT_ATTEMPTS, RECONNECT_DELAY, MessageType
+    RECONNECT_ATTEMPTS, RECONNECT_BASE_DELAY, RECONNECT_MAX_DELAY, MessageType
 )
+from client.dispatcher import MessageDispatcher
+
+def backoff_delay(attempt: int, base: float = RECONNECT_BASE_DELAY, maximum: float = RECONNECT_MAX_DELAY) -> float:
+    """Thời gian chờ trước lần thử thứ `attempt` (từ 0): lũy thừa 2 có jitter
+    
+    Jitter ngẫu nhiên trong nửa trên của khoảng chờ để nhiều client cùng mất
+    mạng (vd. Wi-Fi chập chờn tại sự kiện) không kết nối lại cùng lúc.
+    """
+    delay = min(maximum, base * (2 ** attempt))
+    return random.uniform(delay / 2, delay)
 
 class NetworkManager:
     """Quản lý kết nối mạng với server"""
     
-    def __init__(self):
+    def __init__(self, auto_reconnect: bool = False):
         self.socket = None
         self.is_connected = False
         self.is_running = False
         self.receive_thread = None
         self.logger = logging.getLogger(__name__)
         
+        # Kết nối lại trong nền khi mất kết nối (không chặn vòng lặp UI)
+        self.auto_reconnect = auto_reconnect
+        self.host = SERVER_HOST
+        self.port = SERVER_PORT
+        self.reconnect_thread = None
+        self._reconnecting = False
+        self._stop_reconnect = threading.Event()
+        self._socket_lock = threading.Lock()
+        
         # Callbacks
         self.message_handlers: Dict[str, Callable] = {}
         self.connection_handlers: Dict[str, Callable] = {}
         
-        # Buffer cho message
-        self.message_buffer = ""
+        # Buffer cho message (bytes, để không cắt đôi ký tự UTF-8 giữa hai lần recv)
+        self.message_buffer = b""
+        
+        # Handler chạy trên thread điều phối, không chặn thread nhận socket
+        self.dispatcher = MessageDispatcher()
     
     def connect(self, host: str = SERVER_HOST, port: int = SERVER_PORT) -> bool:
         """Kết nối đến server"""
         try:
-            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.socket.connect((host, port))
-            self.is_connected = True
-            self.is_running = True
-            
-            # Khởi động thread nhận message
-            self.receive_thread = threading.Thread(target=self._receive_loop, daemon=True)
-            self.receive_thread.start()
-            
+            self._open(host, port)
             self.logger.info(f"Connected to server {host}:{port}")
             self._notify_connection_handlers('connected')
             return True
@@ -51,18 +66,54 @@ class NetworkManager:
             self._notify_connection_handlers('failed', str(e))
             return False
     
-    def disconnect(self):
-        """Ngắt kết nối"""
-        self.is_running = False
-        self.is_connected = False
+    def _open(self, host: str, port: int):
+        """Mở socket và khởi động thread nhận message"""
+        new_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            new_socket.connect((host, port))
+        except Exception:
+            new_socket.close()
+            raise
+        
+        with self._socket_lock:
+            self.host, self.port = host, port
+            self.socket = new_socket
+            self.message_buffer = b""
+            self.is_connected = True
+            self.is_running = True
+        
+        # Khởi động thread nhận message
+        self.receive_thread = threading.Thread(target=self._receive_loop, daemon=True)
+        self.receive_thread.start()
+    
+    def disconnect(self, lost: bool = False):
+        """Ngắt kết nối (`lost` = mất kết nối ngoài ý muốn, sẽ tự kết nối lại nếu bật)"""
+        with self._socket_lock:
+            current = self.socket
+            self.socket = None
+            # Đánh dấu trước khi is_connected = False để vòng lặp UI không coi là mất hẳn kết nối
+            if lost and current is not None and self.auto_reconnect:
+                self._reconnecting = True
+            self.is_running = False
+            self.is_connected = False
         
-        if self.socket:
+        if current:
             try:
-                self.socket.close()
+                current.close()
             except:
                 pass
-            self.socket = None
         
+        if lost:
+            if current is None:
+                # Kết nối đã được đóng ở thread khác
+                return
+            self.logger.warning("Lost connection to server")
+            if self.auto_reconnect:
+                self.start_reconnect()
+            self._notify_connection_handlers('lost')
+            return
+        
+        self._stop_reconnect.set()
         self.logger.info("Disconnected from server")
         self._notify_connection_handlers('disconnected')
     
@@ -84,53 +135,68 @@ class NetworkManager:
             
         except Exception as e:
             self.logger.error(f"Error sending message: {e}")
-            self.disconnect()
+            self.disconnect(lost=True)
             return False
     
     def _receive_loop(self):
-        """Vòng lặp nhận message từ server"""
+        """Vòng lặp nhận message từ server (chỉ đọc và giải mã, handler chạy trên dispatcher)"""
+        delimiter = DELIMITER.encode(ENCODING)
+        current = self.socket
         while self.is_running and self.is_connected:
             try:
-                data = self.socket.recv(BUFFER_SIZE)
+                data = current.recv(BUFFER_SIZE)
                 if not data:
                     break
                 
-                message_str = data.decode(ENCODING)
-                self.message_buffer += message_str
+                self.message_buffer += data
                 
                 # Xử lý các message hoàn chỉnh
-                while DELIMITER in self.message_buffer:
-                    message_end = self.message_buffer.find(DELIMITER)
-                    complete_message = self.message_buffer[:message_end]
-                    self.message_buffer = self.message_buffer[message_end + len(DELIMITER):]
-                    
-                    if complete_message.strip():
-                        self._process_message(complete_message)
+                *frames, self.message_buffer = self.message_buffer.split(delimiter)
+                for frame in frames:
+                    if frame.strip():
+                        self._process_message(frame)
                         
             except Exception as e:
                 if self.is_running:
                     self.logger.error(f"Error receiving message: {e}")
                 break
         
-        self.disconnect()
+        # Vòng lặp kết thúc khi chưa gọi disconnect() là mất kết nối ngoài ý muốn
+        if self.socket is current:
+            self.disconnect(lost=self.is_running)
     
-    def _process_message(self, message_str: str):
-        """Xử lý message nhận được"""
+    def _process_message(self, frame: bytes):
+        """Giải mã message và đưa vào hàng đợi điều phối"""
         try:
-            message = json.loads(message_str)
+            message = json.loads(frame.decode(ENCODING))
             message_type = message.get('type')
             data = message.get('data', {})
-            
-            self.logger.debug(f"Received message: {message_type}")
-            
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            self.logger.error(f"Invalid JSON message: {e}")
+            return
+        
+        self.logger.debug(f"Received message: {message_type}")
+        self.dispatcher.submit(self._dispatch_message, message_type, data,
+                               coalesce_key=self._coalesce_key(message_type, data))
+    
+    @staticmethod
+    def _coalesce_key(message_type: str, data: Dict) -> Optional[str]:
+        """Khóa gộp cho các message chỉ mang trạng thái mới nhất"""
+        if message_type == MessageType.LEADERBOARD:
+            return MessageType.LEADERBOARD
+        if message_type == MessageType.INFO and not data.get('message'):
+            # INFO không có nội dung hiển thị chỉ cập nhật game_status/leaderboard
+            return MessageType.INFO
+        return None
+    
+    def _dispatch_message(self, message_type: str, data: Dict):
+        """Gọi handler tương ứng (chạy trên thread điều phối)"""
+        try:
             # Gọi handler tương ứng
             if message_type in self.message_handlers:
                 self.message_handlers[message_type](data)
             else:
                 self.logger.warning(f"No handler for message type: {message_type}")
-                
-        except json.JSONDecodeError as e:
-            self.logger.error(f"Invalid JSON message: {e}")
         except Exception as e:
             self.logger.error(f"Error processing message: {e}")
     
@@ -143,23 +209,60 @@ class NetworkManager:
         self.connection_handlers[event] = handler
     
     def _notify_connection_handlers(self, event: str, *args):
-        """Thông báo cho các connection handler"""
+        """Thông báo cho các connection handler (qua dispatcher để giữ thứ tự với message)"""
+        self.dispatcher.submit(self._run_connection_handler, event, *args)
+    
+    def _run_connection_handler(self, event: str, *args):
+        """Gọi connection handler (chạy trên thread điều phối)"""
         if event in self.connection_handlers:
             try:
                 self.connection_handlers[event](*args)
             except Exception as e:
                 self.logger.error(f"Error in connection handler: {e}")
     
+    def is_reconnecting(self) -> bool:
+        """Kiểm tra đang kết nối lại trong nền không"""
+        return self._reconnecting
+    
+    def start_reconnect(self, max_attempts: int = RECONNECT_ATTEMPTS):
+        """Kết nối lại trong thread nền
+        
+        Thành công thì phát sự kiện 'reconnected' (ViewModel gửi resume token),
+        hết số lần thử thì phát 'reconnect_failed'.
+        """
+        if self.reconnect_thread is not None and self.reconnect_thread.is_alive():
+            return
+        
+        self._reconnecting = True
+        self._stop_reconnect.clear()
+        self.reconnect_thread = threading.Thread(
+            target=self._reconnect_loop, args=(max_attempts,), name="Reconnect", daemon=True
+        )
+        self.reconnect_thread.start()
+    
+    def _reconnect_loop(self, max_attempts: int):
+        """Vòng lặp kết nối lại của thread nền"""
+        try:
+            if self.reconnect(max_attempts):
+                self._notify_connection_handlers('reconnected')
+            elif not self._stop_reconnect.is_set():
+                self._notify_connection_handlers('reconnect_failed')
+        finally:
+            self._reconnecting = False
+    
     def reconnect(self, max_attempts: int = RECONNECT_ATTEMPTS) -> bool:
-        """Thử kết nối lại"""
+        """Thử kết nối lại với thời gian chờ tăng dần (dừng khi gọi disconnect)"""
         for attempt in range(max_attempts):
-            self.logger.info(f"Reconnection attempt {attempt + 1}/{max_attempts}")
+            if self._stop_reconnect.wait(backoff_delay(attempt)):
+                return False
             
-            if self.connect():
+            self.logger.info(f"Reconnection attempt {attempt + 1}/{max_attempts}")
+            try:
+                self._open(self.host, self.port)
+                self.logger.info(f"Reconnected to server {self.host}:{self.port}")
                 return True
-            
-            if attempt < max_attempts - 1:
-                time.sleep(RECONNECT_DELAY)
+            except Exception as e:
+                self.logger.warning(f"Reconnection attempt failed: {e}")
         
         self.logger.error("Failed to reconnect after all attempts")
         return False
@@ -6,25 +6,45 @@ Xử lý logic nghiệp vụ và quản lý trạng thái
 import time
 import logging
 from typing import Dict, List, Optional, Callable
-from client.config import MessageType, ClientState, DEFAULT_USERNAME, AUTO_JOIN_ROOM
+from client.config import (
+    MessageType, ClientState, DEFAULT_USERNAME, AUTO_JOIN_ROOM, AUTO_RECONNECT, TELEMETRY_ENABLED
+)
 from client.network import NetworkManager
 
 class GameViewModel:
     """ViewModel chính quản lý logic game"""
     
     def __init__(self):
-        self.network = NetworkManager()
+        self.network = NetworkManager(auto_reconnect=AUTO_RECONNECT)
         self.logger = logging.getLogger(__name__)
         
         # Trạng thái client
         self.state = ClientState.DISCONNECTED
         self.username = DEFAULT_USERNAME
         
+        # Resume token do server cấp và số thứ tự SCORE_UPDATE cuối đã nhận
+        self.resume_token = None
+        self.last_score_seq = 0
+        
+        # Đáp án đang chờ server xác nhận, gửi lại sau khi kết nối lại
+        self.answer_seq = 0
+        self.pending_answer: Optional[Dict] = None
+        self.last_answer_ack: Optional[Dict] = None
+        
+        # Mốc thời gian (time.perf_counter()) để đo độ trễ phía client cho câu hỏi hiện tại
+        self.question_received_at: Optional[float] = None
+        self.question_rendered_at: Optional[float] = None
+        self.answer_sent_at: Optional[float] = None
+        self.latency: Dict = {}
+        self.telemetry_enabled = TELEMETRY_ENABLED
+        
         # Dữ liệu game
         self.current_question = None
         self.leaderboard = []
         self.game_status = {}
         self.final_results = None
+        self.history_page = None
+        self.recent_games_page = None
         
         # Thông tin người chơi
         self.player_score = 0
@@ -41,7 +61,11 @@ class GameViewModel:
             'game_started': [],
             'game_ended': [],
             'error_occurred': [],
-            'info_received': []
+            'info_received': [],
+            'history_received': [],
+            'recent_games_received': [],
+            'answer_acknowledged': [],
+            'latency_updated': []
         }
         
         # Thiết lập message handlers
@@ -53,28 +77,34 @@ class GameViewModel:
         self.network.register_message_handler(MessageType.CONNECT, self._handle_connect)
         self.network.register_message_handler(MessageType.JOIN_ROOM, self._handle_join_room)
         self.network.register_message_handler(MessageType.QUESTION, self._handle_question)
+        self.network.register_message_handler(MessageType.ANSWER, self._handle_answer)
         self.network.register_message_handler(MessageType.SCORE_UPDATE, self._handle_score_update)
         self.network.register_message_handler(MessageType.LEADERBOARD, self._handle_leaderboard)
         self.network.register_message_handler(MessageType.GAME_START, self._handle_game_start)
         self.network.register_message_handler(MessageType.GAME_END, self._handle_game_end)
         self.network.register_message_handler(MessageType.ERROR, self._handle_error)
         self.network.register_message_handler(MessageType.INFO, self._handle_info)
+        self.network.register_message_handler(MessageType.HISTORY, self._handle_history)
+        self.network.register_message_handler(MessageType.RECENT_GAMES, self._handle_recent_games)
     
     def _setup_connection_handlers(self):
         """Thiết lập các handler cho sự kiện kết nối"""
         self.network.register_connection_handler('connected', self._handle_connected)
         self.network.register_connection_handler('disconnected', self._handle_disconnected)
         self.network.register_connection_handler('failed', self._handle_connection_failed)
+        self.network.register_connection_handler('lost', self._handle_connection_lost)
+        self.network.register_connection_handler('reconnected', self._handle_reconnected)
+        self.network.register_connection_handler('reconnect_failed', self._handle_reconnect_failed)
     
-    def connect_to_server(self, username: str = None) -> bool:
-        """Kết nối đến server"""
+    def connect_to_server(self, username: str = None, host: str = None, port: int = None) -> bool:
+        """Kết nối đến server (mặc định theo client/config.py)"""
         if username:
             self.username = username
         
         self.state = ClientState.CONNECTING
         self._notify_ui('state_changed', self.state)
         
-        success = self.network.connect()
+        success = self.network.connect(host or self.network.host, port or self.network.port)
         if success:
             # Gửi message kết nối
             self.network.send_message(MessageType.CONNECT, {
@@ -83,6 +113,14 @@ class GameViewModel:
         
         return success
     
+    def _send_resume(self) -> bool:
+        """Gửi message kết nối kèm resume token sau khi kết nối lại"""
+        return self.network.send_message(MessageType.CONNECT, {
+            'username': self.username,
+            'resume_token': self.resume_token,
+            'last_seq': self.last_score_seq
+        })
+    
     def disconnect_from_server(self):
         """Ngắt kết nối khỏi server"""
         self.network.disconnect()
@@ -115,15 +153,47 @@ class GameViewModel:
         if not self.current_question:
             return False
         
-        success = self.network.send_message(MessageType.ANSWER, {
-            'answer': answer
-        })
+        # Mỗi đáp án có id riêng để gửi lại an toàn khi chưa nhận được xác nhận
+        self.answer_seq += 1
+        self.answer_sent_at = time.perf_counter()
+        self.pending_answer = {
+            'answer': answer,
+            'question_id': self.current_question.get('question_id'),
+            'answer_id': self.answer_seq
+        }
+        
+        success = self.network.send_message(MessageType.ANSWER, self.pending_answer)
         
         if success:
             self.logger.info(f"Submitted answer: {answer}")
         
         return success
     
+    def mark_question_rendered(self):
+        """UI gọi sau khi câu hỏi hiện tại đã được vẽ lên màn hình (chỉ lần đầu được ghi)"""
+        if self.current_question and self.question_rendered_at is None:
+            self.question_rendered_at = time.perf_counter()
+    
+    def resend_pending_answer(self) -> bool:
+        """Gửi lại đáp án chưa được xác nhận (server bỏ qua nếu đã nhận)"""
+        if not self.pending_answer:
+            return False
+        return self.network.send_message(MessageType.ANSWER, self.pending_answer)
+    
+    def request_history(self, cursor: Optional[list] = None, limit: Optional[int] = None) -> bool:
+        """Yêu cầu một trang lịch sử trận đấu (cursor lấy từ next_cursor của trang trước)"""
+        data = {'cursor': cursor}
+        if limit:
+            data['limit'] = limit
+        return self.network.send_message(MessageType.HISTORY, data)
+    
+    def request_recent_games(self, cursor: Optional[list] = None, limit: Optional[int] = None) -> bool:
+        """Yêu cầu một trang trận đấu gần đây"""
+        data = {'cursor': cursor}
+        if limit:
+            data['limit'] = limit
+        return self.network.send_message(MessageType.RECENT_GAMES, data)
+    
     def register_ui_callback(self, event: str, callback: Callable):
         """Đăng ký callback cho UI"""
         if event in self.ui_callbacks:
@@ -142,6 +212,19 @@ class GameViewModel:
     def _handle_connect(self, data: Dict):
         """Xử lý message kết nối"""
         if data.get('success'):
+            if data.get('resumed'):
+                # Server đã gắn lại người chơi và phòng cũ, không cần join lại
+                self.resume_token = data.get('resume_token', self.resume_token)
+                self.state = ClientState.IN_ROOM if data.get('in_room') else ClientState.CONNECTED
+                self._notify_ui('state_changed', self.state)
+                self._notify_ui('info_received', data.get('message', 'Reconnected'))
+                self.resend_pending_answer()
+                return
+            
+            # Phiên mới: số thứ tự SCORE_UPDATE và đáp án của phiên cũ không còn ý nghĩa
+            self.resume_token = data.get('resume_token')
+            self.last_score_seq = 0
+            self.pending_answer = None
             self.state = ClientState.CONNECTED
             self._notify_ui('state_changed', self.state)
             
@@ -160,13 +243,77 @@ class GameViewModel:
     
     def _handle_question(self, data: Dict):
         """Xử lý message câu hỏi"""
+        if self.pending_answer and self.pending_answer['question_id'] != data.get('question_id'):
+            self.pending_answer = None
+        
+        # Câu hỏi mới (không phải câu được gửi lại khi resume): bắt đầu đo lại
+        if not self.current_question or self.current_question.get('question_id') != data.get('question_id') \
+                or self.question_received_at is None:
+            self.question_received_at = time.perf_counter()
+            self.question_rendered_at = None
+            self.answer_sent_at = None
         self.current_question = data
         self.state = ClientState.PLAYING
         self._notify_ui('state_changed', self.state)
         self._notify_ui('question_received', data)
     
+    def _handle_answer(self, data: Dict):
+        """Xử lý xác nhận đáp án (kèm thời điểm server nhận)"""
+        if self.pending_answer and data.get('answer_id') == self.pending_answer['answer_id']:
+            self.pending_answer = None
+        self.last_answer_ack = data
+        self._notify_ui('answer_acknowledged', data)
+        
+        # Xác nhận của lần gửi mới nhất (không phải bản gửi lại) mới cho round-trip đúng
+        if data.get('answer_id') == self.answer_seq and not data.get('duplicate'):
+            self._update_latency(data)
+    
+    def _update_latency(self, ack: Dict):
+        """Tính thời gian vẽ, phản xạ và độ trễ mạng ước lượng cho đáp án vừa được xác nhận"""
+        if self.question_received_at is None or self.answer_sent_at is None:
+            return
+        
+        acked_at = time.perf_counter()
+        shown_at = self.question_rendered_at or self.question_received_at
+        round_trip = acked_at - self.answer_sent_at
+        self.latency = {
+            'question_id': ack.get('question_id'),
+            'render_ms': (shown_at - self.question_received_at) * 1000,
+            'reaction_ms': (self.answer_sent_at - shown_at) * 1000,
+            'round_trip_ms': round_trip * 1000,
+            # Không đồng bộ đồng hồ với server: coi hai chiều như nhau
+            'one_way_ms': round_trip * 500,
+            'server_response_ms': ack['response_time'] * 1000 if ack.get('response_time') is not None else None
+        }
+        self._notify_ui('latency_updated', self.latency)
+        
+        if self.telemetry_enabled:
+            self.send_telemetry()
+    
+    def send_telemetry(self) -> bool:
+        """Gửi số đo của đáp án gần nhất cho server dưới dạng frame gọn (mili giây)"""
+        if not self.latency:
+            return False
+        
+        frame = {
+            'q': self.latency['question_id'],
+            'rd': round(self.latency['render_ms'], 1),
+            'rt': round(self.latency['reaction_ms'], 1),
+            'rtt': round(self.latency['round_trip_ms'], 1)
+        }
+        if self.latency['server_response_ms'] is not None:
+            frame['srv'] = round(self.latency['server_response_ms'], 1)
+        return self.network.send_message(MessageType.TELEMETRY, frame)
+    
     def _handle_score_update(self, data: Dict):
         """Xử lý message cập nhật điểm"""
+        # Bỏ qua bản cập nhật đã nhận (có thể được phát lại khi resume)
+        seq = data.get('seq')
+        if seq is not None:
+            if seq <= self.last_score_seq:
+                return
+            self.last_score_seq = seq
+        
         results = data.get('results', {})
         leaderboard = data.get('leaderboard', [])
         
@@ -179,13 +326,22 @@ class GameViewModel:
             else:
                 self.wrong_answers += 1
         
-        self.leaderboard = leaderboard
+        self._set_leaderboard(leaderboard)
         self._notify_ui('score_updated', results)
         self._notify_ui('leaderboard_updated', leaderboard)
     
+    def _set_leaderboard(self, leaderboard: List[Dict]):
+        """Cập nhật bảng xếp hạng và hạng của người chơi"""
+        self.leaderboard = leaderboard
+        self.player_rank = next(
+            (row.get('rank', position) for position, row in enumerate(leaderboard, 1)
+             if row['username'] == self.username),
+            0
+        )
+    
     def _handle_leaderboard(self, data: Dict):
         """Xử lý message bảng xếp hạng"""
-        self.leaderboard = data.get('leaderboard', [])
+        self._set_leaderboard(data.get('leaderboard', []))
         self._notify_ui('leaderboard_updated', self.leaderboard)
     
     def _handle_game_start(self, data: Dict):
@@ -198,7 +354,7 @@ class GameViewModel:
         """Xử lý message kết thúc game"""
         self.state = ClientState.GAME_ENDED
         self.final_results = data.get('final_results', {})
-        self.leaderboard = data.get('leaderboard', [])
+        self._set_leaderboard(data.get('leaderboard', []))
         
         self._notify_ui('state_changed', self.state)
         self._notify_ui('game_ended', self.final_results)
@@ -207,6 +363,11 @@ class GameViewModel:
     def _handle_error(self, data: Dict):
         """Xử lý message lỗi"""
         error_message = data.get('message', 'Unknown error')
+        
+        # Đáp án bị từ chối (câu hỏi đã đóng, đã trả lời...) thì không gửi lại nữa
+        if self.pending_answer and data.get('answer_id') == self.pending_answer['answer_id']:
+            self.pending_answer = None
+        
         self._notify_ui('error_occurred', error_message)
     
     def _handle_info(self, data: Dict):
@@ -219,12 +380,22 @@ class GameViewModel:
             self.game_status = game_status
         
         if leaderboard:
-            self.leaderboard = leaderboard
+            self._set_leaderboard(leaderboard)
             self._notify_ui('leaderboard_updated', leaderboard)
         
         if info_message:
             self._notify_ui('info_received', info_message)
     
+    def _handle_history(self, data: Dict):
+        """Xử lý một trang lịch sử trận đấu"""
+        self.history_page = data
+        self._notify_ui('history_received', data)
+    
+    def _handle_recent_games(self, data: Dict):
+        """Xử lý một trang trận đấu gần đây"""
+        self.recent_games_page = data
+        self._notify_ui('recent_games_received', data)
+    
     # Connection handlers
     def _handle_connected(self):
         """Xử lý sự kiện kết nối thành công"""
@@ -237,6 +408,27 @@ class GameViewModel:
         self.current_question = None
         self._notify_ui('state_changed', self.state)
     
+    def _handle_connection_lost(self):
+        """Xử lý sự kiện mất kết nối ngoài ý muốn (mạng tự kết nối lại trong nền)"""
+        self.current_question = None
+        self.state = ClientState.RECONNECTING if self.network.is_reconnecting() else ClientState.DISCONNECTED
+        self._notify_ui('state_changed', self.state)
+    
+    def _handle_reconnected(self):
+        """Xử lý sự kiện đã kết nối lại: resume phiên cũ hoặc kết nối như mới"""
+        self.state = ClientState.CONNECTING
+        self._notify_ui('state_changed', self.state)
+        if self.resume_token:
+            self._send_resume()
+        else:
+            self.network.send_message(MessageType.CONNECT, {'username': self.username})
+    
+    def _handle_reconnect_failed(self):
+        """Xử lý sự kiện kết nối lại thất bại"""
+        self.state = ClientState.DISCONNECTED
+        self._notify_ui('error_occurred', "Failed to reconnect to server")
+        self._notify_ui('state_changed', self.state)
+    
     def _handle_connection_failed(self, error: str):
         """Xử lý sự kiện kết nối thất bại"""
         self.state = ClientState.DISCONNECTED
@@ -268,6 +460,10 @@ class GameViewModel:
         """Lấy kết quả cuối cùng"""
         return self.final_results
     
+    def get_latency_stats(self) -> Dict:
+        """Lấy số đo độ trễ của đáp án gần nhất (rỗng nếu chưa có)"""
+        return dict(self.latency)
+    
     def get_player_stats(self) -> Dict:
         """Lấy thống kê người chơi"""
         return {
@@ -281,6 +477,10 @@ class GameViewModel:
         """Kiểm tra có kết nối không"""
         return self.network.is_connected
     
+    def is_reconnecting(self) -> bool:
+        """Kiểm tra đang kết nối lại trong nền không"""
+        return self.network.is_reconnecting()
+    
     def is_in_game(self) -> bool:
         """Kiểm tra có đang trong game không"""
         return self.state in [ClientState.PLAYING, ClientState.IN_ROOM]
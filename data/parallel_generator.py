@@ -0,0 +1,126 @@
+"""
+Sinh câu hỏi song song cho Fastest Finger First
+Chia số lượng câu hỏi cho nhiều process, mỗi process dùng một luồng seed riêng,
+loại trùng theo hash nội dung và ghi dần ra file để không giữ toàn bộ trong bộ nhớ
+"""
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Thêm thư mục gốc vào path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from data.questions_generator import QuestionGenerator, np
+
+DEFAULT_CHUNK_SIZE = 50000
+
+def content_hash(record: Dict) -> bytes:
+    """Hash nội dung câu hỏi (câu hỏi + giá trị đáp án đúng) để loại trùng,
+    không phụ thuộc thứ tự các lựa chọn đã bị xáo trộn"""
+    answer = record['options'][ord(record['correct_answer']) - ord('A')]
+    content = record['question_text'] + '\x1f' + answer
+    return hashlib.blake2b(content.encode('utf-8'), digest_size=16).digest()
+
+def _generate_chunk(count: int, difficulty: str, seed_sequence) -> List[Tuple[bytes, str]]:
+    """Sinh một phần câu hỏi trong process con, trả về (hash, dòng JSON)"""
+    generator = QuestionGenerator()
+    batch = generator.generate_math_batch(count, difficulty, seed=seed_sequence)
+    return [
+        (content_hash(record), json.dumps(record, ensure_ascii=False))
+        for record in generator.iter_batch_records(batch)
+    ]
+
+def split_count(count: int, chunk_size: int) -> List[int]:
+    """Chia tổng số câu hỏi thành các phần không vượt quá chunk_size"""
+    chunks = [chunk_size] * (count // chunk_size)
+    if count % chunk_size:
+        chunks.append(count % chunk_size)
+    return chunks
+
+def generate_parallel(count: int, filename: str, difficulty: str = 'medium',
+                      seed: Optional[int] = None, workers: Optional[int] = None,
+                      chunk_size: int = DEFAULT_CHUNK_SIZE) -> Dict:
+    """Sinh `count` câu hỏi song song và ghi dần thành gói câu hỏi JSON
+
+    Mỗi phần nhận một SeedSequence con sinh từ `seed` nên kết quả xác định
+    với cùng seed và cùng chunk_size, không phụ thuộc số worker. Chỉ giữ tối
+    đa 2 phần mỗi worker đang chờ ghi; bộ nhớ còn lại là tập hash 16 byte.
+    """
+    if np is None:
+        raise ImportError("NumPy is required for parallel question generation")
+
+    workers = workers or os.cpu_count() or 1
+    chunks = split_count(count, chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+
+    seen = set()
+    stats = {'generated': 0, 'written': 0, 'duplicates': 0}
+
+    with open(filename, 'w', encoding='utf-8') as f, \
+            ProcessPoolExecutor(max_workers=workers) as executor:
+        f.write('{"questions": [\n')
+
+        pending = {}
+        next_chunk = 0
+        next_to_write = 0
+        completed = {}
+
+        while next_to_write < len(chunks):
+            # Giới hạn số phần đang xử lý để bộ nhớ không tăng theo count
+            while next_chunk < len(chunks) and len(pending) + len(completed) < workers * 2:
+                future = executor.submit(_generate_chunk, chunks[next_chunk], difficulty, seeds[next_chunk])
+                pending[future] = next_chunk
+                next_chunk += 1
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                completed[pending.pop(future)] = future.result()
+
+            # Ghi theo đúng thứ tự phần để kết quả xác định
+            while next_to_write in completed:
+                for digest, line in completed.pop(next_to_write):
+                    stats['generated'] += 1
+                    if digest in seen:
+                        stats['duplicates'] += 1
+                        continue
+                    seen.add(digest)
+                    if stats['written']:
+                        f.write(',\n')
+                    f.write(line)
+                    stats['written'] += 1
+                next_to_write += 1
+
+        f.write('\n]}\n')
+
+    return stats
+
+def main():
+    """Chạy sinh câu hỏi song song từ dòng lệnh"""
+    parser = argparse.ArgumentParser(description='Parallel question pack generator')
+    parser.add_argument('--count', '-n', type=int, default=100000, help='Number of questions')
+    parser.add_argument('--output', '-o', type=str, default='data/generated_questions.json',
+                        help='Output question pack')
+    parser.add_argument('--difficulty', type=str, choices=['easy', 'medium', 'hard'],
+                        default='medium', help='Question difficulty')
+    parser.add_argument('--seed', type=int, default=None, help='Root seed')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: all cores)')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help='Questions per worker task')
+
+    args = parser.parse_args()
+
+    stats = generate_parallel(
+        args.count, args.output, difficulty=args.difficulty, seed=args.seed,
+        workers=args.workers, chunk_size=args.chunk_size
+    )
+    print(f"Đã sinh {stats['generated']} câu hỏi, ghi {stats['written']} câu "
+          f"(bỏ {stats['duplicates']} câu trùng) vào {args.output}")
+
+if __name__ == "__main__":
+    main()
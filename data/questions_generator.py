@@ -5,9 +5,23 @@ Tạo câu hỏi toán học, logic và các chủ đề khác
 
 import random
 import json
-from typing import List, Dict
+from typing import List, Dict, Iterator, Optional
 from server.game_manager import Question
 
+try:
+    import numpy as np
+except ImportError:  # NumPy là tùy chọn, chỉ cần cho sinh câu hỏi theo lô
+    np = None
+
+# Cấu hình sinh câu hỏi toán học theo lô: (a_min, a_max, b_min, b_max, toán tử, độ lệch đáp án sai)
+BATCH_MATH_CONFIG = {
+    'easy': (1, 20, 1, 20, ('+', '-', '*'), 5),
+    'medium': (10, 50, 2, 15, ('*', '/', '+'), 10),
+}
+BATCH_HARD_MATH_SPREAD = 20
+BATCH_DIVISION_SPREAD = 2
+OPERATOR_SYMBOLS = {'+': '+', '-': '-', '*': '×', '/': '÷'}
+
 class QuestionGenerator:
     """Tạo câu hỏi tự động"""
     
@@ -284,6 +298,134 @@ class QuestionGenerator:
         
         return questions
     
+    def generate_math_batch(self, count: int, difficulty: str = 'medium',
+                            seed: Optional[int] = None) -> Dict[str, "np.ndarray"]:
+        """Tạo một lô câu hỏi toán học bằng NumPy
+
+        Trả về các mảng cùng độ dài `count`: toán hạng `a`, `b`, chỉ số toán tử
+        `op` (theo `operators`), `result`, `options` (count x 4) và
+        `correct_index`. Cùng `seed` luôn cho cùng kết quả.
+        """
+        if np is None:
+            raise ImportError("NumPy is required for batch question generation")
+        
+        rng = np.random.default_rng(seed)
+        
+        if difficulty == 'hard':
+            # Bình phương (op = 0) hoặc căn bậc hai (op = 1)
+            op = rng.integers(0, 2, size=count)
+            a = np.where(op == 0, rng.integers(10, 31, size=count), rng.integers(10, 21, size=count))
+            b = np.zeros(count, dtype=np.int64)
+            result = np.where(op == 0, a * a, a)
+            spread = np.full(count, BATCH_HARD_MATH_SPREAD)
+            operators = ('²', '√')
+        else:
+            a_min, a_max, b_min, b_max, operators, default_spread = BATCH_MATH_CONFIG.get(
+                difficulty, BATCH_MATH_CONFIG['medium'])
+            a = rng.integers(a_min, a_max + 1, size=count)
+            b = rng.integers(b_min, b_max + 1, size=count)
+            op = rng.integers(0, len(operators), size=count)
+            
+            result = np.select(
+                [op == i for i in range(len(operators))],
+                [self._apply_operator(symbol, a, b) for symbol in operators]
+            )
+            spread = np.full(count, default_spread)
+            if '/' in operators:
+                spread[op == operators.index('/')] = BATCH_DIVISION_SPREAD
+        
+        options, correct_index = self._batch_options(rng, result, spread)
+        
+        return {
+            'a': a,
+            'b': b,
+            'op': op,
+            'operators': operators,
+            'result': result,
+            'options': options,
+            'correct_index': correct_index,
+            'difficulty': difficulty
+        }
+    
+    @staticmethod
+    def _apply_operator(symbol: str, a, b):
+        """Áp dụng toán tử trên cả mảng"""
+        if symbol == '+':
+            return a + b
+        if symbol == '-':
+            return a - b
+        if symbol == '*':
+            return a * b
+        return a // b
+    
+    @staticmethod
+    def _batch_options(rng, result, spread):
+        """Tạo 4 lựa chọn không trùng nhau cho mỗi câu và xáo trộn vị trí
+
+        Đáp án sai được chọn không lặp từ các độ lệch khác 0 trong
+        [-spread, spread] nên không cần vòng lặp loại bỏ như bản từng câu.
+        """
+        count = len(result)
+        max_spread = int(spread.max()) if count else 1
+        offsets = np.concatenate([np.arange(-max_spread, 0), np.arange(1, max_spread + 1)])
+        
+        # Chỉ giữ các độ lệch nằm trong khoảng của từng câu, chọn 3 độ lệch ngẫu nhiên
+        keys = rng.random((count, offsets.size))
+        keys[np.abs(offsets)[None, :] > spread[:, None]] = 2.0
+        chosen = offsets[np.argsort(keys, axis=1)[:, :3]]
+        
+        candidates = np.concatenate([result[:, None], result[:, None] + chosen], axis=1)
+        
+        # Xáo trộn vị trí, đáp án đúng là cột 0 trước khi xáo trộn
+        order = np.argsort(rng.random((count, 4)), axis=1)
+        options = np.take_along_axis(candidates, order, axis=1)
+        correct_index = np.argmax(order == 0, axis=1)
+        return options, correct_index
+    
+    def iter_batch_records(self, batch: Dict[str, "np.ndarray"]) -> Iterator[Dict]:
+        """Chuyển một lô thành các bản ghi câu hỏi (cùng định dạng file JSON)"""
+        operators = batch['operators']
+        difficulty = batch['difficulty']
+        option_rows = batch['options'].tolist()
+        correct_letters = [chr(ord('A') + i) for i in batch['correct_index'].tolist()]
+        
+        for a, b, op, options, correct_answer in zip(batch['a'].tolist(), batch['b'].tolist(),
+                                                      batch['op'].tolist(), option_rows,
+                                                      correct_letters):
+            symbol = operators[op]
+            if symbol == '²':
+                question_text = f"{a}² = ?"
+            elif symbol == '√':
+                question_text = f"√{a * a} = ?"
+            else:
+                question_text = f"{a} {OPERATOR_SYMBOLS[symbol]} {b} = ?"
+            
+            yield {
+                "question_text": question_text,
+                "options": [str(option) for option in options],
+                "correct_answer": correct_answer,
+                "category": "math",
+                "difficulty": difficulty
+            }
+    
+    def batch_to_questions(self, batch: Dict[str, "np.ndarray"]) -> List[Question]:
+        """Chuyển một lô thành danh sách Question để nạp vào ngân hàng câu hỏi"""
+        return [Question(**record) for record in self.iter_batch_records(batch)]
+    
+    def save_batch_to_json(self, batch: Dict[str, "np.ndarray"], filename: str = "generated_questions.json"):
+        """Ghi một lô trực tiếp thành gói câu hỏi JSON mà không tạo đối tượng Question"""
+        total = 0
+        with open(filename, 'w', encoding='utf-8') as f:
+            f.write('{"questions": [\n')
+            for record in self.iter_batch_records(batch):
+                if total:
+                    f.write(',\n')
+                f.write(json.dumps(record, ensure_ascii=False))
+                total += 1
+            f.write('\n]}\n')
+        
+        print(f"Đã lưu {total} câu hỏi vào {filename}")
+    
     def save_questions_to_json(self, questions: List[Question], filename: str = "generated_questions.json"):
         """Lưu câu hỏi vào file JSON"""
         questions_data = []
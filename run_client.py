@@ -11,7 +11,7 @@ from pathlib import Path
 # Thêm thư mục gốc vào path
 sys.path.insert(0, str(Path(__file__).parent))
 
-from client.client import GameClient
+from client.client import GameClient, StartupProfile, setup_logging
 
 def main():
     """Main function"""
@@ -23,18 +23,16 @@ def main():
                        help='Server host')
     parser.add_argument('--port', type=int, default=5555, 
                        help='Server port')
+    parser.add_argument('--profile-startup', action='store_true',
+                       help='Report import and init timings once connected')
     
     args = parser.parse_args()
+    setup_logging()
     
     print("=" * 60)
     print("    FASTEST FINGER FIRST - CLIENT")
     print("=" * 60)
     
-    # Cập nhật cấu hình
-    import client.config as client_config
-    client_config.SERVER_HOST = args.host
-    client_config.SERVER_PORT = args.port
-    
     # Lấy username nếu không được cung cấp
     username = args.username
     if not username:
@@ -55,7 +53,8 @@ def main():
     print("=" * 60)
     
     # Tạo và chạy client
-    client = GameClient(ui_type=args.ui)
+    profile = StartupProfile() if args.profile_startup else None
+    client = GameClient(ui_type=args.ui, host=args.host, port=args.port, profile=profile)
     
     try:
         client.start(username=username)
@@ -7,12 +7,15 @@ import sys
 import os
 import json
 import logging
+import argparse
 from pathlib import Path
 
 # Thêm thư mục gốc vào path
 sys.path.insert(0, str(Path(__file__).parent))
 
 from server.server import GameServer
+from server.storage import STORAGE_BACKENDS, create_storage
+from server.config import STORAGE_BACKEND, MEMORY_SNAPSHOT_INTERVAL
 from server.game_manager import Question
 from data.questions_generator import QuestionGenerator
 
@@ -52,6 +55,15 @@ def generate_questions():
 
 def main():
     """Main function"""
+    parser = argparse.ArgumentParser(description='Fastest Finger First server')
+    parser.add_argument('--storage', choices=STORAGE_BACKENDS, default=STORAGE_BACKEND,
+                        help='Storage backend (memory = no disk I/O)')
+    parser.add_argument('--snapshot', type=str, default=None,
+                        help='Snapshot file for the memory backend')
+    parser.add_argument('--snapshot-interval', type=float, default=MEMORY_SNAPSHOT_INTERVAL,
+                        help='Seconds between memory snapshots (0 = only on shutdown)')
+    args = parser.parse_args()
+    
     print("=" * 60)
     print("    FASTEST FINGER FIRST - SERVER")
     print("=" * 60)
@@ -59,8 +71,14 @@ def main():
     # Load câu hỏi
     questions = load_questions_from_json()
     
-    # Tạo server
-    server = GameServer()
+    # Tạo backend lưu trữ và server
+    if args.storage == 'memory':
+        storage = create_storage('memory', snapshot_file=args.snapshot,
+                                 snapshot_interval=args.snapshot_interval)
+    else:
+        storage = create_storage(args.storage)
+    server = GameServer(storage=storage)
+    print(f"Using {args.storage} storage backend")
     
     # Thiết lập câu hỏi cho game
     server.game_manager.set_questions(questions)
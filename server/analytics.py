@@ -0,0 +1,223 @@
+"""
+Phân tích thời gian trả lời cho Fastest Finger First
+Nạp đáp án từ database hoặc trạng thái game đang chạy vào mảng NumPy và tính
+phân vị, histogram, thống kê theo chủ đề và dấu hiệu gian lận bằng phép toán vector
+"""
+
+import json
+import sqlite3
+import argparse
+from typing import Dict, List, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # NumPy là tùy chọn, chỉ cần cho module phân tích
+    np = None
+
+from .config import (
+    DATABASE_FILE, EXPORT_CHUNK_SIZE, ANALYTICS_PERCENTILES, ANALYTICS_HISTOGRAM_BINS,
+    ANALYTICS_FAST_THRESHOLD, ANALYTICS_FAST_STREAK_LENGTH
+)
+from .export import MIN_TIME, MAX_TIME, open_readonly
+
+ANSWERS_QUERY = '''
+    SELECT a.player_username, q.category, a.game_id, a.response_time_us, a.is_correct
+    FROM games g
+    JOIN used_questions q ON q.game_id = g.id
+    JOIN answers a ON a.question_id = q.id
+    WHERE g.start_time >= ? AND g.start_time < ?
+    ORDER BY g.start_time, g.id, q.id, a.id
+'''
+
+class AnswerArrays:
+    """Đáp án dạng cột: mỗi thuộc tính là một mảng NumPy cùng độ dài
+    
+    Tên người chơi và chủ đề được mã hóa thành số nguyên (chỉ số trong
+    `players` / `categories`). Thứ tự các dòng là thứ tự thời gian.
+    """
+    
+    def __init__(self, players: List[str], categories: List[str], player_codes, category_codes,
+                 game_ids, response_times, is_correct):
+        self.players = players
+        self.categories = categories
+        self.player_codes = player_codes
+        self.category_codes = category_codes
+        self.game_ids = game_ids
+        self.response_times = response_times
+        self.is_correct = is_correct
+    
+    def __len__(self) -> int:
+        return len(self.response_times)
+
+def _require_numpy():
+    """Báo lỗi rõ ràng khi thiếu NumPy"""
+    if np is None:
+        raise ImportError("NumPy is required for response-time analytics")
+
+def load_answers(conn: sqlite3.Connection, since: Optional[str] = None, until: Optional[str] = None,
+                 chunk_size: int = EXPORT_CHUNK_SIZE) -> AnswerArrays:
+    """Nạp đáp án từ database theo từng phần vào mảng NumPy"""
+    _require_numpy()
+    
+    player_index: Dict[str, int] = {}
+    category_index: Dict[str, int] = {}
+    chunks = []
+    
+    cursor = conn.cursor()
+    cursor.arraysize = chunk_size
+    cursor.execute(ANSWERS_QUERY, (since or MIN_TIME, until or MAX_TIME))
+    while True:
+        rows = cursor.fetchmany()
+        if not rows:
+            break
+        
+        players, categories, game_ids, response_times, is_correct = zip(*rows)
+        chunks.append((
+            np.fromiter((player_index.setdefault(p, len(player_index)) for p in players),
+                        dtype=np.int32, count=len(rows)),
+            np.fromiter((category_index.setdefault(c or 'general', len(category_index)) for c in categories),
+                        dtype=np.int32, count=len(rows)),
+            np.array(game_ids, dtype=np.int64),
+            np.array(response_times, dtype=np.int64),
+            np.array(is_correct, dtype=bool)
+        ))
+    
+    if chunks:
+        columns = [np.concatenate(parts) for parts in zip(*chunks)]
+    else:
+        columns = [np.empty(0, dtype=dtype) for dtype in [np.int32, np.int32, np.int64, np.int64, bool]]
+    return AnswerArrays(
+        list(player_index), list(category_index),
+        columns[0], columns[1], columns[2], columns[3] / 1_000_000, columns[4]
+    )
+
+def from_game_manager(game_manager) -> AnswerArrays:
+    """Lấy thời gian trả lời của trận đang chạy (không có đúng/sai từng câu)"""
+    _require_numpy()
+    
+    players = list(game_manager.players)
+    counts = [len(game_manager.players[name].response_times) for name in players]
+    response_times = np.fromiter(
+        (t for name in players for t in game_manager.players[name].response_times),
+        dtype=np.float64, count=sum(counts)
+    )
+    player_codes = np.repeat(np.arange(len(players), dtype=np.int32), counts)
+    return AnswerArrays(
+        players, ['general'], player_codes, np.zeros(len(response_times), dtype=np.int32),
+        np.full(len(response_times), game_manager.game_id or 0, dtype=np.int64),
+        response_times, np.zeros(len(response_times), dtype=bool)
+    )
+
+def percentiles(values, qs: Sequence[float] = ANALYTICS_PERCENTILES) -> Dict[str, Optional[float]]:
+    """Tính các phân vị (theo %) của một mảng"""
+    _require_numpy()
+    if len(values) == 0:
+        return {f"p{q:g}": None for q in qs}
+    return {f"p{q:g}": float(v) for q, v in zip(qs, np.percentile(values, qs))}
+
+def histogram(values, bins: int = ANALYTICS_HISTOGRAM_BINS, value_range=None) -> Dict[str, List]:
+    """Histogram thời gian trả lời"""
+    _require_numpy()
+    counts, edges = np.histogram(values, bins=bins, range=value_range)
+    return {'edges': edges.tolist(), 'counts': counts.tolist()}
+
+def _grouped_summary(codes, names: List[str], data: AnswerArrays) -> Dict[str, Dict]:
+    """Số câu, tỉ lệ đúng, trung bình và phân vị thời gian theo nhóm"""
+    totals = np.bincount(codes, minlength=len(names))
+    correct = np.bincount(codes, weights=data.is_correct, minlength=len(names))
+    time_sums = np.bincount(codes, weights=data.response_times, minlength=len(names))
+    
+    # Sắp xếp theo nhóm một lần rồi cắt mảng cho từng nhóm
+    order = np.argsort(codes, kind='stable')
+    sorted_times = data.response_times[order]
+    bounds = np.concatenate(([0], np.cumsum(totals)))
+    
+    summary = {}
+    for code, name in enumerate(names):
+        if totals[code] == 0:
+            continue
+        summary[name] = {
+            'answers': int(totals[code]),
+            'accuracy': float(correct[code] / totals[code]),
+            'mean_response_time': float(time_sums[code] / totals[code]),
+            **percentiles(sorted_times[bounds[code]:bounds[code + 1]])
+        }
+    return summary
+
+def per_category(data: AnswerArrays) -> Dict[str, Dict]:
+    """Thống kê theo chủ đề câu hỏi"""
+    _require_numpy()
+    return _grouped_summary(data.category_codes, data.categories, data)
+
+def per_player(data: AnswerArrays) -> Dict[str, Dict]:
+    """Thống kê theo người chơi"""
+    _require_numpy()
+    return _grouped_summary(data.player_codes, data.players, data)
+
+def fast_streaks(data: AnswerArrays, threshold: float = ANALYTICS_FAST_THRESHOLD,
+                 min_length: int = ANALYTICS_FAST_STREAK_LENGTH) -> List[Dict]:
+    """Tìm người chơi có chuỗi trả lời đúng nhanh bất thường
+    
+    Một chuỗi là các câu liên tiếp (theo thời gian, của cùng người chơi) vừa
+    đúng vừa nhanh hơn `threshold` giây, dưới ngưỡng phản xạ của người thật.
+    """
+    _require_numpy()
+    if len(data) == 0:
+        return []
+    
+    # Gom đáp án theo người chơi, giữ thứ tự thời gian trong từng người
+    order = np.argsort(data.player_codes, kind='stable')
+    players = data.player_codes[order]
+    flags = (data.is_correct & (data.response_times < threshold))[order]
+    
+    # Chia thành các đoạn liên tiếp cùng người chơi và cùng cờ
+    change = np.flatnonzero((np.diff(players) != 0) | (np.diff(flags.astype(np.int8)) != 0)) + 1
+    starts = np.concatenate(([0], change))
+    lengths = np.diff(np.concatenate((starts, [len(flags)])))
+    
+    suspicious = flags[starts] & (lengths >= min_length)
+    longest = np.zeros(len(data.players), dtype=np.int64)
+    np.maximum.at(longest, players[starts[suspicious]], lengths[suspicious])
+    
+    totals = np.bincount(data.player_codes, minlength=len(data.players))
+    fast_correct = np.bincount(players, weights=flags, minlength=len(data.players))
+    return [
+        {
+            'username': data.players[code],
+            'longest_streak': int(longest[code]),
+            'fast_correct_answers': int(fast_correct[code]),
+            'answers': int(totals[code])
+        }
+        for code in np.argsort(-longest, kind='stable') if longest[code] > 0
+    ]
+
+def build_report(data: AnswerArrays) -> Dict:
+    """Báo cáo tổng hợp"""
+    return {
+        'answers': len(data),
+        'players': len(data.players),
+        'response_time': percentiles(data.response_times),
+        'histogram': histogram(data.response_times),
+        'categories': per_category(data),
+        'suspicious_players': fast_streaks(data)
+    }
+
+def main():
+    """Chạy báo cáo phân tích từ dòng lệnh"""
+    parser = argparse.ArgumentParser(description='Response-time analytics report')
+    parser.add_argument('--db', type=str, default=DATABASE_FILE, help='Database file')
+    parser.add_argument('--since', type=str, default=None, help='Only games started at or after this time')
+    parser.add_argument('--until', type=str, default=None, help='Only games started before this time')
+    
+    args = parser.parse_args()
+    
+    conn = open_readonly(args.db)
+    try:
+        data = load_answers(conn, args.since, args.until)
+    finally:
+        conn.close()
+    
+    print(json.dumps(build_report(data), ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+"""
+Lưu trữ (archive) các trận đấu cũ cho Fastest Finger First
+Chuyển các trận cũ hơn một khoảng thời gian sang file nén theo tháng,
+xóa khỏi database chính và vẫn phục vụ được lịch sử khi cần
+"""
+
+import os
+import gzip
+import json
+import zlib
+import sqlite3
+import logging
+import argparse
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .config import DATABASE_FILE, ARCHIVE_DIR, ARCHIVE_MAX_AGE_DAYS, ARCHIVE_BATCH_SIZE
+from .database import GameDatabase
+from .storage import PLAYER_HISTORY_COLUMNS
+
+ARCHIVE_INDEX_FILE = 'index.db'
+ARCHIVE_READ_CHUNK = 64 * 1024  # Số byte đọc mỗi lần khi giải nén một member
+
+# Cột lịch sử được chép vào index để tra lịch sử người chơi không phải giải nén file
+HISTORY_INDEX_COLUMNS = ['start_time', 'end_time', 'total_players', 'winner',
+                         'score', 'correct_answers', 'wrong_answers']
+
+class GameArchiver:
+    """Chuyển trận đấu cũ ra file nén (một file mỗi tháng, chỉ ghi thêm) kèm index"""
+    
+    def __init__(self, database: GameDatabase, archive_dir: str = ARCHIVE_DIR,
+                 batch_size: int = ARCHIVE_BATCH_SIZE):
+        self.database = database
+        self.archive_dir = archive_dir
+        self.batch_size = batch_size
+        self.logger = logging.getLogger(__name__)
+        
+        os.makedirs(archive_dir, exist_ok=True)
+        self.index = sqlite3.connect(os.path.join(archive_dir, ARCHIVE_INDEX_FILE), check_same_thread=False)
+        self._lock = threading.Lock()  # Index được đọc từ nhiều thread khi server phục vụ lịch sử
+        self._init_index()
+    
+    def _init_index(self):
+        """Khởi tạo index
+        
+        archived_games: trận nằm ở member gzip nào (vị trí byte) của file tháng
+        nào; archived_players: dòng lịch sử của từng người chơi trong trận.
+        """
+        with self.index:
+            self.index.execute('''
+                CREATE TABLE IF NOT EXISTS archived_games (
+                    game_id INTEGER PRIMARY KEY,
+                    month TEXT NOT NULL,
+                    start_time TIMESTAMP,
+                    member_offset INTEGER
+                )
+            ''')
+            self.index.execute('''
+                CREATE TABLE IF NOT EXISTS archived_players (
+                    username TEXT NOT NULL,
+                    game_id INTEGER NOT NULL,
+                    start_time TIMESTAMP,
+                    end_time TIMESTAMP,
+                    total_players INTEGER,
+                    winner TEXT,
+                    score INTEGER,
+                    correct_answers INTEGER,
+                    wrong_answers INTEGER,
+                    PRIMARY KEY (username, game_id)
+                ) WITHOUT ROWID
+            ''')
+        self._upgrade_index()
+    
+    def _upgrade_index(self):
+        """Nâng cấp index của bản cũ (chỉ có tháng của trận và tên người chơi)
+        
+        Trận cũ không có vị trí member nên vẫn được đọc từ cả file tháng; dòng
+        lịch sử được chép vào index một lần bằng cách đọc lại các file tháng.
+        """
+        game_columns = {row[1] for row in self.index.execute("PRAGMA table_info(archived_games)")}
+        player_columns = {row[1] for row in self.index.execute("PRAGMA table_info(archived_players)")}
+        
+        with self.index:
+            if 'member_offset' not in game_columns:
+                self.index.execute("ALTER TABLE archived_games ADD COLUMN member_offset INTEGER")
+            if 'score' in player_columns:
+                return
+            
+            for column in HISTORY_INDEX_COLUMNS:
+                self.index.execute(f"ALTER TABLE archived_players ADD COLUMN {column}")
+            assignments = ', '.join(f"{column} = ?" for column in HISTORY_INDEX_COLUMNS)
+            months = [row[0] for row in self.index.execute("SELECT DISTINCT month FROM archived_games")]
+            for month in months:
+                self.index.executemany(
+                    f"UPDATE archived_players SET {assignments} WHERE username = ? AND game_id = ?",
+                    [row[2:] + row[:2] for record in self.iter_month(month) for row in self._history_rows(record)]
+                )
+        self.logger.info("Archive index upgraded with player history rows")
+    
+    def close(self):
+        """Đóng index"""
+        self.index.close()
+    
+    def archive_file(self, month: str) -> str:
+        """Đường dẫn file lưu trữ của một tháng (YYYY-MM)"""
+        return os.path.join(self.archive_dir, f"games-{month}.jsonl.gz")
+    
+    def archive_older_than(self, max_age_days: int = ARCHIVE_MAX_AGE_DAYS) -> Dict:
+        """Lưu trữ và xóa các trận bắt đầu trước max_age_days ngày"""
+        # start_time được SQLite ghi theo UTC
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=max_age_days)).strftime('%Y-%m-%d %H:%M:%S')
+        stats = {'games': 0, 'batches': 0, 'cutoff': cutoff}
+        
+        while True:
+            with self.database.transaction() as cursor:
+                cursor.execute(
+                    "SELECT id FROM games WHERE start_time < ? ORDER BY id LIMIT ?",
+                    (cutoff, self.batch_size)
+                )
+                game_ids = [row[0] for row in cursor.fetchall()]
+            
+            if not game_ids:
+                break
+            
+            self.archive_games(game_ids)
+            stats['games'] += len(game_ids)
+            stats['batches'] += 1
+        
+        self.logger.info(f"Archived {stats['games']} games older than {cutoff} in {stats['batches']} batches")
+        return stats
+    
+    def archive_games(self, game_ids: List[int]):
+        """Ghi một lô trận vào file lưu trữ rồi xóa khỏi database chính
+        
+        File được ghi và fsync trước khi xóa; nếu bị dừng giữa chừng, lần chạy
+        sau ghi lại lô đó và bản ghi trùng được bỏ qua khi đọc.
+        """
+        records = self._load_records(game_ids)
+        
+        by_month: Dict[str, List[Dict]] = {}
+        for record in records:
+            month = (record['game']['start_time'] or '0000-00')[:7]
+            by_month.setdefault(month, []).append(record)
+        
+        offsets: Dict[str, int] = {}
+        for month, month_records in by_month.items():
+            # Mỗi lần ghi thêm là một gzip member mới, gzip đọc liên tiếp được
+            with open(self.archive_file(month), 'ab') as raw:
+                offsets[month] = raw.seek(0, os.SEEK_END)
+                with gzip.GzipFile(fileobj=raw, mode='wb') as f:
+                    for record in month_records:
+                        f.write((json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8'))
+                raw.flush()
+                os.fsync(raw.fileno())
+        
+        with self._lock, self.index:
+            self.index.executemany(
+                "INSERT OR IGNORE INTO archived_games (game_id, month, start_time, member_offset) VALUES (?, ?, ?, ?)",
+                [(r['game']['id'], month, r['game']['start_time'], offsets[month])
+                 for month, month_records in by_month.items() for r in month_records]
+            )
+            self.index.executemany(
+                f"INSERT OR IGNORE INTO archived_players (username, game_id, {', '.join(HISTORY_INDEX_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * (len(HISTORY_INDEX_COLUMNS) + 2))})",
+                [row for r in records for row in self._history_rows(r)]
+            )
+        
+        placeholders = ','.join('?' * len(game_ids))
+        with self.database.transaction() as cursor:
+            cursor.execute(f"DELETE FROM answers WHERE game_id IN ({placeholders})", game_ids)
+            cursor.execute(f"DELETE FROM used_questions WHERE game_id IN ({placeholders})", game_ids)
+            cursor.execute(f"DELETE FROM game_details WHERE game_id IN ({placeholders})", game_ids)
+            cursor.execute(f"DELETE FROM games WHERE id IN ({placeholders})", game_ids)
+        
+        self.database.history_cache.invalidate_many(
+            {detail['player_username'] for r in records for detail in r['details']}
+        )
+    
+    def _load_records(self, game_ids: List[int]) -> List[Dict]:
+        """Đọc trận, chi tiết, câu hỏi và đáp án của một lô trận"""
+        placeholders = ','.join('?' * len(game_ids))
+        records = {}
+        
+        with self.database.transaction() as cursor:
+            for game in self._select(cursor, f"SELECT * FROM games WHERE id IN ({placeholders})", game_ids):
+                records[game['id']] = {'game': game, 'details': [], 'questions': [], 'answers': []}
+            
+            for table, key in [('game_details', 'details'), ('used_questions', 'questions'), ('answers', 'answers')]:
+                query = f"SELECT * FROM {table} WHERE game_id IN ({placeholders}) ORDER BY id"
+                for row in self._select(cursor, query, game_ids):
+                    records[row['game_id']][key].append(row)
+        
+        return list(records.values())
+    
+    @staticmethod
+    def _history_rows(record: Dict) -> List[Tuple]:
+        """Các dòng archived_players của một trận: (username, game_id, *HISTORY_INDEX_COLUMNS)"""
+        game = record['game']
+        return [
+            (detail['player_username'], game['id'], game['start_time'], game['end_time'], game['total_players'],
+             game['winner'], detail['score'], detail['correct_answers'], detail['wrong_answers'])
+            for detail in record['details']
+        ]
+    
+    @staticmethod
+    def _select(cursor, query: str, params) -> List[Dict]:
+        """Chạy truy vấn và trả về các dòng dạng dict"""
+        cursor.execute(query, params)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    
+    def iter_month(self, month: str) -> Iterator[Dict]:
+        """Đọc lần lượt các trận trong file lưu trữ của một tháng (bỏ bản ghi trùng)"""
+        path = self.archive_file(month)
+        if not os.path.exists(path):
+            return
+        
+        seen = set()
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                record = json.loads(line)
+                game_id = record['game']['id']
+                if game_id not in seen:
+                    seen.add(game_id)
+                    yield record
+    
+    def iter_member(self, month: str, offset: int) -> Iterator[Dict]:
+        """Đọc các trận trong một gzip member của file tháng, không giải nén phần còn lại của file"""
+        path = self.archive_file(month)
+        if not os.path.exists(path):
+            return
+        
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)  # Dừng ở cuối member đầu tiên
+        pending = b''
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            while not decompressor.eof:
+                chunk = f.read(ARCHIVE_READ_CHUNK)
+                if not chunk:
+                    break
+                *lines, pending = (pending + decompressor.decompress(chunk)).split(b'\n')
+                for line in lines:
+                    yield json.loads(line)
+    
+    def get_archived_games(self, game_ids: List[int]) -> List[Dict]:
+        """Lấy các trận đã lưu trữ theo id, chỉ giải nén các member chứa chúng"""
+        if not game_ids:
+            return []
+        
+        placeholders = ','.join('?' * len(game_ids))
+        with self._lock:
+            rows = self.index.execute(
+                f"SELECT game_id, month, member_offset FROM archived_games WHERE game_id IN ({placeholders})",
+                list(game_ids)
+            ).fetchall()
+        
+        wanted_by_member: Dict[Tuple[str, Optional[int]], set] = {}
+        for game_id, month, offset in rows:
+            wanted_by_member.setdefault((month, offset), set()).add(game_id)
+        
+        records = {}
+        for (month, offset), wanted in wanted_by_member.items():
+            # Trận lưu bởi bản cũ không có vị trí member: đọc cả file tháng
+            source = self.iter_month(month) if offset is None else self.iter_member(month, offset)
+            for record in source:
+                if record['game']['id'] in wanted:
+                    records.setdefault(record['game']['id'], record)
+        return [records[game_id] for game_id in sorted(records)]
+    
+    def get_player_history_rows(self, username: str, cursor_position=None,
+                                limit: Optional[int] = None) -> List[List]:
+        """Các dòng lịch sử (theo PLAYER_HISTORY_COLUMNS) đã lưu trữ của người chơi, mới nhất trước
+        
+        Chỉ lấy các trận có (start_time, id) nhỏ hơn `cursor_position` nếu có,
+        tối đa `limit` trận. Chỉ đọc index, không giải nén file lưu trữ.
+        """
+        query = f"SELECT game_id, {', '.join(HISTORY_INDEX_COLUMNS)} FROM archived_players WHERE username = ?"
+        params = [username]
+        if cursor_position:
+            query += " AND (start_time, game_id) < (?, ?)"
+            params.extend(cursor_position)
+        query += " ORDER BY start_time DESC, game_id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        
+        with self._lock:
+            return [list(row) for row in self.index.execute(query, params)]
+    
+    def get_player_history(self, username: str) -> List[Dict]:
+        """Lấy các trận đã lưu trữ của người chơi (mới nhất trước)"""
+        return [dict(zip(PLAYER_HISTORY_COLUMNS, row)) for row in self.get_player_history_rows(username)]
+
+def main():
+    """Chạy lưu trữ từ dòng lệnh"""
+    parser = argparse.ArgumentParser(description='Archive old games out of the hot database')
+    parser.add_argument('--db', type=str, default=DATABASE_FILE, help='Database file')
+    parser.add_argument('--archive-dir', type=str, default=ARCHIVE_DIR, help='Archive directory')
+    parser.add_argument('--max-age-days', type=int, default=ARCHIVE_MAX_AGE_DAYS,
+                        help='Archive games older than this many days')
+    parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE, help='Games per transaction')
+    parser.add_argument('--vacuum', action='store_true', help='VACUUM the database afterwards to shrink the file')
+    
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    
+    database = GameDatabase(args.db)
+    archiver = GameArchiver(database, args.archive_dir, args.batch_size)
+    try:
+        stats = archiver.archive_older_than(args.max_age_days)
+        print(f"Archived {stats['games']} games started before {stats['cutoff']}")
+        
+        if args.vacuum:
+            database.conn.execute("VACUUM")
+            print("Database vacuumed")
+    finally:
+        archiver.close()
+        database.close()
+
+if __name__ == "__main__":
+    main()
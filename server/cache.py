@@ -0,0 +1,91 @@
+"""
+Bộ nhớ đệm LRU có thời hạn cho Fastest Finger First
+Dùng để giảm truy vấn database cho dữ liệu người chơi được đọc lặp lại
+"""
+
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+class LRUCache:
+    """Cache giới hạn số phần tử, loại phần tử ít dùng nhất và hết hạn sau ttl giây
+    
+    `generation` tăng sau mỗi lần xóa. Bên đọc database lấy generation trước
+    khi đọc và truyền vào put(); nếu đã có lần xóa xảy ra trong lúc đọc, giá
+    trị có thể đã cũ và không được đưa vào cache.
+    """
+    
+    def __init__(self, maxsize: int = 1000, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.generation = 0
+        
+        # Bộ đếm
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Lấy giá trị, trả về default nếu không có hoặc đã hết hạn"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            
+            self.misses += 1
+            return default
+    
+    def put(self, key: Hashable, value: Any, generation: Optional[int] = None):
+        """Thêm hoặc cập nhật giá trị, bỏ qua nếu cache đã bị xóa sau `generation`"""
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+    
+    def invalidate(self, key: Hashable):
+        """Xóa một phần tử khỏi cache"""
+        with self._lock:
+            self._data.pop(key, None)
+            self.generation += 1
+    
+    def invalidate_many(self, keys):
+        """Xóa nhiều phần tử khỏi cache với một lần khóa"""
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+            self.generation += 1
+    
+    def clear(self):
+        """Xóa toàn bộ cache"""
+        with self._lock:
+            self._data.clear()
+            self.generation += 1
+    
+    def get_stats(self) -> Dict:
+        """Lấy thống kê cache"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / total if total else 0.0
+            }
+    
+    def __len__(self) -> int:
+        return len(self._data)
@@ -21,6 +21,56 @@ POINTS_DEDUCTION_FOR_WRONG = 0  # Không trừ điểm cho câu trả lời sai
 
 # Cấu hình database
 DATABASE_FILE = 'game_data.db'
+DATABASE_JOURNAL_MODE = 'WAL'  # WAL cho phép đọc song song khi đang ghi
+DATABASE_SYNCHRONOUS = 'NORMAL'  # Chỉ fsync khi checkpoint thay vì mỗi lần commit
+DATABASE_BUSY_TIMEOUT = 5.0  # Thời gian chờ khi database bị khóa (giây)
+DATABASE_CACHED_STATEMENTS = 256  # Số prepared statement được cache trên kết nối
+
+# Cấu hình cache dữ liệu người chơi
+PLAYER_CACHE_SIZE = 5000  # Số hồ sơ người chơi tối đa trong cache
+PLAYER_CACHE_TTL = 300  # Thời gian sống của hồ sơ trong cache (giây)
+HISTORY_CACHE_SIZE = 1000  # Số lịch sử trận đấu tối đa trong cache
+HISTORY_CACHE_TTL = 60  # Thời gian sống của lịch sử trong cache (giây)
+
+# Cấu hình phân trang lịch sử
+HISTORY_PAGE_SIZE = 50  # Số dòng mặc định mỗi trang
+MAX_HISTORY_PAGE_SIZE = 200  # Số dòng tối đa mỗi trang
+
+# Cấu hình ghi trễ (write-behind) xuống database
+WRITE_BEHIND_QUEUE_SIZE = 10000  # Số thao tác ghi tối đa đang chờ
+WRITE_BEHIND_BATCH_SIZE = 500  # Số thao tác tối đa trong một transaction
+WRITE_BEHIND_SHUTDOWN_TIMEOUT = 10.0  # Thời gian chờ ghi hết hàng đợi khi dừng server (giây)
+
+# Cấu hình lưu trữ (archive) các trận đấu cũ
+ARCHIVE_DIR = 'archive'  # Thư mục chứa file lưu trữ theo tháng và index
+ARCHIVE_MAX_AGE_DAYS = 180  # Trận cũ hơn số ngày này được chuyển ra file lưu trữ
+ARCHIVE_BATCH_SIZE = 500  # Số trận xóa trong một transaction
+
+# Cấu hình backend lưu trữ
+STORAGE_BACKEND = 'sqlite'  # 'sqlite' hoặc 'memory' (không ghi ổ đĩa)
+MEMORY_SNAPSHOT_FILE = None  # File snapshot cho backend memory (None = không lưu)
+MEMORY_SNAPSHOT_INTERVAL = 60.0  # Chu kỳ ghi snapshot (giây), 0 = chỉ ghi khi dừng server
+MEMORY_MAX_ANSWERS = 1_000_000  # Số đáp án giữ lại trong bộ nhớ, đáp án cũ nhất bị bỏ trước
+
+# Cấu hình xuất dữ liệu phân tích
+EXPORT_CHUNK_SIZE = 5000  # Số dòng đọc và ghi mỗi lần
+
+# Cấu hình thống kê độ khó câu hỏi
+QUESTION_STATS_FLUSH_INTERVAL = 30.0  # Chu kỳ lưu thống kê câu hỏi đã thay đổi (giây)
+QUESTION_STATS_SKETCH_ACCURACY = 0.02  # Sai số tương đối của phân vị thời gian trả lời
+DIFFICULTY_PRIORS = {'easy': 0.2, 'medium': 0.4, 'hard': 0.6}  # Tỉ lệ sai ước lượng theo mức độ gắn sẵn
+DIFFICULTY_PRIOR_WEIGHT = 5  # Số câu trả lời "ảo" của prior khi ước lượng độ khó
+DIFFICULTY_CURVE = None  # Độ khó mục tiêu từng câu, vd [0.2, 0.3, 0.4, 0.5, 0.6]; None = giữ thứ tự
+
+# Cấu hình phân tích thời gian trả lời
+ANALYTICS_PERCENTILES = (50, 90, 99)  # Các phân vị trong báo cáo (%)
+ANALYTICS_HISTOGRAM_BINS = 30  # Số cột histogram thời gian trả lời
+ANALYTICS_FAST_THRESHOLD = 0.15  # Trả lời đúng nhanh hơn mức này (giây) bị coi là bất thường
+ANALYTICS_FAST_STREAK_LENGTH = 5  # Độ dài chuỗi trả lời nhanh bất thường để bị gắn cờ
+
+# Cấu hình kết nối lại (resume)
+RESUME_TOKEN_TTL = 120  # Thời gian giữ người chơi và tên sau khi mất kết nối (giây)
+RESUME_REPLAY_SIZE = 50  # Số SCORE_UPDATE gần nhất giữ lại để phát lại khi resume
 LOG_FILE = 'server.log'
 
 # Cấu hình logging
@@ -50,4 +100,7 @@ class MessageType:
     GAME_START = 'game_start'
     GAME_END = 'game_end'
     ERROR = 'error'
-    INFO = 'info' 
\ No newline at end of file
+    INFO = 'info'
+    HISTORY = 'history'
+    RECENT_GAMES = 'recent_games'
+    TELEMETRY = 'telemetry' 
\ No newline at end of file
@@ -3,112 +3,250 @@ Module quản lý cơ sở dữ liệu cho Fastest Finger First
 Sử dụng SQLite để lưu trữ dữ liệu người chơi, trận đấu và câu hỏi
 """
 
+import copy
 import sqlite3
-import json
 import logging
+import threading
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
-from .config import DATABASE_FILE
+from typing import Callable, Dict, List, Optional, Tuple
+from .config import (
+    HISTORY_PAGE_SIZE, MAX_HISTORY_PAGE_SIZE, DATABASE_FILE, DATABASE_JOURNAL_MODE, DATABASE_SYNCHRONOUS,
+    DATABASE_BUSY_TIMEOUT, DATABASE_CACHED_STATEMENTS,
+    PLAYER_CACHE_SIZE, PLAYER_CACHE_TTL, HISTORY_CACHE_SIZE, HISTORY_CACHE_TTL
+)
+from .migrations import apply_migrations
+from .leaderboard import LeaderboardIndex
+from .cache import LRUCache
+from .storage import StorageBackend, RECENT_GAMES_COLUMNS, PLAYER_HISTORY_COLUMNS
 
-class GameDatabase:
+# Truy vấn dùng chung (được kiểm tra query plan trong test)
+RECENT_GAMES_QUERY = '''
+    SELECT id, start_time, end_time, total_players, winner
+    FROM games
+    ORDER BY start_time DESC
+    LIMIT ?
+'''
+
+PLAYER_HISTORY_QUERY = '''
+    SELECT g.id, g.start_time, g.end_time, g.total_players, g.winner,
+           gd.score, gd.correct_answers, gd.wrong_answers
+    FROM games g
+    JOIN game_details gd ON g.id = gd.game_id
+    WHERE gd.player_username = ?
+    ORDER BY g.start_time DESC, g.id DESC
+'''
+
+# Phân trang keyset theo (start_time, id) giảm dần
+RECENT_GAMES_PAGE_QUERY = '''
+    SELECT id, start_time, end_time, total_players, winner
+    FROM games
+    WHERE (start_time, id) < (?, ?)
+    ORDER BY start_time DESC, id DESC
+    LIMIT ?
+'''
+
+PLAYER_HISTORY_PAGE_QUERY = '''
+    SELECT g.id, g.start_time, g.end_time, g.total_players, g.winner,
+           gd.score, gd.correct_answers, gd.wrong_answers
+    FROM game_details gd
+    JOIN games g ON g.id = gd.game_id
+    WHERE gd.player_username = ? AND (gd.game_start_time, gd.game_id) < (?, ?)
+    ORDER BY gd.game_start_time DESC, gd.game_id DESC
+    LIMIT ?
+'''
+
+# Cursor trang đầu: lớn hơn mọi (start_time, id)
+FIRST_PAGE_CURSOR = ('9999-12-31 23:59:59', 2 ** 63 - 1)
+
+def build_answer_rows(game_id: int, question_id: int, correct_answer: str,
+                      player_answers: Dict) -> List[Tuple]:
+    """Chuyển dict đáp án của một câu hỏi thành các dòng cho bảng answers"""
+    rows = []
+    for username, answer_data in player_answers.items():
+        answer = str(answer_data.get('answer', ''))
+        letter = answer.strip().upper()
+        answer_index = ord(letter) - ord('A') if len(letter) == 1 and 'A' <= letter <= 'D' else None
+        rows.append((
+            game_id,
+            question_id,
+            username,
+            answer_index,
+            int(answer.lower() == correct_answer.lower()),
+            int(round(answer_data.get('response_time', 0) * 1_000_000))
+        ))
+    return rows
+
+class GameDatabase(StorageBackend):
+    """Backend lưu trữ SQLite"""
+    
     def __init__(self, db_file: str = DATABASE_FILE):
         """Khởi tạo database"""
         self.db_file = db_file
         self.logger = logging.getLogger(__name__)
+        
+        # Một kết nối dùng chung cho mọi thread, truy cập tuần tự qua lock
+        self._lock = threading.RLock()
+        self._transaction_depth = 0
+        self._after_commit: List[Callable] = []  # Việc chạy khi transaction ngoài cùng commit
+        self.conn = self._connect()
+        
+        # Bảng xếp hạng toàn thời gian trong bộ nhớ
+        self.leaderboard = LeaderboardIndex()
+        
+        # Cache hồ sơ và lịch sử người chơi, bị xóa khi lưu kết quả trận
+        self.player_cache = LRUCache(PLAYER_CACHE_SIZE, PLAYER_CACHE_TTL)
+        self.history_cache = LRUCache(HISTORY_CACHE_SIZE, HISTORY_CACHE_TTL)
+        
+        # Kho lưu trữ trận cũ (GameArchiver), nếu có thì lịch sử người chơi đọc tiếp từ đó
+        self.archive = None
+        
         self.init_database()
     
+    def _connect(self) -> sqlite3.Connection:
+        """Mở kết nối lâu dài và thiết lập các pragma"""
+        conn = sqlite3.connect(
+            self.db_file,
+            timeout=DATABASE_BUSY_TIMEOUT,
+            cached_statements=DATABASE_CACHED_STATEMENTS,
+            check_same_thread=False,
+            isolation_level=None  # Tự quản lý BEGIN/COMMIT trong transaction()
+        )
+        conn.execute(f"PRAGMA journal_mode = {DATABASE_JOURNAL_MODE}")
+        conn.execute(f"PRAGMA synchronous = {DATABASE_SYNCHRONOUS}")
+        conn.execute(f"PRAGMA busy_timeout = {int(DATABASE_BUSY_TIMEOUT * 1000)}")
+        return conn
+    
+    def writer_view(self) -> 'GameDatabase':
+        """Bản dùng kết nối riêng cho thread ghi, chung cache và bảng xếp hạng
+        
+        Với WAL, các lệnh đọc trên kết nối chính không phải chờ transaction
+        của thread ghi. Database trong bộ nhớ không mở được kết nối thứ hai
+        nên dùng chung kết nối này.
+        """
+        if self.db_file == ':memory:':
+            return self
+        
+        writer = copy.copy(self)
+        writer._lock = threading.RLock()
+        writer._transaction_depth = 0
+        writer._after_commit = []
+        writer.conn = writer._connect()
+        return writer
+    
+    @contextmanager
+    def transaction(self):
+        """Chạy các câu lệnh trong một transaction, trả về cursor
+        
+        Có thể lồng nhau: chỉ transaction ngoài cùng mới BEGIN/COMMIT, nhờ vậy
+        nhiều thao tác có thể được gộp vào một lần commit. Mỗi mức lồng là một
+        SAVEPOINT nên lỗi ở mức trong chỉ hủy phần việc của mức đó.
+        """
+        with self._lock:
+            is_outermost = self._transaction_depth == 0
+            savepoint = f"sp_{self._transaction_depth}"
+            self.conn.execute("BEGIN" if is_outermost else f"SAVEPOINT {savepoint}")
+            self._transaction_depth += 1
+            try:
+                yield self.conn.cursor()
+                # COMMIT cũng có thể lỗi (SQLITE_BUSY, đầy đĩa): khi đó vẫn phải rollback
+                self.conn.execute("COMMIT" if is_outermost else f"RELEASE {savepoint}")
+            except BaseException:
+                self._transaction_depth -= 1
+                if is_outermost:
+                    if self.conn.in_transaction:
+                        self.conn.execute("ROLLBACK")
+                    self._after_rollback()
+                else:
+                    self.conn.execute(f"ROLLBACK TO {savepoint}")
+                    self.conn.execute(f"RELEASE {savepoint}")
+                raise
+            self._transaction_depth -= 1
+            if is_outermost:
+                callbacks, self._after_commit = self._after_commit, []
+                for callback in callbacks:
+                    callback()
+    
+    def _on_commit(self, callback: Callable):
+        """Chạy `callback` khi transaction ngoài cùng commit (ngay nếu không ở trong transaction)
+        
+        Cập nhật bộ nhớ (cache, bảng xếp hạng) theo dữ liệu vừa ghi phải chờ
+        commit: nếu transaction bị rollback thì chúng bị bỏ, và lệnh đọc trên
+        kết nối khác không đưa dữ liệu cũ trở lại cache.
+        """
+        with self._lock:
+            if self._transaction_depth:
+                self._after_commit.append(callback)
+                return
+        callback()
+    
+    def _after_rollback(self):
+        """Bỏ các cập nhật chờ commit và xóa cache sau khi rollback"""
+        self._after_commit = []
+        self.player_cache.clear()
+        self.history_cache.clear()
+    
+    def close(self):
+        """Đóng kết nối database"""
+        with self._lock:
+            if self.conn:
+                self.conn.close()
+                self.conn = None
+    
     def init_database(self):
-        """Khởi tạo các bảng trong database"""
+        """Khởi tạo các bảng trong database bằng cách áp dụng các migration"""
         try:
-            with sqlite3.connect(self.db_file) as conn:
-                cursor = conn.cursor()
-                
-                # Bảng người chơi
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS players (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        username TEXT UNIQUE NOT NULL,
-                        total_games INTEGER DEFAULT 0,
-                        total_score INTEGER DEFAULT 0,
-                        best_score INTEGER DEFAULT 0,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                ''')
-                
-                # Bảng trận đấu
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS games (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        start_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        end_time TIMESTAMP,
-                        total_players INTEGER,
-                        total_questions INTEGER,
-                        winner TEXT,
-                        status TEXT DEFAULT 'finished'
-                    )
-                ''')
-                
-                # Bảng chi tiết trận đấu
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS game_details (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        game_id INTEGER,
-                        player_username TEXT,
-                        score INTEGER,
-                        correct_answers INTEGER,
-                        wrong_answers INTEGER,
-                        average_response_time REAL,
-                        FOREIGN KEY (game_id) REFERENCES games (id)
-                    )
-                ''')
-                
-                # Bảng câu hỏi đã sử dụng
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS used_questions (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        game_id INTEGER,
-                        question_text TEXT,
-                        correct_answer TEXT,
-                        player_answers TEXT,  -- JSON string
-                        question_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (game_id) REFERENCES games (id)
-                    )
-                ''')
-                
-                conn.commit()
-                self.logger.info("Database initialized successfully")
-                
+            version = apply_migrations(self)
+            self.logger.info(f"Database initialized successfully (schema version {version})")
+            self.load_leaderboard()
         except Exception as e:
             self.logger.error(f"Error initializing database: {e}")
             raise
     
     def add_player(self, username: str) -> bool:
-        """Thêm người chơi mới"""
+        """Thêm người chơi mới
+        
+        Người chơi đã có hồ sơ trong cache được bỏ qua mà không truy vấn
+        database; lần đầu gặp thì hồ sơ được đọc lại và đưa vào cache.
+        """
+        if self.player_cache.get(username) is not None:
+            return False
+        
         try:
-            with sqlite3.connect(self.db_file) as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    "INSERT OR IGNORE INTO players (username) VALUES (?)",
-                    (username,)
-                )
-                conn.commit()
-                return cursor.rowcount > 0
+            inserted = self.write_player(username)
+            if inserted:
+                self._on_commit(lambda: self.leaderboard.add_player(username))
+            self.get_player_stats(username)
+            return inserted
         except Exception as e:
             self.logger.error(f"Error adding player {username}: {e}")
             return False
     
+    def write_player(self, username: str) -> bool:
+        """Ghi người chơi mới xuống database, trả về True nếu vừa được tạo (lỗi được ném ra cho nơi gọi)"""
+        with self.transaction() as cursor:
+            cursor.execute(
+                "INSERT OR IGNORE INTO players (username) VALUES (?)",
+                (username,)
+            )
+            return cursor.rowcount > 0
+    
     def get_player_stats(self, username: str) -> Optional[Dict]:
         """Lấy thống kê người chơi"""
+        cached = self.player_cache.get(username)
+        if cached is not None:
+            return dict(cached)
+        
+        generation = self.player_cache.generation
         try:
-            with sqlite3.connect(self.db_file) as conn:
-                cursor = conn.cursor()
+            with self.transaction() as cursor:
                 cursor.execute(
                     "SELECT * FROM players WHERE username = ?",
                     (username,)
                 )
                 row = cursor.fetchone()
                 if row:
-                    return {
+                    stats = {
                         'id': row[0],
                         'username': row[1],
                         'total_games': row[2],
@@ -116,139 +254,240 @@ class GameDatabase:
                         'best_score': row[4],
                         'created_at': row[5]
                     }
+                    self.player_cache.put(username, stats, generation)
+                    return dict(stats)
                 return None
         except Exception as e:
             self.logger.error(f"Error getting player stats for {username}: {e}")
             return None
     
+    def invalidate_player(self, username: str):
+        """Xóa hồ sơ và lịch sử của người chơi khỏi cache"""
+        self.player_cache.invalidate(username)
+        self.history_cache.invalidate(username)
+    
+    def invalidate_players(self, usernames: List[str]):
+        """Xóa hồ sơ và lịch sử của nhiều người chơi khỏi cache"""
+        self.player_cache.invalidate_many(usernames)
+        self.history_cache.invalidate_many(usernames)
+    
+    def get_cache_stats(self) -> Dict:
+        """Lấy thống kê hit/miss của các cache"""
+        return {
+            'players': self.player_cache.get_stats(),
+            'history': self.history_cache.get_stats()
+        }
+    
     def create_game(self, total_players: int, total_questions: int) -> int:
         """Tạo trận đấu mới và trả về game_id"""
         try:
-            with sqlite3.connect(self.db_file) as conn:
-                cursor = conn.cursor()
+            with self.transaction() as cursor:
                 cursor.execute(
                     "INSERT INTO games (total_players, total_questions) VALUES (?, ?)",
                     (total_players, total_questions)
                 )
                 game_id = cursor.lastrowid
-                conn.commit()
                 self.logger.info(f"Created new game with ID: {game_id}")
                 return game_id
         except Exception as e:
             self.logger.error(f"Error creating game: {e}")
             return -1
     
-    def end_game(self, game_id: int, winner: str):
+    def write_game(self, game_id: int, total_players: int, total_questions: int):
+        """Ghi trận đấu với game_id đã cấp trước (lỗi được ném ra cho nơi gọi)"""
+        with self.transaction() as cursor:
+            cursor.execute(
+                "INSERT INTO games (id, total_players, total_questions) VALUES (?, ?, ?)",
+                (game_id, total_players, total_questions)
+            )
+            self.logger.info(f"Created new game with ID: {game_id}")
+    
+    def last_game_id(self) -> int:
+        """game_id lớn nhất đã cấp, kể cả trận đã bị xóa khi lưu trữ"""
+        with self.transaction() as cursor:
+            cursor.execute("SELECT MAX(id) FROM games")
+            last_id = cursor.fetchone()[0] or 0
+            cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'games'")
+            row = cursor.fetchone()
+        return max(last_id, row[0] if row else 0)
+    
+    def end_game(self, game_id: int, winner: str) -> bool:
         """Kết thúc trận đấu"""
         try:
-            with sqlite3.connect(self.db_file) as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    "UPDATE games SET end_time = CURRENT_TIMESTAMP, winner = ? WHERE id = ?",
-                    (winner, game_id)
-                )
-                conn.commit()
-                self.logger.info(f"Game {game_id} ended, winner: {winner}")
+            self.write_end_game(game_id, winner)
+            return True
         except Exception as e:
             self.logger.error(f"Error ending game {game_id}: {e}")
+            return False
+    
+    def write_end_game(self, game_id: int, winner: str):
+        """Ghi thời điểm kết thúc và người thắng (lỗi được ném ra cho nơi gọi)"""
+        with self.transaction() as cursor:
+            cursor.execute(
+                "UPDATE games SET end_time = CURRENT_TIMESTAMP, winner = ? WHERE id = ?",
+                (winner, game_id)
+            )
+            self.logger.info(f"Game {game_id} ended, winner: {winner}")
     
     def save_game_result(self, game_id: int, player_results: List[Dict]):
-        """Lưu kết quả trận đấu"""
+        """Lưu kết quả trận đấu và cập nhật bảng xếp hạng"""
         try:
-            with sqlite3.connect(self.db_file) as conn:
-                cursor = conn.cursor()
-                
-                for result in player_results:
-                    # Lưu chi tiết trận đấu
-                    cursor.execute('''
-                        INSERT INTO game_details 
-                        (game_id, player_username, score, correct_answers, wrong_answers, average_response_time)
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    ''', (
-                        game_id,
-                        result['username'],
-                        result['score'],
-                        result['correct_answers'],
-                        result['wrong_answers'],
-                        result.get('average_response_time', 0)
-                    ))
-                    
-                    # Cập nhật thống kê người chơi
-                    cursor.execute('''
-                        UPDATE players 
-                        SET total_games = total_games + 1,
-                            total_score = total_score + ?,
-                            best_score = CASE WHEN ? > best_score THEN ? ELSE best_score END
-                        WHERE username = ?
-                    ''', (
-                        result['score'],
-                        result['score'],
-                        result['score'],
-                        result['username']
-                    ))
-                
-                conn.commit()
-                self.logger.info(f"Saved game results for game {game_id}")
-                
+            self.write_game_result(game_id, player_results)
         except Exception as e:
             self.logger.error(f"Error saving game results for game {game_id}: {e}")
+            return
+        self._on_commit(lambda: self.leaderboard.apply_game_results(player_results))
     
-    def save_question_result(self, game_id: int, question_text: str, correct_answer: str, player_answers: Dict):
-        """Lưu kết quả câu hỏi"""
-        try:
-            with sqlite3.connect(self.db_file) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT INTO used_questions 
-                    (game_id, question_text, correct_answer, player_answers)
-                    VALUES (?, ?, ?, ?)
-                ''', (
+    def write_game_result(self, game_id: int, player_results: List[Dict]):
+        """Ghi kết quả trận đấu xuống database (không cập nhật bảng xếp hạng trong bộ nhớ)
+        
+        Toàn bộ người chơi được ghi bằng hai câu lệnh executemany trong một
+        transaction; người chơi chưa có trong bảng players được tạo mới.
+        Lỗi được ném ra cho nơi gọi, không có dòng nào được ghi dở.
+        """
+        with self.transaction() as cursor:
+            # Lưu chi tiết trận đấu
+            cursor.execute("SELECT start_time FROM games WHERE id = ?", (game_id,))
+            row = cursor.fetchone()
+            game_start_time = row[0] if row else None
+            
+            cursor.executemany('''
+                INSERT INTO game_details 
+                (game_id, player_username, score, correct_answers, wrong_answers, average_response_time,
+                 game_start_time)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', [
+                (
                     game_id,
-                    question_text,
-                    correct_answer,
-                    json.dumps(player_answers)
-                ))
-                conn.commit()
+                    result['username'],
+                    result['score'],
+                    result['correct_answers'],
+                    result['wrong_answers'],
+                    result.get('average_response_time', 0),
+                    game_start_time
+                )
+                for result in player_results
+            ])
+            
+            # Cập nhật thống kê người chơi
+            cursor.executemany('''
+                INSERT INTO players (username, total_games, total_score, best_score)
+                VALUES (?, 1, ?, ?)
+                ON CONFLICT (username) DO UPDATE
+                SET total_games = total_games + 1,
+                    total_score = total_score + excluded.total_score,
+                    best_score = CASE WHEN excluded.best_score > best_score
+                                      THEN excluded.best_score ELSE best_score END
+            ''', [
+                (result['username'], result['score'], result['score'])
+                for result in player_results
+            ])
+            
+            self.logger.info(f"Saved game results for game {game_id}")
+        
+        usernames = [result['username'] for result in player_results]
+        self._on_commit(lambda: self.invalidate_players(usernames))
+    
+    def save_question_result(self, game_id: int, question_text: str, correct_answer: str, player_answers: Dict,
+                             category: str = 'general') -> bool:
+        """Lưu kết quả câu hỏi, mỗi đáp án là một dòng trong bảng answers"""
+        try:
+            self.write_question_result(game_id, question_text, correct_answer, player_answers, category)
+            return True
         except Exception as e:
             self.logger.error(f"Error saving question result: {e}")
+            return False
     
-    def get_leaderboard(self, limit: int = 10) -> List[Dict]:
-        """Lấy bảng xếp hạng"""
+    def write_question_result(self, game_id: int, question_text: str, correct_answer: str, player_answers: Dict,
+                              category: str = 'general'):
+        """Ghi câu hỏi và các đáp án (lỗi được ném ra cho nơi gọi)"""
+        with self.transaction() as cursor:
+            cursor.execute('''
+                INSERT INTO used_questions 
+                (game_id, question_text, correct_answer, category)
+                VALUES (?, ?, ?, ?)
+            ''', (
+                game_id,
+                question_text,
+                correct_answer,
+                category
+            ))
+            question_id = cursor.lastrowid
+            
+            cursor.executemany('''
+                INSERT INTO answers
+                (game_id, question_id, player_username, answer_index, is_correct, response_time_us)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', build_answer_rows(game_id, question_id, correct_answer, player_answers))
+    
+    def save_question_stats(self, rows: List[Tuple]) -> bool:
+        """Lưu thống kê câu hỏi (ghi đè giá trị cộng dồn)"""
+        try:
+            self.write_question_stats(rows)
+            return True
+        except Exception as e:
+            self.logger.error(f"Error saving question stats: {e}")
+            return False
+    
+    def write_question_stats(self, rows: List[Tuple]):
+        """Ghi thống kê câu hỏi (lỗi được ném ra cho nơi gọi)"""
+        with self.transaction() as cursor:
+            cursor.executemany('''
+                INSERT INTO question_stats
+                (question_key, question_text, times_asked, answers, correct, total_response_time,
+                 response_time_sketch)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (question_key) DO UPDATE
+                SET times_asked = excluded.times_asked,
+                    answers = excluded.answers,
+                    correct = excluded.correct,
+                    total_response_time = excluded.total_response_time,
+                    response_time_sketch = excluded.response_time_sketch,
+                    updated_at = CURRENT_TIMESTAMP
+            ''', rows)
+    
+    def load_question_stats(self) -> List[Tuple]:
+        """Đọc toàn bộ thống kê câu hỏi đã lưu"""
         try:
-            with sqlite3.connect(self.db_file) as conn:
-                cursor = conn.cursor()
+            with self.transaction() as cursor:
                 cursor.execute('''
-                    SELECT username, total_score, total_games, best_score
-                    FROM players
-                    ORDER BY total_score DESC, best_score DESC
-                    LIMIT ?
-                ''', (limit,))
-                
-                leaderboard = []
-                for row in cursor.fetchall():
-                    leaderboard.append({
-                        'username': row[0],
-                        'total_score': row[1],
-                        'total_games': row[2],
-                        'best_score': row[3]
-                    })
-                
-                return leaderboard
+                    SELECT question_key, question_text, times_asked, answers, correct, total_response_time,
+                           response_time_sketch
+                    FROM question_stats
+                ''')
+                return cursor.fetchall()
         except Exception as e:
-            self.logger.error(f"Error getting leaderboard: {e}")
+            self.logger.error(f"Error loading question stats: {e}")
             return []
     
+    def load_leaderboard(self):
+        """Nạp bảng xếp hạng trong bộ nhớ từ bảng players"""
+        with self.transaction() as cursor:
+            cursor.execute("SELECT username, total_score, total_games, best_score FROM players")
+            self.leaderboard.load(cursor.fetchall())
+        self.logger.info(f"Loaded leaderboard with {len(self.leaderboard)} players")
+    
+    def get_leaderboard(self, limit: int = 10) -> List[Dict]:
+        """Lấy bảng xếp hạng"""
+        return self.leaderboard.page(0, limit)
+    
+    def get_leaderboard_page(self, offset: int = 0, limit: int = 10) -> List[Dict]:
+        """Lấy một trang bảng xếp hạng"""
+        return self.leaderboard.page(offset, limit)
+    
+    def get_leaderboard_around(self, username: str, radius: int = 5) -> List[Dict]:
+        """Lấy các dòng bảng xếp hạng xung quanh người chơi"""
+        return self.leaderboard.around(username, radius)
+    
+    def get_player_rank(self, username: str) -> Optional[int]:
+        """Lấy thứ hạng toàn thời gian của người chơi"""
+        return self.leaderboard.rank(username)
+    
     def get_recent_games(self, limit: int = 5) -> List[Dict]:
         """Lấy các trận đấu gần đây"""
         try:
-            with sqlite3.connect(self.db_file) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    SELECT id, start_time, end_time, total_players, winner
-                    FROM games
-                    ORDER BY start_time DESC
-                    LIMIT ?
-                ''', (limit,))
+            with self.transaction() as cursor:
+                cursor.execute(RECENT_GAMES_QUERY, (limit,))
                 
                 games = []
                 for row in cursor.fetchall():
@@ -265,19 +504,81 @@ class GameDatabase:
             self.logger.error(f"Error getting recent games: {e}")
             return []
     
+    def _fetch_page(self, query: str, params: tuple, columns: List[str],
+                    limit: int, cursor_position) -> Dict:
+        """Lấy một trang theo keyset, trả về các dòng gọn và cursor trang sau"""
+        limit = max(1, min(limit, MAX_HISTORY_PAGE_SIZE))
+        start_time, row_id = cursor_position or FIRST_PAGE_CURSOR
+        
+        with self.transaction() as cursor:
+            cursor.execute(query, params + (start_time, row_id, limit + 1))
+            rows = cursor.fetchall()
+        
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = [rows[-1][1], rows[-1][0]] if has_more else None
+        return {
+            'columns': columns,
+            'rows': [list(row) for row in rows],
+            'next_cursor': next_cursor
+        }
+    
+    def get_recent_games_page(self, limit: int = HISTORY_PAGE_SIZE, cursor=None) -> Dict:
+        """Lấy một trang trận đấu gần đây
+        
+        `cursor` là [start_time, id] lấy từ `next_cursor` của trang trước,
+        None cho trang đầu. `next_cursor` là None khi đã hết dữ liệu.
+        """
+        try:
+            return self._fetch_page(RECENT_GAMES_PAGE_QUERY, (), RECENT_GAMES_COLUMNS, limit, cursor)
+        except Exception as e:
+            self.logger.error(f"Error getting recent games page: {e}")
+            return {'columns': RECENT_GAMES_COLUMNS, 'rows': [], 'next_cursor': None}
+    
+    def get_player_history_page(self, username: str, limit: int = HISTORY_PAGE_SIZE, cursor=None) -> Dict:
+        """Lấy một trang lịch sử trận đấu của người chơi (mới nhất trước)"""
+        try:
+            page = self._fetch_page(PLAYER_HISTORY_PAGE_QUERY, (username,), PLAYER_HISTORY_COLUMNS,
+                                    limit, cursor)
+            if self.archive is not None and page['next_cursor'] is None:
+                page = self._extend_with_archive(username, page, limit, cursor)
+            return page
+        except Exception as e:
+            self.logger.error(f"Error getting player history page for {username}: {e}")
+            return {'columns': PLAYER_HISTORY_COLUMNS, 'rows': [], 'next_cursor': None}
+    
+    def _extend_with_archive(self, username: str, page: Dict, limit: int, cursor_position) -> Dict:
+        """Nối các trận đã lưu trữ vào sau trang cuối của database chính
+        
+        Trận được lưu trữ luôn cũ hơn các trận còn lại trong database nên chỉ
+        cần đọc kho lưu trữ khi database chính đã hết dữ liệu. Trận vừa được
+        ghi ra file nhưng chưa bị xóa (lần lưu trữ bị dừng giữa chừng) không
+        lớn hơn dòng cuối của database nên không bị lặp lại.
+        """
+        limit = max(1, min(limit, MAX_HISTORY_PAGE_SIZE))
+        rows = page['rows']
+        position = [rows[-1][1], rows[-1][0]] if rows else cursor_position
+        rows = rows + self.archive.get_player_history_rows(username, position, limit + 1 - len(rows))
+        
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return {
+            'columns': page['columns'],
+            'rows': rows,
+            'next_cursor': [rows[-1][1], rows[-1][0]] if has_more else None
+        }
+    
     def get_player_history(self, username: str) -> List[Dict]:
-        """Lấy lịch sử trận đấu của người chơi"""
+        """Lấy lịch sử trận đấu của người chơi (kèm các trận đã lưu trữ)"""
+        cached = self.history_cache.get(username)
+        if cached is not None:
+            return [dict(entry) for entry in cached]
+        
+        # Nếu kết quả trận mới được lưu trong lúc đọc, lịch sử vừa đọc không được đưa vào cache
+        generation = self.history_cache.generation
         try:
-            with sqlite3.connect(self.db_file) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    SELECT g.id, g.start_time, g.end_time, g.total_players, g.winner,
-                           gd.score, gd.correct_answers, gd.wrong_answers
-                    FROM games g
-                    JOIN game_details gd ON g.id = gd.game_id
-                    WHERE gd.player_username = ?
-                    ORDER BY g.start_time DESC
-                ''', (username,))
+            with self.transaction() as cursor:
+                cursor.execute(PLAYER_HISTORY_QUERY, (username,))
                 
                 history = []
                 for row in cursor.fetchall():
@@ -291,8 +592,15 @@ class GameDatabase:
                         'correct_answers': row[6],
                         'wrong_answers': row[7]
                     })
-                
-                return history
+            
+            if self.archive is not None:
+                hot_ids = {entry['game_id'] for entry in history}
+                history.extend(entry for entry in self.archive.get_player_history(username)
+                               if entry['game_id'] not in hot_ids)
+                history.sort(key=lambda entry: (entry['start_time'] or '', entry['game_id']), reverse=True)
+            
+            self.history_cache.put(username, history, generation)
+            return [dict(entry) for entry in history]
         except Exception as e:
             self.logger.error(f"Error getting player history for {username}: {e}")
             return [] 
\ No newline at end of file
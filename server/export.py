@@ -0,0 +1,261 @@
+"""
+Xuất dữ liệu phân tích cho Fastest Finger First
+Đọc games, kết quả người chơi, câu hỏi và đáp án theo từng phần (bộ nhớ
+không đổi theo số dòng) và ghi ra CSV, JSONL hoặc định dạng cột nhị phân
+"""
+
+import sys
+import csv
+import json
+import struct
+import sqlite3
+import argparse
+from array import array
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .config import DATABASE_FILE, EXPORT_CHUNK_SIZE
+
+# Kiểu cột: 'int' (int64), 'float' (float64), 'str' (UTF-8)
+DATASETS: Dict[str, Tuple[List[Tuple[str, str]], str]] = {
+    'games': ([
+        ('id', 'int'), ('start_time', 'str'), ('end_time', 'str'),
+        ('total_players', 'int'), ('total_questions', 'int'), ('winner', 'str')
+    ], '''
+        SELECT id, start_time, end_time, total_players, total_questions, winner
+        FROM games
+        WHERE start_time >= ? AND start_time < ?
+        ORDER BY start_time, id
+    '''),
+    'results': ([
+        ('game_id', 'int'), ('player_username', 'str'), ('score', 'int'),
+        ('correct_answers', 'int'), ('wrong_answers', 'int'),
+        ('average_response_time', 'float'), ('game_start_time', 'str')
+    ], '''
+        SELECT game_id, player_username, score, correct_answers, wrong_answers,
+               average_response_time, game_start_time
+        FROM game_details
+        WHERE game_start_time >= ? AND game_start_time < ?
+        ORDER BY game_start_time, game_id
+    '''),
+    'questions': ([
+        ('id', 'int'), ('game_id', 'int'), ('question_text', 'str'), ('correct_answer', 'str'),
+        ('category', 'str')
+    ], '''
+        SELECT q.id, q.game_id, q.question_text, q.correct_answer, q.category
+        FROM games g
+        JOIN used_questions q ON q.game_id = g.id
+        WHERE g.start_time >= ? AND g.start_time < ?
+        ORDER BY g.start_time, g.id
+    '''),
+    'answers': ([
+        ('game_id', 'int'), ('question_id', 'int'), ('player_username', 'str'),
+        ('answer_index', 'int'), ('is_correct', 'int'), ('response_time_us', 'int')
+    ], '''
+        SELECT a.game_id, a.question_id, a.player_username, a.answer_index,
+               a.is_correct, a.response_time_us
+        FROM games g
+        JOIN used_questions q ON q.game_id = g.id
+        JOIN answers a ON a.question_id = q.id
+        WHERE g.start_time >= ? AND g.start_time < ?
+        ORDER BY g.start_time, g.id
+    '''),
+}
+
+# Khoảng thời gian mặc định: toàn bộ dữ liệu
+MIN_TIME = '0000-01-01 00:00:00'
+MAX_TIME = '9999-12-31 23:59:59'
+
+COLUMNAR_MAGIC = b'FFFCOL1\n'
+_ARRAY_TYPES = {'int': 'q', 'float': 'd'}
+
+class CsvExportWriter:
+    """Ghi CSV có dòng tiêu đề"""
+    
+    binary = False
+    
+    def __init__(self, f, dataset: str, columns: List[Tuple[str, str]]):
+        self.writer = csv.writer(f)
+        self.writer.writerow([name for name, _ in columns])
+    
+    def write_chunk(self, rows: List[tuple]):
+        """Ghi một phần dữ liệu"""
+        self.writer.writerows(rows)
+    
+    def close(self):
+        """Kết thúc file"""
+        pass
+
+class JsonlExportWriter:
+    """Ghi mỗi dòng một object JSON"""
+    
+    binary = False
+    
+    def __init__(self, f, dataset: str, columns: List[Tuple[str, str]]):
+        self.f = f
+        self.names = [name for name, _ in columns]
+    
+    def write_chunk(self, rows: List[tuple]):
+        """Ghi một phần dữ liệu"""
+        self.f.write(''.join(
+            json.dumps(dict(zip(self.names, row)), ensure_ascii=False) + '\n' for row in rows
+        ))
+    
+    def close(self):
+        """Kết thúc file"""
+        pass
+
+class ColumnarExportWriter:
+    """Ghi định dạng cột nhị phân: mỗi phần là một nhóm dòng, mỗi cột là một mảng có kiểu
+    
+    Bố cục (little-endian): magic, độ dài + header JSON (dataset, columns),
+    sau đó các nhóm dòng gồm số dòng (uint32) và lần lượt từng cột: mảng
+    valid (uint8, 0 = NULL), rồi int64/float64, hoặc offsets uint32 (n + 1)
+    cùng dữ liệu UTF-8 cho cột chuỗi.
+    """
+    
+    binary = True
+    
+    def __init__(self, f, dataset: str, columns: List[Tuple[str, str]]):
+        self.f = f
+        self.columns = columns
+        header = json.dumps({'dataset': dataset, 'columns': columns}).encode('utf-8')
+        f.write(COLUMNAR_MAGIC)
+        f.write(struct.pack('<I', len(header)))
+        f.write(header)
+    
+    def write_chunk(self, rows: List[tuple]):
+        """Ghi một phần dữ liệu thành một nhóm dòng"""
+        self.f.write(struct.pack('<I', len(rows)))
+        for index, (_, column_type) in enumerate(self.columns):
+            values = [row[index] for row in rows]
+            self.f.write(bytes(value is not None for value in values))
+            
+            if column_type == 'str':
+                encoded = [value.encode('utf-8') if value is not None else b'' for value in values]
+                offsets = array('I', [0])
+                for item in encoded:
+                    offsets.append(offsets[-1] + len(item))
+                self.f.write(_little_endian(offsets))
+                self.f.write(b''.join(encoded))
+            else:
+                data = array(_ARRAY_TYPES[column_type], [value if value is not None else 0 for value in values])
+                self.f.write(_little_endian(data))
+    
+    def close(self):
+        """Kết thúc file"""
+        pass
+
+def _little_endian(data: array) -> bytes:
+    """Chuyển mảng sang bytes little-endian"""
+    if sys.byteorder != 'little':
+        data = array(data.typecode, data)
+        data.byteswap()
+    return data.tobytes()
+
+def _read_array(f, typecode: str, count: int) -> array:
+    """Đọc một mảng little-endian"""
+    data = array(typecode)
+    data.frombytes(f.read(data.itemsize * count))
+    if sys.byteorder != 'little':
+        data.byteswap()
+    return data
+
+def read_columnar(f) -> Iterator[Dict[str, list]]:
+    """Đọc file định dạng cột, trả về từng nhóm dòng dạng {tên cột: danh sách giá trị}"""
+    if f.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+        raise ValueError("Not a columnar export file")
+    header_size, = struct.unpack('<I', f.read(4))
+    columns = json.loads(f.read(header_size))['columns']
+    
+    while True:
+        size = f.read(4)
+        if not size:
+            return
+        count, = struct.unpack('<I', size)
+        
+        group = {}
+        for name, column_type in columns:
+            valid = f.read(count)
+            if column_type == 'str':
+                offsets = _read_array(f, 'I', count + 1)
+                blob = f.read(offsets[-1])
+                values = [blob[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(count)]
+            else:
+                values = list(_read_array(f, _ARRAY_TYPES[column_type], count))
+            group[name] = [value if valid[i] else None for i, value in enumerate(values)]
+        yield group
+
+EXPORT_FORMATS = {
+    'csv': CsvExportWriter,
+    'jsonl': JsonlExportWriter,
+    'columnar': ColumnarExportWriter,
+}
+
+def open_readonly(db_file: str) -> sqlite3.Connection:
+    """Mở database chỉ đọc để không chặn server đang ghi"""
+    if db_file == ':memory:':
+        return sqlite3.connect(db_file)
+    return sqlite3.connect(Path(db_file).resolve().as_uri() + '?mode=ro', uri=True)
+
+def export_dataset(conn: sqlite3.Connection, dataset: str, fmt: str, f,
+                   since: Optional[str] = None, until: Optional[str] = None,
+                   chunk_size: int = EXPORT_CHUNK_SIZE) -> int:
+    """Xuất một tập dữ liệu ra file đã mở, trả về số dòng đã ghi
+    
+    `since` tính cả mốc, `until` không tính mốc (so sánh với start_time
+    của trận, dạng 'YYYY-MM-DD' hoặc 'YYYY-MM-DD HH:MM:SS').
+    """
+    columns, query = DATASETS[dataset]
+    writer = EXPORT_FORMATS[fmt](f, dataset, columns)
+    
+    cursor = conn.cursor()
+    cursor.arraysize = chunk_size
+    cursor.execute(query, (since or MIN_TIME, until or MAX_TIME))
+    
+    total = 0
+    while True:
+        rows = cursor.fetchmany()
+        if not rows:
+            break
+        writer.write_chunk(rows)
+        total += len(rows)
+    
+    writer.close()
+    return total
+
+def main():
+    """Chạy xuất dữ liệu từ dòng lệnh"""
+    parser = argparse.ArgumentParser(description='Stream games, results and answers out of the database')
+    parser.add_argument('dataset', choices=sorted(DATASETS), help='Data to export')
+    parser.add_argument('--format', '-f', choices=sorted(EXPORT_FORMATS), default='csv', help='Output format')
+    parser.add_argument('--output', '-o', type=str, default='-', help='Output file (- for stdout)')
+    parser.add_argument('--since', type=str, default=None, help='Only games started at or after this time')
+    parser.add_argument('--until', type=str, default=None, help='Only games started before this time')
+    parser.add_argument('--db', type=str, default=DATABASE_FILE, help='Database file')
+    parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE, help='Rows fetched per chunk')
+    
+    args = parser.parse_args()
+    binary = EXPORT_FORMATS[args.format].binary
+    
+    conn = open_readonly(args.db)
+    try:
+        if args.output == '-':
+            f = sys.stdout.buffer if binary else sys.stdout
+            total = export_dataset(conn, args.dataset, args.format, f, args.since, args.until, args.chunk_size)
+            f.flush()
+        else:
+            mode = 'wb' if binary else 'w'
+            with open(args.output, mode, **({} if binary else {'encoding': 'utf-8', 'newline': ''})) as f:
+                total = export_dataset(conn, args.dataset, args.format, f, args.since, args.until, args.chunk_size)
+    except sqlite3.OperationalError as e:
+        # Database cũ chưa được migrate (chỉ đọc nên không tự migrate được)
+        print(f"Export failed: {e}. Start the server once to upgrade the database schema.", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        conn.close()
+    
+    print(f"Exported {total} {args.dataset} rows", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -12,9 +12,10 @@ from datetime import datetime
 from .config import (
     GameState, MessageType, QUESTION_TIME_LIMIT, 
     POINTS_FOR_CORRECT_ANSWER, BONUS_POINTS_FOR_SPEED,
-    WAIT_TIME_BETWEEN_QUESTIONS, MAX_QUESTIONS_PER_GAME
+    WAIT_TIME_BETWEEN_QUESTIONS, MAX_QUESTIONS_PER_GAME, DIFFICULTY_CURVE
 )
-from .database import GameDatabase
+from .storage import StorageBackend
+from .question_stats import QuestionStatsTracker
 
 class Player:
     """Lớp đại diện cho một người chơi"""
@@ -72,7 +73,7 @@ class Question:
 class GameManager:
     """Quản lý logic game chính"""
     
-    def __init__(self, database: GameDatabase):
+    def __init__(self, database: StorageBackend):
         self.database = database
         self.logger = logging.getLogger(__name__)
         
@@ -84,6 +85,10 @@ class GameManager:
         self.questions: List[Question] = []
         self.game_id = None
         
+        # Id của câu hỏi đang hỏi, tăng dần qua các trận để đáp án gửi lại không bị tính nhầm câu
+        self.question_id = 0
+        self.question_open = False  # Đang nhận đáp án (từ get_next_question đến end_question)
+        
         # Thời gian
         self.question_start_time = None
         self.game_start_time = None
@@ -91,6 +96,11 @@ class GameManager:
         # Kết quả
         self.player_answers = {}
         self.fastest_answer = None
+        
+        # Thống kê độ khó câu hỏi, dùng để chọn câu hỏi theo đường độ khó
+        self.question_stats = QuestionStatsTracker()
+        self.question_stats.load(self.database.load_question_stats())
+        self.difficulty_curve = DIFFICULTY_CURVE
     
     def add_player(self, username: str, client_socket=None) -> bool:
         """Thêm người chơi mới"""
@@ -106,12 +116,30 @@ class GameManager:
         self.logger.info(f"Player {username} joined the game")
         return True
     
+    def reattach_player(self, username: str, client_socket=None) -> bool:
+        """Gắn kết nối mới vào người chơi đã mất kết nối (giữ nguyên điểm số)"""
+        player = self.players.get(username)
+        if player is None or player.is_connected:
+            return False
+        
+        player.client_socket = client_socket
+        player.is_connected = True
+        self.logger.info(f"Player {username} reconnected")
+        return True
+    
     def remove_player(self, username: str):
         """Xóa người chơi"""
         if username in self.players:
             self.players[username].is_connected = False
             self.logger.info(f"Player {username} left the game")
     
+    def drop_player(self, username: str):
+        """Bỏ hẳn người chơi đã mất kết nối (phiên hết hạn) để tên có thể dùng lại"""
+        player = self.players.get(username)
+        if player is not None and not player.is_connected:
+            del self.players[username]
+            self.logger.info(f"Player {username} dropped after session expiry")
+    
     def set_questions(self, questions: List[Question]):
         """Thiết lập danh sách câu hỏi cho game"""
         self.questions = questions
@@ -131,6 +159,9 @@ class GameManager:
         self.game_start_time = time.time()
         self.question_index = 0
         
+        if self.difficulty_curve:
+            self.questions = self.question_stats.order_for_curve(self.questions, self.difficulty_curve)
+        
         # Tạo game trong database
         self.game_id = self.database.create_game(
             len(self.players), 
@@ -146,6 +177,8 @@ class GameManager:
             return None
         
         self.current_question = self.questions[self.question_index]
+        self.question_id += 1
+        self.question_open = True
         self.question_start_time = time.time()
         self.player_answers = {}
         self.fastest_answer = None
@@ -153,12 +186,25 @@ class GameManager:
         self.logger.info(f"Question {self.question_index + 1}: {self.current_question.question_text}")
         return self.current_question
     
-    def submit_answer(self, username: str, answer: str) -> Dict:
-        """Xử lý đáp án từ người chơi"""
+    def submit_answer(self, username: str, answer: str, question_id: Optional[int] = None,
+                      answer_id: Optional[int] = None) -> Dict:
+        """Xử lý đáp án từ người chơi
+        
+        Idempotent theo `answer_id` (số thứ tự do client đặt): gửi lại cùng một
+        đáp án (vd. sau khi kết nối lại) trả về đúng kết quả lần đầu, kèm thời
+        điểm server nhận được. Đáp án cho câu hỏi khác `question_id`, hoặc gửi
+        sau khi câu hỏi đã kết thúc, bị từ chối.
+        """
         if not self.current_question or username not in self.players:
             return {'valid': False, 'message': 'Invalid submission'}
         
-        if username in self.player_answers:
+        if not self.question_open or (question_id is not None and question_id != self.question_id):
+            return {'valid': False, 'message': 'Question closed'}
+        
+        previous = self.player_answers.get(username)
+        if previous is not None:
+            if answer_id is not None and previous['answer_id'] == answer_id:
+                return self._answer_ack(username, previous, duplicate=True)
             return {'valid': False, 'message': 'Already answered'}
         
         current_time = time.time()
@@ -168,7 +214,8 @@ class GameManager:
         self.player_answers[username] = {
             'answer': answer,
             'response_time': response_time,
-            'timestamp': current_time
+            'timestamp': current_time,
+            'answer_id': answer_id
         }
         
         # Cập nhật thời gian phản hồi
@@ -184,16 +231,25 @@ class GameManager:
         
         self.logger.info(f"Player {username} answered in {response_time:.2f}s")
         
+        return self._answer_ack(username, self.player_answers[username])
+    
+    def _answer_ack(self, username: str, answer_data: Dict, duplicate: bool = False) -> Dict:
+        """Kết quả xác nhận một đáp án đã nhận"""
         return {
             'valid': True,
-            'response_time': response_time,
+            'response_time': answer_data['response_time'],
+            'received_at': answer_data['timestamp'],
+            'question_id': self.question_id,
+            'answer_id': answer_data['answer_id'],
+            'duplicate': duplicate,
             'is_fastest': self.fastest_answer['username'] == username
         }
     
     def end_question(self) -> Dict:
-        """Kết thúc câu hỏi và tính điểm"""
-        if not self.current_question:
+        """Kết thúc câu hỏi và tính điểm, đáp án gửi sau đó bị từ chối"""
+        if not self.current_question or not self.question_open:
             return {}
+        self.question_open = False
         
         results = {}
         correct_answers = []
@@ -229,9 +285,16 @@ class GameManager:
                 self.game_id,
                 self.current_question.question_text,
                 self.current_question.correct_answer,
-                self.player_answers
+                self.player_answers,
+                self.current_question.category
             )
         
+        # Cập nhật thống kê trong bộ nhớ, chỉ ghi xuống storage theo chu kỳ
+        self.question_stats.record(self.current_question.question_text, results)
+        rows = self.question_stats.take_dirty_rows()
+        if rows:
+            self.database.save_question_stats(rows)
+        
         self.question_index += 1
         self.logger.info(f"Question ended. Correct answers: {len(correct_answers)}")
         
@@ -254,18 +317,28 @@ class GameManager:
                 max_score = player.score
                 winner = player.username
         
-        # Lưu kết quả vào database
+        # Lưu thống kê câu hỏi còn lại và kết quả vào database
+        rows = self.question_stats.take_dirty_rows(force=True)
+        if rows:
+            self.database.save_question_stats(rows)
+        
         if self.game_id and winner:
             self.database.end_game(self.game_id, winner)
             
             player_results = [player.to_dict() for player in self.players.values()]
             self.database.save_game_result(self.game_id, player_results)
         
-        # Tạo kết quả cuối cùng
+        # Tạo kết quả cuối cùng kèm thứ hạng toàn thời gian
+        players = []
+        for player in self.players.values():
+            player_data = player.to_dict()
+            player_data['global_rank'] = self.database.get_player_rank(player.username)
+            players.append(player_data)
+        
         final_results = {
             'winner': winner,
             'winner_score': max_score,
-            'players': [player.to_dict() for player in self.players.values()],
+            'players': players,
             'total_questions': self.question_index
         }
         
@@ -308,6 +381,7 @@ class GameManager:
         """Reset game về trạng thái ban đầu"""
         self.game_state = GameState.WAITING
         self.current_question = None
+        self.question_open = False
         self.question_index = 0
         self.question_start_time = None
         self.game_start_time = None
@@ -0,0 +1,240 @@
+"""
+Bảng xếp hạng toàn thời gian cho Fastest Finger First
+Giữ thứ hạng người chơi trong bộ nhớ, được nạp từ database khi khởi động
+và cập nhật dần sau mỗi trận thay vì sắp xếp lại cả bảng players
+"""
+
+import threading
+from bisect import bisect_left, insort
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+# Sắp xếp lại toàn bộ khi số người chơi cập nhật * hệ số này vượt tổng số người chơi
+BULK_REBUILD_FACTOR = 8
+
+EMPTY_STATS = {'total_score': 0, 'total_games': 0, 'best_score': 0}
+
+class LeaderboardIndex:
+    """Danh sách người chơi đã sắp xếp theo (total_score, best_score) giảm dần
+
+    Tra thứ hạng bằng tìm kiếm nhị phân O(log n). Cập nhật một người chơi là
+    xóa/chèn trong list đã sắp xếp (chỉ dịch bộ nhớ, không so sánh lại).
+    """
+
+    def __init__(self):
+        self._keys: List[Tuple[int, int, str]] = []
+        self._players: Dict[str, Dict] = {}
+        self._lock = threading.RLock()
+
+        # Cập nhật đã áp dụng nhưng chưa nằm trong database (ghi trễ), giữ lại qua các lần load()
+        self._pending: Dict[Hashable, Tuple[str, object]] = {}
+        # Thống kê chưa gồm các cập nhật đang chờ (None: chưa có trong bảng) và số cập nhật đang chờ,
+        # chỉ cho người chơi có cập nhật đang chờ
+        self._base: Dict[str, Optional[Dict]] = {}
+        self._pending_counts: Dict[str, int] = {}
+
+    @staticmethod
+    def _key(username: str, stats: Dict) -> Tuple[int, int, str]:
+        """Khóa sắp xếp: điểm tổng và điểm cao nhất giảm dần, tên tăng dần"""
+        return (-stats['total_score'], -stats['best_score'], username)
+
+    def load(self, rows: Iterable[Tuple[str, int, int, int]]):
+        """Nạp toàn bộ bảng xếp hạng từ các dòng (username, total_score, total_games, best_score)"""
+        with self._lock:
+            self._players = {
+                username: {'total_score': total_score or 0, 'total_games': total_games or 0,
+                           'best_score': best_score or 0}
+                for username, total_score, total_games, best_score in rows
+            }
+            self._keys = sorted(self._key(username, stats) for username, stats in self._players.items())
+            for username in self._base:
+                stats = self._players.get(username)
+                self._base[username] = dict(stats) if stats else None
+            for method, argument in self._pending.values():
+                self._apply_update(method, argument)
+
+    def apply_pending(self, key: Hashable, method: str, argument):
+        """Áp dụng một cập nhật chưa được ghi xuống database (`method` là 'add_player' hoặc 'apply_game_results')
+
+        Cập nhật được áp dụng lại sau mỗi lần load() cho đến khi confirm_pending()
+        hoặc revert_pending().
+        """
+        with self._lock:
+            for username in self._usernames(method, argument):
+                if username not in self._base:
+                    stats = self._players.get(username)
+                    self._base[username] = dict(stats) if stats else None
+                self._pending_counts[username] = self._pending_counts.get(username, 0) + 1
+            self._pending[key] = (method, argument)
+            self._apply_update(method, argument)
+
+    def confirm_pending(self, keys: Iterable[Hashable]):
+        """Bỏ các cập nhật đã nằm trong database khỏi danh sách chờ"""
+        with self._lock:
+            for key in keys:
+                entry = self._pending.pop(key, None)
+                if entry is None:
+                    continue
+                for username in self._usernames(*entry):
+                    self._base[username] = self._fold(self._base[username], username, *entry)
+                    self._release(username)
+
+    def revert_pending(self, keys: Iterable[Hashable]):
+        """Hoàn tác các cập nhật không được ghi xuống database
+
+        Chỉ tính lại những người chơi bị ảnh hưởng, từ thống kê chưa gồm cập
+        nhật đang chờ cộng với các cập nhật còn lại trong danh sách chờ.
+        """
+        with self._lock:
+            reverted = [self._usernames(*self._pending.pop(key)) for key in keys if key in self._pending]
+            affected = {username for usernames in reverted for username in usernames}
+
+            for username in affected:
+                stats = self._base[username]
+                for method, argument in self._pending.values():
+                    if username in self._usernames(method, argument):
+                        stats = self._fold(stats, username, method, argument)
+                if stats is None:
+                    self._remove(username)
+                else:
+                    self.update(username, stats['total_score'], stats['total_games'], stats['best_score'])
+
+            for usernames in reverted:
+                for username in usernames:
+                    self._release(username)
+
+    def _release(self, username: str):
+        """Giảm số cập nhật đang chờ của người chơi, bỏ thống kê gốc khi hết"""
+        self._pending_counts[username] -= 1
+        if not self._pending_counts[username]:
+            del self._pending_counts[username]
+            del self._base[username]
+
+    @staticmethod
+    def _usernames(method: str, argument) -> List[str]:
+        """Những người chơi mà một cập nhật thay đổi"""
+        if method == 'add_player':
+            return [argument]
+        return [result['username'] for result in argument]
+
+    @staticmethod
+    def _fold(stats: Optional[Dict], username: str, method: str, argument) -> Optional[Dict]:
+        """Thống kê của `username` sau một cập nhật, tính riêng không đụng đến bảng"""
+        if method == 'add_player':
+            return stats or dict(EMPTY_STATS)
+        for result in argument:
+            if result['username'] == username:
+                current = stats or EMPTY_STATS
+                stats = {
+                    'total_score': current['total_score'] + result['score'],
+                    'total_games': current['total_games'] + 1,
+                    'best_score': max(current['best_score'], result['score'])
+                }
+        return stats
+
+    def _apply_update(self, method: str, argument):
+        """Áp dụng một cập nhật lên bảng mà không đổi thống kê gốc của cập nhật đang chờ"""
+        if method == 'add_player':
+            self._add_player(argument)
+        else:
+            self._apply_game_results(argument)
+
+    def _fold_direct(self, method: str, argument):
+        """Cập nhật trực tiếp (không qua danh sách chờ) cũng được cộng vào thống kê gốc"""
+        for username in self._usernames(method, argument):
+            if username in self._base:
+                self._base[username] = self._fold(self._base[username], username, method, argument)
+
+    def add_player(self, username: str):
+        """Thêm người chơi mới với điểm 0 (bỏ qua nếu đã có)"""
+        with self._lock:
+            self._add_player(username)
+            self._fold_direct('add_player', username)
+
+    def _add_player(self, username: str):
+        """Thêm người chơi (gọi khi đang giữ lock)"""
+        if username not in self._players:
+            self.update(username, 0, 0, 0)
+
+    def _remove(self, username: str):
+        """Xóa người chơi khỏi bảng"""
+        current = self._players.pop(username, None)
+        if current is not None:
+            del self._keys[bisect_left(self._keys, self._key(username, current))]
+
+    def update(self, username: str, total_score: int, total_games: int, best_score: int):
+        """Cập nhật thống kê của một người chơi"""
+        with self._lock:
+            current = self._players.get(username)
+            if current is not None:
+                index = bisect_left(self._keys, self._key(username, current))
+                del self._keys[index]
+
+            stats = {'total_score': total_score, 'total_games': total_games, 'best_score': best_score}
+            self._players[username] = stats
+            insort(self._keys, self._key(username, stats))
+
+    def apply_game_results(self, player_results: List[Dict]):
+        """Cộng kết quả một trận vào bảng xếp hạng (giống cập nhật bảng players)
+
+        Phòng lớn so với tổng số người chơi thì sắp xếp lại một lần sẽ nhanh
+        hơn xóa/chèn từng người.
+        """
+        with self._lock:
+            self._apply_game_results(player_results)
+            self._fold_direct('apply_game_results', player_results)
+
+    def _apply_game_results(self, player_results: List[Dict]):
+        """Cộng kết quả một trận (gọi khi đang giữ lock)"""
+        rebuild = len(player_results) * BULK_REBUILD_FACTOR > len(self._keys)
+
+        for result in player_results:
+            username = result['username']
+            stats = self._fold(self._players.get(username), username, 'apply_game_results', [result])
+
+            if rebuild:
+                self._players[username] = stats
+            else:
+                self.update(username, stats['total_score'], stats['total_games'], stats['best_score'])
+
+        if rebuild:
+            self._keys = sorted(self._key(username, stats) for username, stats in self._players.items())
+
+    def rank(self, username: str) -> Optional[int]:
+        """Lấy thứ hạng (bắt đầu từ 1) của người chơi"""
+        with self._lock:
+            stats = self._players.get(username)
+            if stats is None:
+                return None
+            return bisect_left(self._keys, self._key(username, stats)) + 1
+
+    def page(self, offset: int = 0, limit: int = 10) -> List[Dict]:
+        """Lấy một trang bảng xếp hạng"""
+        with self._lock:
+            offset = max(offset, 0)
+            return [
+                self._entry(offset + i + 1, key[2])
+                for i, key in enumerate(self._keys[offset:offset + limit])
+            ]
+
+    def around(self, username: str, radius: int = 5) -> List[Dict]:
+        """Lấy các dòng xung quanh người chơi (radius dòng phía trên và phía dưới)"""
+        with self._lock:
+            rank = self.rank(username)
+            if rank is None:
+                return []
+            start = max(rank - 1 - radius, 0)
+            return self.page(start, radius * 2 + 1)
+
+    def _entry(self, rank: int, username: str) -> Dict:
+        """Tạo một dòng bảng xếp hạng"""
+        stats = self._players[username]
+        return {
+            'rank': rank,
+            'username': username,
+            'total_score': stats['total_score'],
+            'total_games': stats['total_games'],
+            'best_score': stats['best_score']
+        }
+
+    def __len__(self) -> int:
+        return len(self._keys)
@@ -0,0 +1,210 @@
+"""
+Quản lý phiên bản schema database cho Fastest Finger First
+Mỗi migration có số phiên bản tăng dần và chỉ được áp dụng một lần
+"""
+
+import json
+import logging
+from typing import Callable, List, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_CHUNK_SIZE = 1000
+
+def _add_column(table: str, column: str, column_type: str) -> Callable:
+    """Tạo bước migration thêm cột nếu bảng chưa có cột đó"""
+    def step(cursor):
+        cursor.execute(f"PRAGMA table_info({table})")
+        if column not in [row[1] for row in cursor.fetchall()]:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+    return step
+
+def _backfill_answers(cursor):
+    """Chuyển dữ liệu từ cột JSON player_answers sang bảng answers theo từng phần"""
+    from .database import build_answer_rows
+    
+    last_id = 0
+    total = 0
+    while True:
+        cursor.execute('''
+            SELECT id, game_id, correct_answer, player_answers
+            FROM used_questions
+            WHERE id > ? AND player_answers IS NOT NULL
+            ORDER BY id
+            LIMIT ?
+        ''', (last_id, BACKFILL_CHUNK_SIZE))
+        chunk = cursor.fetchall()
+        if not chunk:
+            break
+        
+        rows = []
+        for question_id, game_id, correct_answer, player_answers in chunk:
+            try:
+                answers = json.loads(player_answers)
+            except ValueError:
+                answers = None
+            # JSON hợp lệ nhưng không phải dict tên -> đáp án (null, list, số) cũng bị bỏ qua
+            if not isinstance(answers, dict) or not all(isinstance(data, dict) for data in answers.values()):
+                logger.warning(f"Skipping unreadable player_answers for question {question_id}")
+                continue
+            rows.extend(build_answer_rows(game_id, question_id, correct_answer or '', answers))
+        
+        cursor.executemany('''
+            INSERT INTO answers
+            (game_id, question_id, player_username, answer_index, is_correct, response_time_us)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', rows)
+        total += len(rows)
+        last_id = chunk[-1][0]
+    
+    logger.info(f"Backfilled {total} answers from player_answers")
+
+# Mỗi bước là một câu lệnh SQL hoặc hàm nhận cursor
+MigrationStep = Union[str, Callable]
+
+MIGRATIONS: List[Tuple[int, str, List[MigrationStep]]] = [
+    (1, "Initial schema", [
+        # Bảng người chơi
+        '''
+        CREATE TABLE IF NOT EXISTS players (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            total_games INTEGER DEFAULT 0,
+            total_score INTEGER DEFAULT 0,
+            best_score INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        # Bảng trận đấu
+        '''
+        CREATE TABLE IF NOT EXISTS games (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            start_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            end_time TIMESTAMP,
+            total_players INTEGER,
+            total_questions INTEGER,
+            winner TEXT,
+            status TEXT DEFAULT 'finished'
+        )
+        ''',
+        # Bảng chi tiết trận đấu
+        '''
+        CREATE TABLE IF NOT EXISTS game_details (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            game_id INTEGER,
+            player_username TEXT,
+            score INTEGER,
+            correct_answers INTEGER,
+            wrong_answers INTEGER,
+            average_response_time REAL,
+            FOREIGN KEY (game_id) REFERENCES games (id)
+        )
+        ''',
+        # Bảng câu hỏi đã sử dụng
+        '''
+        CREATE TABLE IF NOT EXISTS used_questions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            game_id INTEGER,
+            question_text TEXT,
+            correct_answer TEXT,
+            player_answers TEXT,  -- JSON string
+            question_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (game_id) REFERENCES games (id)
+        )
+        '''
+    ]),
+    (2, "Indexes for player history and recent games", [
+        "CREATE INDEX IF NOT EXISTS idx_game_details_player_game ON game_details (player_username, game_id)",
+        "CREATE INDEX IF NOT EXISTS idx_used_questions_game ON used_questions (game_id)",
+        "CREATE INDEX IF NOT EXISTS idx_games_start_time ON games (start_time)"
+    ]),
+    (3, "Normalized answers table", [
+        '''
+        CREATE TABLE IF NOT EXISTS answers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            game_id INTEGER NOT NULL,
+            question_id INTEGER NOT NULL,  -- used_questions.id
+            player_username TEXT NOT NULL,
+            answer_index INTEGER,  -- 0-3 tương ứng A-D, NULL nếu không hợp lệ
+            is_correct INTEGER NOT NULL,
+            response_time_us INTEGER NOT NULL,
+            FOREIGN KEY (game_id) REFERENCES games (id),
+            FOREIGN KEY (question_id) REFERENCES used_questions (id)
+        )
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_answers_question ON answers (question_id)",
+        "CREATE INDEX IF NOT EXISTS idx_answers_player_game ON answers (player_username, game_id)",
+        _backfill_answers
+    ]),
+    (4, "Game start time on game_details for keyset pagination of player history", [
+        _add_column("game_details", "game_start_time", "TIMESTAMP"),
+        '''
+        UPDATE game_details
+        SET game_start_time = (SELECT start_time FROM games WHERE games.id = game_details.game_id)
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_game_details_player_start
+        ON game_details (player_username, game_start_time, game_id)
+        '''
+    ]),
+    (5, "Index game_details by game start time for date-range exports", [
+        "CREATE INDEX IF NOT EXISTS idx_game_details_start ON game_details (game_start_time, game_id)"
+    ]),
+    (6, "Per-question difficulty statistics", [
+        '''
+        CREATE TABLE IF NOT EXISTS question_stats (
+            question_key TEXT PRIMARY KEY,  -- hash nội dung câu hỏi
+            question_text TEXT NOT NULL,
+            times_asked INTEGER NOT NULL,
+            answers INTEGER NOT NULL,
+            correct INTEGER NOT NULL,
+            total_response_time REAL NOT NULL,
+            response_time_sketch TEXT NOT NULL,  -- JSON của ResponseTimeSketch
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        '''
+    ]),
+    (7, "Question category on used_questions for per-category analytics", [
+        _add_column("used_questions", "category", "TEXT DEFAULT 'general'")
+    ]),
+]
+
+def get_schema_version(cursor) -> int:
+    """Lấy phiên bản schema hiện tại (0 nếu chưa áp dụng migration nào)"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute("SELECT MAX(version) FROM schema_version")
+    return cursor.fetchone()[0] or 0
+
+def apply_migrations(database, migrations=MIGRATIONS) -> int:
+    """Áp dụng các migration còn thiếu, mỗi migration trong một transaction
+
+    Trả về phiên bản schema sau khi áp dụng.
+    """
+    with database.transaction() as cursor:
+        version = get_schema_version(cursor)
+    
+    for target_version, description, steps in migrations:
+        if target_version <= version:
+            continue
+        
+        with database.transaction() as cursor:
+            for step in steps:
+                if callable(step):
+                    step(cursor)
+                else:
+                    cursor.execute(step)
+            cursor.execute(
+                "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                (target_version, description)
+            )
+        
+        version = target_version
+        logger.info(f"Applied migration {target_version}: {description}")
+    
+    return version
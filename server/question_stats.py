@@ -0,0 +1,216 @@
+"""
+Thống kê độ khó theo từng câu hỏi cho Fastest Finger First
+Cập nhật dần sau mỗi câu hỏi (số lần hỏi, tỉ lệ đúng, phân vị thời gian trả
+lời qua sketch gọn), lưu định kỳ và dùng để chọn câu hỏi theo đường độ khó
+"""
+
+import json
+import math
+import time
+import hashlib
+import threading
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+from .config import (
+    QUESTION_STATS_SKETCH_ACCURACY, QUESTION_STATS_FLUSH_INTERVAL,
+    DIFFICULTY_PRIORS, DIFFICULTY_PRIOR_WEIGHT
+)
+
+# Thời gian nhỏ hơn mức này được gộp vào một bucket (giây)
+SKETCH_MIN_VALUE = 0.001
+
+def question_key(question_text: str) -> str:
+    """Khóa của câu hỏi: hash ngắn của nội dung câu hỏi"""
+    return hashlib.blake2b(question_text.encode('utf-8'), digest_size=8).hexdigest()
+
+class ResponseTimeSketch:
+    """Sketch phân vị theo bucket logarit (sai số tương đối cố định)
+    
+    Mỗi bucket k chứa các giá trị trong (gamma^(k-1), gamma^k]; phân vị trả về
+    có sai số tương đối không quá `accuracy`. Số bucket chỉ tăng theo log của
+    khoảng giá trị (khoảng 250 bucket cho 1ms - 30s với sai số 2%).
+    """
+    
+    def __init__(self, accuracy: float = QUESTION_STATS_SKETCH_ACCURACY):
+        self.accuracy = accuracy
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.counts: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+    
+    def add(self, value: float):
+        """Thêm một giá trị"""
+        self.count += 1
+        if value <= SKETCH_MIN_VALUE:
+            self.zero_count += 1
+            return
+        bucket = math.ceil(math.log(value) / self.log_gamma)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+    
+    def quantile(self, q: float) -> Optional[float]:
+        """Lấy phân vị q (0-1), None nếu chưa có dữ liệu"""
+        if self.count == 0:
+            return None
+        
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if rank < seen:
+                return 2 * self.gamma ** bucket / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.counts) / (self.gamma + 1)
+    
+    def to_dict(self) -> Dict:
+        """Chuyển đổi thành dictionary (để lưu dạng JSON)"""
+        return {'accuracy': self.accuracy, 'zero': self.zero_count, 'counts': self.counts}
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'ResponseTimeSketch':
+        """Tạo sketch từ dictionary"""
+        sketch = cls(data.get('accuracy', QUESTION_STATS_SKETCH_ACCURACY))
+        sketch.zero_count = data.get('zero', 0)
+        sketch.counts = {int(bucket): count for bucket, count in data.get('counts', {}).items()}
+        sketch.count = sketch.zero_count + sum(sketch.counts.values())
+        return sketch
+
+class QuestionStats:
+    """Thống kê cộng dồn của một câu hỏi"""
+    
+    def __init__(self, key: str, question_text: str):
+        self.key = key
+        self.question_text = question_text
+        self.times_asked = 0
+        self.answers = 0
+        self.correct = 0
+        self.total_response_time = 0.0
+        self.sketch = ResponseTimeSketch()
+    
+    @property
+    def accuracy(self) -> Optional[float]:
+        """Tỉ lệ trả lời đúng"""
+        return self.correct / self.answers if self.answers else None
+    
+    @property
+    def mean_response_time(self) -> Optional[float]:
+        """Thời gian trả lời trung bình"""
+        return self.total_response_time / self.answers if self.answers else None
+    
+    def to_row(self) -> Tuple:
+        """Dòng lưu xuống storage"""
+        return (self.key, self.question_text, self.times_asked, self.answers, self.correct,
+                self.total_response_time, json.dumps(self.sketch.to_dict()))
+    
+    @classmethod
+    def from_row(cls, row: Tuple) -> 'QuestionStats':
+        """Tạo thống kê từ dòng đã lưu"""
+        key, question_text, times_asked, answers, correct, total_response_time, sketch = row
+        stats = cls(key, question_text)
+        stats.times_asked = times_asked
+        stats.answers = answers
+        stats.correct = correct
+        stats.total_response_time = total_response_time
+        stats.sketch = ResponseTimeSketch.from_dict(json.loads(sketch))
+        return stats
+    
+    def to_dict(self) -> Dict:
+        """Chuyển đổi thành dictionary"""
+        return {
+            'question_text': self.question_text,
+            'times_asked': self.times_asked,
+            'answers': self.answers,
+            'accuracy': self.accuracy,
+            'mean_response_time': self.mean_response_time,
+            'p50_response_time': self.sketch.quantile(0.5),
+            'p90_response_time': self.sketch.quantile(0.9)
+        }
+
+class QuestionStatsTracker:
+    """Giữ thống kê mọi câu hỏi trong bộ nhớ, chỉ ghi các câu đã thay đổi theo chu kỳ"""
+    
+    def __init__(self, flush_interval: float = QUESTION_STATS_FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self.stats: Dict[str, QuestionStats] = {}
+        self._dirty = set()
+        self._last_flush = time.time()
+        self._lock = threading.Lock()
+    
+    def load(self, rows: Iterable[Tuple]):
+        """Nạp thống kê đã lưu"""
+        with self._lock:
+            for row in rows:
+                stats = QuestionStats.from_row(row)
+                self.stats[stats.key] = stats
+    
+    def record(self, question_text: str, results: Dict[str, Dict]):
+        """Cộng kết quả một lần hỏi (kết quả của end_question) vào thống kê"""
+        key = question_key(question_text)
+        with self._lock:
+            stats = self.stats.get(key)
+            if stats is None:
+                stats = self.stats[key] = QuestionStats(key, question_text)
+            
+            stats.times_asked += 1
+            for result in results.values():
+                stats.answers += 1
+                stats.correct += result['correct']
+                stats.total_response_time += result['response_time']
+                stats.sketch.add(result['response_time'])
+            self._dirty.add(key)
+    
+    def get(self, question_text: str) -> Optional[QuestionStats]:
+        """Lấy thống kê của một câu hỏi"""
+        return self.stats.get(question_key(question_text))
+    
+    def take_dirty_rows(self, force: bool = False) -> List[Tuple]:
+        """Lấy các dòng cần lưu nếu đã đến chu kỳ (hoặc force), rỗng nếu chưa"""
+        with self._lock:
+            if not self._dirty or (not force and time.time() - self._last_flush < self.flush_interval):
+                return []
+            rows = [self.stats[key].to_row() for key in self._dirty]
+            self._dirty.clear()
+            self._last_flush = time.time()
+            return rows
+    
+    def difficulty(self, question) -> float:
+        """Độ khó ước lượng (tỉ lệ trả lời sai, 0-1)
+        
+        Kết hợp số liệu thực tế với mức độ khó gắn sẵn của câu hỏi như một
+        prior, để câu hỏi mới hoặc ít người trả lời không bị đánh giá cực đoan.
+        """
+        prior = DIFFICULTY_PRIORS.get(question.difficulty, DIFFICULTY_PRIORS['medium'])
+        stats = self.get(question.question_text)
+        answers = stats.answers if stats else 0
+        wrong = answers - stats.correct if stats else 0
+        return (wrong + prior * DIFFICULTY_PRIOR_WEIGHT) / (answers + DIFFICULTY_PRIOR_WEIGHT)
+    
+    def order_for_curve(self, questions: List, curve: List[float]) -> List:
+        """Sắp xếp câu hỏi để các câu đầu bám theo đường độ khó `curve`
+        
+        Với mỗi mức trong curve, chọn câu chưa dùng có độ khó gần nhất; các câu
+        còn lại giữ thứ tự cũ ở phía sau.
+        """
+        remaining = sorted((self.difficulty(question), index) for index, question in enumerate(questions))
+        selected = []
+        for target in curve:
+            if not remaining:
+                break
+            position = bisect_left(remaining, (target, -1))
+            if position == len(remaining) or (
+                    position > 0 and target - remaining[position - 1][0] <= remaining[position][0] - target):
+                position -= 1
+            selected.append(remaining.pop(position)[1])
+        
+        chosen = set(selected)
+        return [questions[index] for index in selected] + [
+            question for index, question in enumerate(questions) if index not in chosen
+        ]
+    
+    def report(self, limit: int = 20, hardest: bool = True) -> List[Dict]:
+        """Các câu hỏi khó nhất (hoặc dễ nhất) theo tỉ lệ đúng"""
+        with self._lock:
+            answered = [stats for stats in self.stats.values() if stats.answers]
+        answered.sort(key=lambda stats: stats.accuracy, reverse=not hardest)
+        return [stats.to_dict() for stats in answered[:limit]]
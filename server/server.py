@@ -3,6 +3,7 @@ Server chính cho Fastest Finger First
 Xử lý kết nối đa client, quản lý game và giao tiếp realtime
 """
 
+import os
 import socket
 import threading
 import json
@@ -12,11 +13,16 @@ import select
 from typing import Dict, List, Optional
 from .config import (
     HOST, PORT, BUFFER_SIZE, ENCODING, DELIMITER,
-    QUESTION_TIME_LIMIT, WAIT_TIME_BETWEEN_QUESTIONS,
+    QUESTION_TIME_LIMIT, WAIT_TIME_BETWEEN_QUESTIONS, HISTORY_PAGE_SIZE, ARCHIVE_DIR,
     MessageType, GameState, LOG_LEVEL, LOG_FORMAT, LOG_FILE
 )
 from .database import GameDatabase
+from .storage import StorageBackend
+from .write_behind import WriteBehindDatabase
+from .archive import GameArchiver, ARCHIVE_INDEX_FILE
 from .game_manager import GameManager, Question
+from .sessions import SessionManager
+from .telemetry import LatencyTelemetry
 
 class ClientHandler:
     """Xử lý kết nối từ một client"""
@@ -75,6 +81,12 @@ class ClientHandler:
                 self.handle_answer(data)
             elif message_type == MessageType.LEAVE_ROOM:
                 self.handle_leave_room(data)
+            elif message_type == MessageType.HISTORY:
+                self.handle_history(data)
+            elif message_type == MessageType.RECENT_GAMES:
+                self.handle_recent_games(data)
+            elif message_type == MessageType.TELEMETRY:
+                self.handle_telemetry(data)
             else:
                 self.logger.warning(f"Unknown message type: {message_type}")
                 
@@ -84,6 +96,10 @@ class ClientHandler:
     
     def handle_connect(self, data: dict):
         """Xử lý kết nối client"""
+        token = data.get('resume_token')
+        if token and self.resume_session(token, data.get('last_seq', 0)):
+            return
+        
         username = data.get('username')
         if not username:
             self.send_message(MessageType.ERROR, {'message': 'Username is required'})
@@ -93,7 +109,8 @@ class ClientHandler:
             self.username = username
             self.send_message(MessageType.CONNECT, {
                 'success': True,
-                'message': f'Welcome {username}!'
+                'message': f'Welcome {username}!',
+                'resume_token': self.server.sessions.create(username)
             })
             self.logger.info(f"Client {username} connected from {self.address}")
         else:
@@ -101,6 +118,34 @@ class ClientHandler:
                 'message': 'Username already exists'
             })
     
+    def resume_session(self, token: str, last_seq: int) -> bool:
+        """Gắn kết nối này vào phiên cũ theo resume token và gửi bù các cập nhật đã lỡ"""
+        in_room = self.server.resume_client(token, self)
+        if in_room is None:
+            return False
+        
+        self.send_message(MessageType.CONNECT, {
+            'success': True,
+            'message': f'Welcome back {self.username}!',
+            'resumed': True,
+            'in_room': in_room,
+            'resume_token': token
+        })
+        self.logger.info(f"Client {self.username} resumed session from {self.address}")
+        
+        # Phát lại SCORE_UPDATE client chưa nhận, rồi gửi trạng thái hiện tại
+        for update in self.server.sessions.replay_since(last_seq):
+            self.send_message(MessageType.SCORE_UPDATE, update)
+        if in_room:
+            self.send_game_status()
+            question = self.server.game_manager.current_question
+            if self.server.game_manager.game_state == GameState.FINISHED and self.server.last_game_end:
+                # Trận đã kết thúc trong lúc mất kết nối
+                self.send_message(MessageType.GAME_END, self.server.last_game_end)
+            elif question and self.username not in self.server.game_manager.player_answers:
+                self.send_message(MessageType.QUESTION, self.server.question_payload(question))
+        return True
+    
     def handle_join_room(self, data: dict):
         """Xử lý tham gia phòng"""
         if not self.username:
@@ -132,25 +177,35 @@ class ClientHandler:
             return
         
         answer = data.get('answer')
+        answer_id = data.get('answer_id')
         if not answer:
-            self.send_message(MessageType.ERROR, {'message': 'Answer is required'})
+            self.send_message(MessageType.ERROR, {'message': 'Answer is required', 'answer_id': answer_id})
             return
         
-        result = self.server.game_manager.submit_answer(self.username, answer)
+        result = self.server.game_manager.submit_answer(
+            self.username, answer, data.get('question_id'), answer_id
+        )
         if result['valid']:
+            # received_at là thời điểm server nhận, dùng làm mốc chính thức cho thời gian trả lời
             self.send_message(MessageType.ANSWER, {
                 'success': True,
                 'response_time': result['response_time'],
+                'received_at': result['received_at'],
+                'question_id': result['question_id'],
+                'answer_id': result['answer_id'],
+                'duplicate': result['duplicate'],
                 'is_fastest': result['is_fastest']
             })
             
-            # Thông báo cho tất cả client về đáp án
-            self.server.broadcast_to_all(MessageType.INFO, {
-                'message': f'{self.username} answered in {result["response_time"]:.2f}s'
-            })
+            # Thông báo cho tất cả client về đáp án (chỉ lần nhận đầu tiên)
+            if not result['duplicate']:
+                self.server.broadcast_to_all(MessageType.INFO, {
+                    'message': f'{self.username} answered in {result["response_time"]:.2f}s'
+                })
         else:
             self.send_message(MessageType.ERROR, {
-                'message': result['message']
+                'message': result['message'],
+                'answer_id': answer_id
             })
     
     def handle_leave_room(self, data: dict):
@@ -161,6 +216,34 @@ class ClientHandler:
                 'message': f'{self.username} left the room'
             })
     
+    def handle_history(self, data: dict):
+        """Xử lý yêu cầu một trang lịch sử trận đấu của người chơi"""
+        if not self.username:
+            self.send_message(MessageType.ERROR, {'message': 'Not connected'})
+            return
+        
+        page = self.server.database.get_player_history_page(
+            self.username,
+            limit=data.get('limit', HISTORY_PAGE_SIZE),
+            cursor=data.get('cursor')
+        )
+        self.send_message(MessageType.HISTORY, page)
+    
+    def handle_recent_games(self, data: dict):
+        """Xử lý yêu cầu một trang trận đấu gần đây"""
+        page = self.server.database.get_recent_games_page(
+            limit=data.get('limit', HISTORY_PAGE_SIZE),
+            cursor=data.get('cursor')
+        )
+        self.send_message(MessageType.RECENT_GAMES, page)
+    
+    def handle_telemetry(self, data: dict):
+        """Ghi số đo độ trễ client gửi kèm sau mỗi đáp án (không trả lời)"""
+        if not self.username:
+            return
+        if not self.server.telemetry.record(self.username, data):
+            self.logger.debug(f"Invalid telemetry from {self.username}: {data}")
+    
     def send_game_status(self):
         """Gửi trạng thái game hiện tại"""
         status = self.server.game_manager.get_game_status()
@@ -172,8 +255,7 @@ class ClientHandler:
     def disconnect(self):
         """Ngắt kết nối client"""
         if self.username:
-            self.server.remove_client(self.username)
-            self.server.game_manager.remove_player(self.username)
+            self.server.detach_client(self.username, self)
         
         self.is_connected = False
         try:
@@ -186,7 +268,7 @@ class ClientHandler:
 class GameServer:
     """Server chính quản lý game"""
     
-    def __init__(self, host: str = HOST, port: int = PORT):
+    def __init__(self, host: str = HOST, port: int = PORT, storage: Optional[StorageBackend] = None):
         self.host = host
         self.port = port
         self.server_socket = None
@@ -194,8 +276,26 @@ class GameServer:
         self.client_threads: List[threading.Thread] = []
         
         # Khởi tạo database và game manager
-        self.database = GameDatabase()
-        self.game_manager = GameManager(self.database)
+        # Với SQLite, game manager ghi qua hàng đợi ghi trễ để không chờ ổ đĩa trên thread game
+        self.database = storage or GameDatabase()
+        if isinstance(self.database, GameDatabase):
+            self.persistence = WriteBehindDatabase(self.database)
+        else:
+            self.persistence = self.database
+        self.game_manager = GameManager(self.persistence)
+        
+        # Lịch sử người chơi đọc tiếp từ kho lưu trữ nếu đã chạy `python -m server.archive`
+        self.archiver = None
+        if isinstance(self.database, GameDatabase) and os.path.exists(os.path.join(ARCHIVE_DIR, ARCHIVE_INDEX_FILE)):
+            self.archiver = GameArchiver(self.database)
+            self.database.archive = self.archiver
+        
+        # Phiên kết nối để client mất mạng có thể resume; phiên hết hạn thì bỏ người chơi cũ
+        self.sessions = SessionManager(on_expire=self.game_manager.drop_player)
+        self.last_game_end = None
+        
+        # Số đo độ trễ client gửi lên (TELEMETRY), theo từng trận
+        self.telemetry = LatencyTelemetry()
         
         # Thread quản lý game
         self.game_thread = None
@@ -278,7 +378,7 @@ class GameServer:
     
     def add_client(self, username: str, client_handler: ClientHandler) -> bool:
         """Thêm client mới"""
-        if username in self.clients:
+        if username in self.clients or self.sessions.is_reserved(username):
             return False
         
         self.clients[username] = client_handler
@@ -289,6 +389,37 @@ class GameServer:
         if username in self.clients:
             del self.clients[username]
     
+    def detach_client(self, username: str, client_handler: ClientHandler):
+        """Gỡ kết nối đã đứt khỏi người chơi, giữ phiên để có thể resume"""
+        if self.clients.get(username) is not client_handler:
+            # Kết nối này đã được thay bằng kết nối resume mới
+            return
+        
+        self.remove_client(username)
+        self.game_manager.remove_player(username)
+        self.sessions.detach(username)
+    
+    def resume_client(self, token: str, client_handler: ClientHandler) -> Optional[bool]:
+        """Gắn kết nối mới vào phiên theo token
+        
+        Trả về None nếu token không hợp lệ hoặc đã hết hạn, ngược lại trả về
+        người chơi có đang ở trong phòng hay không.
+        """
+        username = self.sessions.resume(token)
+        if username is None:
+            return None
+        
+        previous = self.clients.get(username)
+        if previous is not None and previous is not client_handler:
+            # Kết nối cũ chưa bị phát hiện là đã đứt (half-open): đóng mà không gỡ phiên
+            previous.username = None
+            previous.disconnect()
+            self.game_manager.remove_player(username)
+        
+        client_handler.username = username
+        self.clients[username] = client_handler
+        return self.game_manager.reattach_player(username, client_handler.client_socket)
+    
     def broadcast_to_all(self, message_type: str, data: dict):
         """Gửi message đến tất cả client"""
         for client in self.clients.values():
@@ -328,6 +459,9 @@ class GameServer:
     def start_game(self):
         """Bắt đầu game"""
         if self.game_manager.start_game():
+            self.sessions.clear_replay()
+            self.last_game_end = None
+            self.telemetry.reset()
             self.logger.info("Game started")
             self.broadcast_to_all(MessageType.GAME_START, {
                 'message': 'Game started!',
@@ -351,22 +485,28 @@ class GameServer:
     
     def send_question(self, question: Question):
         """Gửi câu hỏi đến tất cả client"""
+        self.broadcast_to_all(MessageType.QUESTION, self.question_payload(question))
+        self.logger.info(f"Sent question {self.game_manager.question_index + 1}")
+    
+    def question_payload(self, question: Question) -> dict:
+        """Dữ liệu message câu hỏi"""
         question_data = question.to_dict()
         question_data['question_number'] = self.game_manager.question_index + 1
+        question_data['question_id'] = self.game_manager.question_id
         question_data['time_limit'] = QUESTION_TIME_LIMIT
-        
-        self.broadcast_to_all(MessageType.QUESTION, question_data)
-        self.logger.info(f"Sent question {self.game_manager.question_index + 1}")
+        return question_data
     
     def end_question(self):
         """Kết thúc câu hỏi"""
         results = self.game_manager.end_question()
         
-        # Gửi kết quả đến tất cả client
-        self.broadcast_to_all(MessageType.SCORE_UPDATE, {
+        # Gửi kết quả đến tất cả client (có số thứ tự để phát lại khi resume)
+        update = {
             'results': results,
             'leaderboard': self.game_manager.get_leaderboard()
-        })
+        }
+        self.sessions.record(update)
+        self.broadcast_to_all(MessageType.SCORE_UPDATE, update)
         
         # Chờ một chút trước câu hỏi tiếp theo
         time.sleep(WAIT_TIME_BETWEEN_QUESTIONS)
@@ -375,12 +515,15 @@ class GameServer:
         """Kết thúc game"""
         final_results = self.game_manager.end_game()
         
-        self.broadcast_to_all(MessageType.GAME_END, {
+        self.last_game_end = {
             'final_results': final_results,
             'leaderboard': self.game_manager.get_leaderboard()
-        })
+        }
+        self.broadcast_to_all(MessageType.GAME_END, self.last_game_end)
         
         self.logger.info("Game ended")
+        if self.telemetry.samples:
+            self.logger.info(f"Client latency (ms): {self.telemetry.summary()}")
         
         # Reset game sau một thời gian
         threading.Timer(10.0, self.game_manager.reset_game).start()
@@ -390,13 +533,20 @@ class GameServer:
         self.running = False
         
         # Đóng tất cả client
-        for client in self.clients.values():
+        for client in list(self.clients.values()):
             client.disconnect()
         
         # Đóng server socket
         if self.server_socket:
             self.server_socket.close()
         
+        # Ghi hết dữ liệu đang chờ rồi đóng kết nối database
+        if self.persistence is not self.database:
+            self.persistence.close()
+        if self.archiver:
+            self.archiver.close()
+        self.database.close()
+        
         self.logger.info("Server stopped")
 
 def main():
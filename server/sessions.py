@@ -0,0 +1,120 @@
+"""
+Quản lý phiên kết nối cho Fastest Finger First
+Cấp resume token cho mỗi người chơi để client mất mạng có thể kết nối lại
+vào đúng người chơi và phòng cũ, kèm nhật ký SCORE_UPDATE để phát lại
+"""
+
+import time
+import secrets
+import threading
+from collections import deque
+from typing import Callable, Dict, List, Optional
+from .config import RESUME_TOKEN_TTL, RESUME_REPLAY_SIZE
+
+class Session:
+    """Phiên của một người chơi"""
+    
+    def __init__(self, username: str, token: str):
+        self.username = username
+        self.token = token
+        self.detached_at: Optional[float] = None  # None khi đang có kết nối
+    
+    def is_expired(self, now: float, ttl: float) -> bool:
+        """Phiên đã mất kết nối quá lâu"""
+        return self.detached_at is not None and now - self.detached_at > ttl
+
+class SessionManager:
+    """Giữ phiên theo token và tên người chơi, cùng các SCORE_UPDATE gần nhất
+    
+    Phiên bị ngắt được giữ `ttl` giây: trong thời gian đó tên người chơi vẫn
+    được giữ chỗ và token có thể dùng để gắn kết nối mới vào. Mỗi SCORE_UPDATE
+    có số thứ tự tăng dần để client báo lại số cuối đã nhận khi resume.
+    Khi phiên hết hạn, `on_expire(username)` được gọi (ngoài lock) để bỏ
+    người chơi cũ.
+    """
+    
+    def __init__(self, ttl: float = RESUME_TOKEN_TTL, replay_size: int = RESUME_REPLAY_SIZE,
+                 on_expire: Optional[Callable[[str], None]] = None):
+        self.ttl = ttl
+        self.on_expire = on_expire
+        self._by_token: Dict[str, Session] = {}
+        self._by_username: Dict[str, Session] = {}
+        self._replay = deque(maxlen=replay_size)
+        self._seq = 0
+        self._lock = threading.Lock()
+    
+    def create(self, username: str) -> str:
+        """Tạo phiên mới cho người chơi, trả về resume token"""
+        with self._lock:
+            expired = self._expire(time.time())
+            previous = self._by_username.pop(username, None)
+            if previous is not None:
+                del self._by_token[previous.token]
+            
+            session = Session(username, secrets.token_urlsafe(16))
+            self._by_token[session.token] = session
+            self._by_username[username] = session
+        self._notify_expired(expired)
+        return session.token
+    
+    def detach(self, username: str):
+        """Đánh dấu phiên mất kết nối, bắt đầu tính thời gian giữ chỗ"""
+        with self._lock:
+            session = self._by_username.get(username)
+            if session is not None:
+                session.detached_at = time.time()
+    
+    def resume(self, token: str) -> Optional[str]:
+        """Gắn lại phiên theo token, trả về tên người chơi hoặc None nếu token không hợp lệ"""
+        with self._lock:
+            expired = self._expire(time.time())
+            session = self._by_token.get(token)
+            if session is not None:
+                session.detached_at = None
+        self._notify_expired(expired)
+        return session.username if session is not None else None
+    
+    def is_reserved(self, username: str) -> bool:
+        """Tên người chơi còn được giữ cho một phiên chưa hết hạn"""
+        with self._lock:
+            expired = self._expire(time.time())
+            reserved = username in self._by_username
+        self._notify_expired(expired)
+        return reserved
+    
+    def _expire(self, now: float) -> List[str]:
+        """Xóa các phiên hết hạn (gọi khi đang giữ lock), trả về tên người chơi của chúng"""
+        expired = [session for session in self._by_token.values() if session.is_expired(now, self.ttl)]
+        for session in expired:
+            del self._by_token[session.token]
+            del self._by_username[session.username]
+        return [session.username for session in expired]
+    
+    def _notify_expired(self, usernames: List[str]):
+        """Báo các phiên đã hết hạn (gọi sau khi nhả lock)"""
+        if self.on_expire is not None:
+            for username in usernames:
+                self.on_expire(username)
+    
+    def record(self, data: Dict) -> int:
+        """Gán số thứ tự cho một SCORE_UPDATE và lưu để phát lại"""
+        with self._lock:
+            self._seq += 1
+            data['seq'] = self._seq
+            self._replay.append(data)
+            return self._seq
+    
+    def replay_since(self, seq: int) -> List[Dict]:
+        """Các SCORE_UPDATE có số thứ tự lớn hơn `seq` còn trong nhật ký"""
+        with self._lock:
+            return [data for data in self._replay if data['seq'] > seq]
+    
+    def clear_replay(self):
+        """Xóa nhật ký khi bắt đầu trận mới (số thứ tự vẫn tiếp tục tăng)"""
+        with self._lock:
+            self._replay.clear()
+    
+    @property
+    def last_seq(self) -> int:
+        """Số thứ tự SCORE_UPDATE cuối cùng"""
+        return self._seq
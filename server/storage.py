@@ -0,0 +1,405 @@
+"""
+Lớp lưu trữ cho Fastest Finger First
+Định nghĩa giao diện chung cho các backend lưu trữ (SQLite, bộ nhớ) mà
+GameManager và server sử dụng, kèm backend chạy hoàn toàn trong bộ nhớ
+"""
+
+import os
+import json
+import heapq
+import logging
+import threading
+from collections import deque
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from .config import (
+    HISTORY_PAGE_SIZE, MAX_HISTORY_PAGE_SIZE, STORAGE_BACKEND,
+    MEMORY_SNAPSHOT_FILE, MEMORY_SNAPSHOT_INTERVAL, MEMORY_MAX_ANSWERS
+)
+from .leaderboard import LeaderboardIndex
+
+STORAGE_BACKENDS = ['sqlite', 'memory']
+
+RECENT_GAMES_COLUMNS = ['id', 'start_time', 'end_time', 'total_players', 'winner']
+PLAYER_HISTORY_COLUMNS = ['game_id', 'start_time', 'end_time', 'total_players', 'winner',
+                          'score', 'correct_answers', 'wrong_answers']
+
+class StorageBackend(ABC):
+    """Base class cho tất cả backend lưu trữ"""
+    
+    @abstractmethod
+    def add_player(self, username: str) -> bool:
+        """Thêm người chơi mới, trả về True nếu người chơi chưa tồn tại"""
+        pass
+    
+    @abstractmethod
+    def get_player_stats(self, username: str) -> Optional[Dict]:
+        """Lấy thống kê người chơi"""
+        pass
+    
+    @abstractmethod
+    def create_game(self, total_players: int, total_questions: int) -> int:
+        """Tạo trận đấu mới và trả về game_id"""
+        pass
+    
+    @abstractmethod
+    def end_game(self, game_id: int, winner: str):
+        """Kết thúc trận đấu"""
+        pass
+    
+    @abstractmethod
+    def save_game_result(self, game_id: int, player_results: List[Dict]):
+        """Lưu kết quả trận đấu và cập nhật bảng xếp hạng"""
+        pass
+    
+    @abstractmethod
+    def save_question_result(self, game_id: int, question_text: str, correct_answer: str, player_answers: Dict,
+                             category: str = 'general'):
+        """Lưu kết quả một câu hỏi"""
+        pass
+    
+    @abstractmethod
+    def get_leaderboard(self, limit: int = 10) -> List[Dict]:
+        """Lấy bảng xếp hạng"""
+        pass
+    
+    @abstractmethod
+    def get_leaderboard_page(self, offset: int = 0, limit: int = 10) -> List[Dict]:
+        """Lấy một trang bảng xếp hạng"""
+        pass
+    
+    @abstractmethod
+    def get_leaderboard_around(self, username: str, radius: int = 5) -> List[Dict]:
+        """Lấy các dòng bảng xếp hạng xung quanh người chơi"""
+        pass
+    
+    @abstractmethod
+    def get_player_rank(self, username: str) -> Optional[int]:
+        """Lấy thứ hạng toàn thời gian của người chơi"""
+        pass
+    
+    @abstractmethod
+    def get_recent_games(self, limit: int = 5) -> List[Dict]:
+        """Lấy các trận đấu gần đây"""
+        pass
+    
+    @abstractmethod
+    def get_recent_games_page(self, limit: int = HISTORY_PAGE_SIZE, cursor=None) -> Dict:
+        """Lấy một trang trận đấu gần đây (phân trang keyset theo [start_time, id])"""
+        pass
+    
+    @abstractmethod
+    def get_player_history_page(self, username: str, limit: int = HISTORY_PAGE_SIZE, cursor=None) -> Dict:
+        """Lấy một trang lịch sử trận đấu của người chơi"""
+        pass
+    
+    @abstractmethod
+    def get_player_history(self, username: str) -> List[Dict]:
+        """Lấy lịch sử trận đấu của người chơi"""
+        pass
+    
+    @abstractmethod
+    def save_question_stats(self, rows: List[Tuple]):
+        """Lưu thống kê câu hỏi (các dòng của QuestionStats.to_row)"""
+        pass
+    
+    @abstractmethod
+    def load_question_stats(self) -> List[Tuple]:
+        """Đọc toàn bộ thống kê câu hỏi đã lưu"""
+        pass
+    
+    @abstractmethod
+    def close(self):
+        """Đóng backend, ghi hết dữ liệu còn đang chờ"""
+        pass
+
+class MemoryStorage(StorageBackend):
+    """Backend lưu toàn bộ dữ liệu trong bộ nhớ, không có I/O ổ đĩa
+    
+    Dùng cho load test và server sự kiện tạm thời. Nếu có `snapshot_file`,
+    dữ liệu được nạp lại khi khởi động và ghi snapshot định kỳ mỗi
+    `snapshot_interval` giây (0 = chỉ ghi khi đóng). Chỉ giữ `max_answers`
+    đáp án gần nhất để bộ nhớ và snapshot không lớn mãi.
+    """
+    
+    def __init__(self, snapshot_file: Optional[str] = MEMORY_SNAPSHOT_FILE,
+                 snapshot_interval: float = MEMORY_SNAPSHOT_INTERVAL, max_answers: int = MEMORY_MAX_ANSWERS):
+        self.snapshot_file = snapshot_file
+        self.snapshot_interval = snapshot_interval
+        self.max_answers = max_answers
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.RLock()
+        
+        self.players: Dict[str, Dict] = {}
+        self.games: Dict[int, Dict] = {}
+        self.game_details: Dict[str, List[Dict]] = {}
+        self.used_questions: List[Dict] = []
+        self.answers = deque(maxlen=max_answers)
+        self.question_stats: Dict[str, Tuple] = {}
+        self.leaderboard = LeaderboardIndex()
+        
+        if snapshot_file and os.path.exists(snapshot_file):
+            self.load_snapshot(snapshot_file)
+        
+        self._stop_event = threading.Event()
+        self._snapshot_thread = None
+        if snapshot_file and snapshot_interval > 0:
+            self._snapshot_thread = threading.Thread(
+                target=self._snapshot_loop, name="MemoryStorageSnapshot", daemon=True
+            )
+            self._snapshot_thread.start()
+    
+    @staticmethod
+    def _now() -> str:
+        """Thời điểm hiện tại theo định dạng CURRENT_TIMESTAMP của SQLite"""
+        return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    
+    def add_player(self, username: str) -> bool:
+        """Thêm người chơi mới"""
+        with self._lock:
+            if username in self.players:
+                return False
+            self._new_player(username)
+            self.leaderboard.add_player(username)
+            return True
+    
+    def _new_player(self, username: str) -> Dict:
+        """Tạo hồ sơ người chơi với điểm 0"""
+        stats = {
+            'id': len(self.players) + 1,
+            'username': username,
+            'total_games': 0,
+            'total_score': 0,
+            'best_score': 0,
+            'created_at': self._now()
+        }
+        self.players[username] = stats
+        return stats
+    
+    def get_player_stats(self, username: str) -> Optional[Dict]:
+        """Lấy thống kê người chơi"""
+        with self._lock:
+            stats = self.players.get(username)
+            return dict(stats) if stats else None
+    
+    def create_game(self, total_players: int, total_questions: int) -> int:
+        """Tạo trận đấu mới và trả về game_id"""
+        with self._lock:
+            game_id = len(self.games) + 1
+            self.games[game_id] = {
+                'id': game_id,
+                'start_time': self._now(),
+                'end_time': None,
+                'total_players': total_players,
+                'total_questions': total_questions,
+                'winner': None
+            }
+            return game_id
+    
+    def end_game(self, game_id: int, winner: str):
+        """Kết thúc trận đấu"""
+        with self._lock:
+            game = self.games.get(game_id)
+            if game:
+                game['end_time'] = self._now()
+                game['winner'] = winner
+    
+    def save_game_result(self, game_id: int, player_results: List[Dict]):
+        """Lưu kết quả trận đấu và cập nhật bảng xếp hạng"""
+        with self._lock:
+            for result in player_results:
+                username = result['username']
+                self.game_details.setdefault(username, []).append({
+                    'game_id': game_id,
+                    'score': result['score'],
+                    'correct_answers': result['correct_answers'],
+                    'wrong_answers': result['wrong_answers'],
+                    'average_response_time': result.get('average_response_time', 0)
+                })
+                
+                stats = self.players.get(username) or self._new_player(username)
+                stats['total_games'] += 1
+                stats['total_score'] += result['score']
+                stats['best_score'] = max(stats['best_score'], result['score'])
+            
+            self.leaderboard.apply_game_results(player_results)
+    
+    def save_question_result(self, game_id: int, question_text: str, correct_answer: str, player_answers: Dict,
+                             category: str = 'general'):
+        """Lưu kết quả câu hỏi"""
+        from .database import build_answer_rows
+        
+        with self._lock:
+            question_id = len(self.used_questions) + 1
+            self.used_questions.append({
+                'id': question_id,
+                'game_id': game_id,
+                'question_text': question_text,
+                'correct_answer': correct_answer,
+                'category': category
+            })
+            columns = ['game_id', 'question_id', 'player_username', 'answer_index', 'is_correct',
+                       'response_time_us']
+            self.answers.extend(
+                dict(zip(columns, row))
+                for row in build_answer_rows(game_id, question_id, correct_answer, player_answers)
+            )
+    
+    def get_leaderboard(self, limit: int = 10) -> List[Dict]:
+        """Lấy bảng xếp hạng"""
+        return self.leaderboard.page(0, limit)
+    
+    def get_leaderboard_page(self, offset: int = 0, limit: int = 10) -> List[Dict]:
+        """Lấy một trang bảng xếp hạng"""
+        return self.leaderboard.page(offset, limit)
+    
+    def get_leaderboard_around(self, username: str, radius: int = 5) -> List[Dict]:
+        """Lấy các dòng bảng xếp hạng xung quanh người chơi"""
+        return self.leaderboard.around(username, radius)
+    
+    def get_player_rank(self, username: str) -> Optional[int]:
+        """Lấy thứ hạng toàn thời gian của người chơi"""
+        return self.leaderboard.rank(username)
+    
+    def get_recent_games(self, limit: int = 5) -> List[Dict]:
+        """Lấy các trận đấu gần đây"""
+        page = self.get_recent_games_page(limit)
+        return [dict(zip(page['columns'], row)) for row in page['rows']]
+    
+    def get_recent_games_page(self, limit: int = HISTORY_PAGE_SIZE, cursor=None) -> Dict:
+        """Lấy một trang trận đấu gần đây"""
+        with self._lock:
+            rows = [
+                [game['id'], game['start_time'], game['end_time'], game['total_players'], game['winner']]
+                for game in self.games.values()
+            ]
+        return self._page(rows, RECENT_GAMES_COLUMNS, limit, cursor)
+    
+    def get_player_history_page(self, username: str, limit: int = HISTORY_PAGE_SIZE, cursor=None) -> Dict:
+        """Lấy một trang lịch sử trận đấu của người chơi (mới nhất trước)"""
+        return self._page(self._history_rows(username), PLAYER_HISTORY_COLUMNS, limit, cursor)
+    
+    def _history_rows(self, username: str) -> List[List]:
+        """Các dòng lịch sử (theo PLAYER_HISTORY_COLUMNS) của người chơi, chưa sắp xếp"""
+        with self._lock:
+            rows = []
+            for detail in self.game_details.get(username, []):
+                game = self.games.get(detail['game_id'], {})
+                rows.append([
+                    detail['game_id'], game.get('start_time'), game.get('end_time'),
+                    game.get('total_players'), game.get('winner'),
+                    detail['score'], detail['correct_answers'], detail['wrong_answers']
+                ])
+        return rows
+    
+    @staticmethod
+    def _page(rows: List[List], columns: List[str], limit: int, cursor_position) -> Dict:
+        """Lấy một trang theo (start_time, id) giảm dần, cùng định dạng với GameDatabase"""
+        limit = max(1, min(limit, MAX_HISTORY_PAGE_SIZE))
+        
+        def key(row):
+            return (row[1] or '', row[0])
+        
+        if cursor_position:
+            position = tuple(cursor_position)
+            rows = [row for row in rows if (row[1] or '', row[0]) < (position[0] or '', position[1])]
+        
+        rows = heapq.nlargest(limit + 1, rows, key=key)
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return {
+            'columns': columns,
+            'rows': rows,
+            'next_cursor': [rows[-1][1], rows[-1][0]] if has_more else None
+        }
+    
+    def get_player_history(self, username: str) -> List[Dict]:
+        """Lấy toàn bộ lịch sử trận đấu của người chơi (mới nhất trước, giống GameDatabase)"""
+        rows = sorted(self._history_rows(username), key=lambda row: (row[1] or '', row[0]), reverse=True)
+        return [dict(zip(PLAYER_HISTORY_COLUMNS, row)) for row in rows]
+    
+    def save_question_stats(self, rows: List[Tuple]):
+        """Lưu thống kê câu hỏi"""
+        with self._lock:
+            for row in rows:
+                self.question_stats[row[0]] = tuple(row)
+    
+    def load_question_stats(self) -> List[Tuple]:
+        """Đọc toàn bộ thống kê câu hỏi đã lưu"""
+        with self._lock:
+            return list(self.question_stats.values())
+    
+    def snapshot(self, filename: Optional[str] = None):
+        """Ghi toàn bộ dữ liệu ra file JSON (ghi file tạm rồi đổi tên)
+        
+        Chỉ chép tham chiếu khi giữ lock (hồ sơ người chơi và trận đấu bị sửa
+        tại chỗ nên được chép nông); việc dựng JSON chạy ngoài lock để không
+        chặn thread game.
+        """
+        filename = filename or self.snapshot_file
+        with self._lock:
+            data = {
+                'players': [dict(stats) for stats in self.players.values()],
+                'games': [dict(game) for game in self.games.values()],
+                'game_details': {username: list(details) for username, details in self.game_details.items()},
+                'used_questions': list(self.used_questions),
+                'answers': list(self.answers),
+                'question_stats': list(self.question_stats.values())
+            }
+        content = json.dumps(data, ensure_ascii=False)
+        
+        tmp_file = filename + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, filename)
+        self.logger.info(f"Saved memory storage snapshot to {filename}")
+    
+    def load_snapshot(self, filename: str):
+        """Nạp dữ liệu từ file snapshot"""
+        with open(filename, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        
+        with self._lock:
+            self.players = {stats['username']: stats for stats in data.get('players', [])}
+            self.games = {game['id']: game for game in data.get('games', [])}
+            self.game_details = data.get('game_details', {})
+            self.used_questions = data.get('used_questions', [])
+            self.answers = deque(data.get('answers', []), maxlen=self.max_answers)
+            self.question_stats = {row[0]: tuple(row) for row in data.get('question_stats', [])}
+            self.leaderboard.load(
+                (username, stats['total_score'], stats['total_games'], stats['best_score'])
+                for username, stats in self.players.items()
+            )
+        self.logger.info(f"Loaded memory storage snapshot with {len(self.players)} players")
+    
+    def _snapshot_loop(self):
+        """Ghi snapshot định kỳ"""
+        while not self._stop_event.wait(self.snapshot_interval):
+            try:
+                self.snapshot()
+            except Exception as e:
+                self.logger.error(f"Error saving memory storage snapshot: {e}")
+    
+    def close(self):
+        """Dừng ghi định kỳ và ghi snapshot cuối cùng"""
+        self._stop_event.set()
+        if self._snapshot_thread:
+            self._snapshot_thread.join()
+            self._snapshot_thread = None
+        if self.snapshot_file:
+            try:
+                self.snapshot()
+            except Exception as e:
+                self.logger.error(f"Error saving memory storage snapshot: {e}")
+
+def create_storage(backend: str = STORAGE_BACKEND, **kwargs) -> StorageBackend:
+    """Tạo backend lưu trữ theo tên ('sqlite' hoặc 'memory')"""
+    if backend == 'sqlite':
+        from .database import GameDatabase
+        return GameDatabase(**kwargs)
+    if backend == 'memory':
+        return MemoryStorage(**kwargs)
+    raise ValueError(f"Unknown storage backend: {backend}")
@@ -0,0 +1,77 @@
+"""
+Số đo độ trễ do client gửi lên cho Fastest Finger First
+Mỗi frame TELEMETRY mô tả một lần trả lời: thời gian vẽ câu hỏi, thời gian phản
+xạ của người chơi, round-trip và thời gian trả lời server đã ghi nhận; server gộp
+thành phân vị để tách độ trễ mạng, client và người chơi
+"""
+
+import threading
+from typing import Dict, Optional
+from .config import ANALYTICS_PERCENTILES
+from .question_stats import ResponseTimeSketch
+
+# Khóa gọn trong frame TELEMETRY (mili giây) -> tên chỉ số
+TELEMETRY_FIELDS = {
+    'rd': 'render',           # Nhận câu hỏi -> câu hỏi hiện trên màn hình
+    'rt': 'reaction',         # Câu hỏi hiện trên màn hình -> gửi đáp án
+    'rtt': 'round_trip',      # Gửi đáp án -> nhận xác nhận
+    'srv': 'server_response'  # Thời gian trả lời server ghi nhận (gửi câu hỏi -> nhận đáp án)
+}
+
+# Số đo lớn hơn mức này bị coi là không hợp lệ (mili giây)
+MAX_SAMPLE_MS = 60000
+
+class LatencyTelemetry:
+    """Phân vị các chỉ số độ trễ của trận đang chơi"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        """Xóa số đo (khi bắt đầu trận mới)"""
+        with self._lock:
+            self.sketches = {name: ResponseTimeSketch() for name in list(TELEMETRY_FIELDS.values()) + ['network']}
+            self.last_by_player: Dict[str, Dict[str, float]] = {}
+            self.samples = 0
+    
+    def record(self, username: str, data: Dict) -> bool:
+        """Ghi một frame TELEMETRY, False nếu frame không hợp lệ"""
+        values = {}
+        for key, name in TELEMETRY_FIELDS.items():
+            value = data.get(key)
+            if value is None:
+                continue
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 <= value <= MAX_SAMPLE_MS:
+                return False
+            values[name] = value / 1000
+        if not values:
+            return False
+        
+        # Phần thời gian trả lời không do client hay người chơi: mạng hai chiều và hàng đợi hai phía
+        if all(name in values for name in ('server_response', 'render', 'reaction')):
+            values['network'] = max(0.0, values['server_response'] - values['render'] - values['reaction'])
+        
+        with self._lock:
+            for name, value in values.items():
+                self.sketches[name].add(value)
+            self.last_by_player[username] = values
+            self.samples += 1
+        return True
+    
+    def last_sample(self, username: str) -> Optional[Dict[str, float]]:
+        """Số đo gần nhất của một người chơi (giây)"""
+        with self._lock:
+            return self.last_by_player.get(username)
+    
+    def summary(self) -> Dict[str, Dict]:
+        """Số mẫu và phân vị (mili giây) của từng chỉ số"""
+        with self._lock:
+            summary = {}
+            for name, sketch in self.sketches.items():
+                if sketch.count == 0:
+                    continue
+                summary[name] = {'count': sketch.count}
+                for q in ANALYTICS_PERCENTILES:
+                    summary[name][f"p{q:g}"] = round(sketch.quantile(q / 100) * 1000, 1)
+            return summary
@@ -0,0 +1,229 @@
+"""
+Lớp ghi trễ (write-behind) cho Fastest Finger First
+Đưa các thao tác ghi vào hàng đợi và ghi xuống database từ một thread riêng,
+gộp nhiều thao tác vào một transaction để thời gian game không phụ thuộc vào ổ đĩa
+"""
+
+import time
+import queue
+import itertools
+import logging
+import threading
+from typing import Dict, List
+from .config import (
+    WRITE_BEHIND_QUEUE_SIZE, WRITE_BEHIND_BATCH_SIZE, WRITE_BEHIND_SHUTDOWN_TIMEOUT
+)
+from .database import GameDatabase
+
+_STOP = object()
+
+# Thao tác ghi -> cập nhật bảng xếp hạng tương ứng (hàm của LeaderboardIndex, vị trí tham số)
+LEADERBOARD_UPDATES = {
+    'write_player': ('add_player', 0),
+    'write_game_result': ('apply_game_results', 1)
+}
+
+class WriteBehindDatabase:
+    """Bọc GameDatabase, các thao tác ghi được thực hiện bất đồng bộ
+    
+    Các thao tác đọc vẫn chạy đồng bộ trên database bên dưới; thread ghi dùng
+    kết nối riêng nên lệnh đọc không phải chờ lô đang ghi. create_game cấp
+    game_id trước rồi ghi trễ như các thao tác khác, vì vậy mọi trận đấu phải
+    được tạo qua lớp này. Thứ tự các thao tác ghi được giữ nguyên.
+    
+    Bảng xếp hạng trong bộ nhớ được cập nhật ngay khi đưa vào hàng đợi để màn
+    hình kết thúc trận hiển thị được thứ hạng mới. Các cập nhật này được giữ
+    trong danh sách chờ của LeaderboardIndex cho đến khi được commit; nếu
+    thao tác ghi thất bại, chỉ phần của thao tác đó bị hoàn tác.
+    """
+    
+    def __init__(self, database: GameDatabase, max_queue_size: int = WRITE_BEHIND_QUEUE_SIZE,
+                 batch_size: int = WRITE_BEHIND_BATCH_SIZE):
+        self.database = database
+        self.writer = database.writer_view()
+        self.batch_size = batch_size
+        self._game_ids = itertools.count(database.last_game_id() + 1)
+        self.queue = queue.Queue(maxsize=max_queue_size)
+        self.logger = logging.getLogger(__name__)
+        
+        # Số liệu theo dõi
+        self._metrics_lock = threading.Lock()
+        self.metrics = {
+            'enqueued': 0,
+            'written': 0,
+            'failed_batches': 0,
+            'failed_ops': 0,
+            'batches': 0,
+            'blocked_puts': 0,
+            'last_lag': 0.0,
+            'max_lag': 0.0,
+            'total_lag': 0.0
+        }
+        
+        self.closed = False
+        self.writer_thread = threading.Thread(target=self._writer_loop, name="WriteBehindWriter", daemon=True)
+        self.writer_thread.start()
+    
+    # Thao tác ghi trễ
+    def add_player(self, username: str) -> bool:
+        """Thêm người chơi (ghi trễ), bỏ qua người chơi đã có hồ sơ trong cache"""
+        if self.database.player_cache.get(username) is not None:
+            return False
+        self._enqueue('write_player', username)
+        return True
+    
+    def create_game(self, total_players: int, total_questions: int) -> int:
+        """Tạo trận đấu (ghi trễ), game_id được cấp ngay không cần chờ database"""
+        game_id = next(self._game_ids)
+        self._enqueue('write_game', game_id, total_players, total_questions)
+        return game_id
+    
+    def end_game(self, game_id: int, winner: str):
+        """Kết thúc trận đấu (ghi trễ)"""
+        self._enqueue('write_end_game', game_id, winner)
+    
+    def save_game_result(self, game_id: int, player_results: List[Dict]):
+        """Lưu kết quả trận đấu (ghi trễ)"""
+        self._enqueue('write_game_result', game_id, player_results)
+    
+    def save_question_result(self, game_id: int, question_text: str, correct_answer: str, player_answers: Dict,
+                             category: str = 'general'):
+        """Lưu kết quả câu hỏi (ghi trễ)"""
+        self._enqueue('write_question_result', game_id, question_text, correct_answer, player_answers, category)
+    
+    def save_question_stats(self, rows: List):
+        """Lưu thống kê câu hỏi (ghi trễ)"""
+        self._enqueue('write_question_stats', rows)
+    
+    def __getattr__(self, name):
+        """Các thao tác còn lại (đọc) chạy trực tiếp trên database"""
+        return getattr(self.database, name)
+    
+    def _enqueue(self, method: str, *args):
+        """Đưa thao tác vào hàng đợi, chặn khi hàng đợi đầy"""
+        item = (time.time(), method, args)
+        if method in LEADERBOARD_UPDATES:
+            update, position = LEADERBOARD_UPDATES[method]
+            self.database.leaderboard.apply_pending(id(item), update, args[position])
+        
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            with self._metrics_lock:
+                self.metrics['blocked_puts'] += 1
+            self.logger.warning("Write-behind queue is full, waiting for the writer")
+            self.queue.put(item)
+        
+        with self._metrics_lock:
+            self.metrics['enqueued'] += 1
+    
+    def _writer_loop(self):
+        """Thread ghi: lấy các thao tác theo lô và ghi trong một transaction"""
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                self.queue.task_done()
+                break
+            
+            batch = [item]
+            stop_after_batch = False
+            while len(batch) < self.batch_size:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop_after_batch = True
+                    self.queue.task_done()
+                    break
+                batch.append(item)
+            
+            self._write_batch(batch)
+            for _ in batch:
+                self.queue.task_done()
+            
+            if stop_after_batch:
+                break
+    
+    def _write_batch(self, batch: List):
+        """Ghi một lô thao tác trong một transaction
+        
+        Mỗi thao tác chạy trong SAVEPOINT riêng nên thao tác lỗi chỉ hủy phần
+        của nó. Nếu chính transaction của lô thất bại, các thao tác còn lại
+        được ghi lại từng cái một.
+        """
+        failed = []
+        try:
+            with self.writer.transaction():
+                failed = self._apply(batch)
+        except Exception as e:
+            self.logger.error(f"Error writing batch of {len(batch)} operations, retrying one by one: {e}")
+            failed_ids = {id(item) for item in failed}
+            failed += self._apply([item for item in batch if id(item) not in failed_ids])
+        
+        now = time.time()
+        lag = now - batch[0][0]
+        failed_ids = {id(item) for item in failed}
+        written = [item for item in batch if id(item) not in failed_ids]
+        
+        # Cập nhật bảng xếp hạng của thao tác đã ghi không còn chờ; của thao tác lỗi bị hoàn tác
+        self.database.leaderboard.revert_pending(failed_ids)
+        self.database.leaderboard.confirm_pending([id(item) for item in written])
+        
+        with self._metrics_lock:
+            self.metrics['batches'] += 1
+            if failed:
+                self.metrics['failed_batches'] += 1
+                self.metrics['failed_ops'] += len(failed)
+            self.metrics['written'] += len(written)
+            self.metrics['total_lag'] += sum(now - enqueued_at for enqueued_at, _, _ in written)
+            self.metrics['last_lag'] = lag
+            self.metrics['max_lag'] = max(self.metrics['max_lag'], lag)
+        
+        # Đưa hồ sơ người chơi vừa ghi vào cache để lần vào phòng sau không phải ghi lại
+        for _, method, args in written:
+            if method == 'write_player':
+                self.writer.get_player_stats(args[0])
+    
+    def _apply(self, batch: List) -> List:
+        """Chạy từng thao tác trong transaction (hoặc SAVEPOINT) riêng, trả về các thao tác bị lỗi"""
+        failed = []
+        for item in batch:
+            _, method, args = item
+            try:
+                with self.writer.transaction():
+                    getattr(self.writer, method)(*args)
+            except Exception as e:
+                self.logger.error(f"Error in write-behind operation {method}: {e}")
+                failed.append(item)
+        return failed
+    
+    def flush(self):
+        """Chờ đến khi mọi thao tác đang chờ được ghi xong"""
+        self.queue.join()
+    
+    def close(self, timeout: float = WRITE_BEHIND_SHUTDOWN_TIMEOUT):
+        """Ghi hết hàng đợi rồi dừng thread ghi"""
+        if self.closed:
+            return
+        self.closed = True
+        
+        self.queue.put(_STOP)
+        self.writer_thread.join(timeout)
+        if self.writer_thread.is_alive():
+            self.logger.error(f"Write-behind queue not drained after {timeout}s, "
+                              f"{self.queue.qsize()} operations pending")
+            return
+        
+        self.logger.info("Write-behind queue flushed")
+        if self.writer is not self.database:
+            self.writer.close()
+    
+    def get_metrics(self) -> Dict:
+        """Lấy số liệu hàng đợi ghi trễ"""
+        with self._metrics_lock:
+            metrics = dict(self.metrics)
+        
+        metrics['queue_depth'] = self.queue.qsize()
+        metrics['average_lag'] = metrics.pop('total_lag') / metrics['written'] if metrics['written'] else 0.0
+        return metrics
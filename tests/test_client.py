@@ -0,0 +1,653 @@
+"""
+Test cho client Fastest Finger First
+"""
+
+import unittest
+import sys
+import re
+import json
+import time
+import socket
+import asyncio
+import subprocess
+import threading
+from pathlib import Path
+from unittest import mock
+
+# Thêm thư mục gốc vào path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from client.config import MessageType, ClientState, LEADERBOARD_VISIBLE_ROWS
+from client.dispatcher import MessageDispatcher
+from client.network import NetworkManager, backoff_delay
+from client.view_model import GameViewModel
+from client.async_client import AsyncGameClient, ServerError
+from client.load_generator import run_load
+from server.server import GameServer
+from server.storage import MemoryStorage
+from server.game_manager import Question
+from ui.dirty_tracker import DirtyTracker
+from ui.leaderboard_view import LeaderboardView
+from ui.screen_renderer import ScreenRenderer, CLEAR_SCREEN, move_to
+from ui.console_ui import ConsoleInterface
+
+try:
+    from ui.gui_ui import GUIInterface
+except ImportError:  # Không có tkinter
+    GUIInterface = None
+
+class TestMessageDispatcher(unittest.TestCase):
+    """Test cho hàng đợi điều phối message"""
+    
+    def setUp(self):
+        """Thiết lập test"""
+        self.dispatcher = MessageDispatcher(max_backlog=3)
+        self.calls = []
+        self.gate = threading.Event()
+    
+    def tearDown(self):
+        """Dọn dẹp test"""
+        self.gate.set()
+        self.dispatcher.stop(timeout=1)
+    
+    def record(self, name):
+        """Handler ghi lại thứ tự gọi"""
+        self.calls.append(name)
+    
+    def blocked(self):
+        """Handler chặn đến khi gate mở, giả lập UI vẽ lại chậm"""
+        self.gate.wait(1)
+    
+    def test_coalesces_superseded_updates(self):
+        """Test chỉ bản cập nhật mới nhất được chạy, thứ tự với message khác được giữ"""
+        self.dispatcher.submit(self.blocked)
+        self.dispatcher.submit(self.record, "leaderboard-1", coalesce_key="leaderboard")
+        self.dispatcher.submit(self.record, "question")
+        self.dispatcher.submit(self.record, "leaderboard-2", coalesce_key="leaderboard")
+        self.gate.set()
+        
+        self.assertTrue(self.dispatcher.flush(timeout=1))
+        self.assertEqual(self.calls, ["question", "leaderboard-2"])
+        self.assertEqual(self.dispatcher.get_metrics()['coalesced'], 1)
+    
+    def test_coalesced_updates_do_not_grow_queue(self):
+        """Test cập nhật cùng khóa khi handler bị chặn không làm hàng đợi dài thêm"""
+        self.dispatcher.submit(self.blocked)
+        time.sleep(0.05)
+        for i in range(10000):
+            self.dispatcher.submit(self.record, i, coalesce_key="leaderboard")
+            self.assertLessEqual(len(self.dispatcher._queue), 1)
+        
+        self.gate.set()
+        self.assertTrue(self.dispatcher.flush(timeout=1))
+        self.assertEqual(self.calls, [9999])
+        self.assertEqual(self.dispatcher.get_metrics()['coalesced'], 9999)
+    
+    def test_full_backlog_blocks_instead_of_dropping(self):
+        """Test hàng đợi đầy thì bên gửi bị chặn, không mất message"""
+        self.dispatcher.submit(self.blocked)
+        time.sleep(0.05)
+        for i in range(3):
+            self.dispatcher.submit(self.record, i)
+        
+        sender = threading.Thread(target=self.dispatcher.submit, args=(self.record, 3))
+        sender.start()
+        sender.join(0.1)
+        self.assertTrue(sender.is_alive())
+        
+        self.gate.set()
+        sender.join(1)
+        self.assertTrue(self.dispatcher.flush(timeout=1))
+        self.assertEqual(self.calls, [0, 1, 2, 3])
+        self.assertEqual(self.dispatcher.get_metrics()['blocked_submits'], 1)
+    
+    def test_handler_can_submit_to_full_backlog(self):
+        """Test handler gửi tiếp khi hàng đợi đầy không tự chờ chính thread điều phối"""
+        def fill():
+            for i in range(5):
+                self.dispatcher.submit(self.record, i)
+        
+        self.dispatcher.submit(fill)
+        self.assertTrue(self.dispatcher.flush(timeout=1))
+        self.assertEqual(self.calls, [0, 1, 2, 3, 4])
+        self.assertEqual(self.dispatcher.get_metrics()['blocked_submits'], 0)
+
+class TestNetworkManager(unittest.TestCase):
+    """Test cho nhận message của NetworkManager"""
+    
+    def test_slow_handler_does_not_stall_receive(self):
+        """Test handler chậm không chặn thread nhận socket"""
+        network = NetworkManager()
+        server_socket, client_socket = socket.socketpair()
+        gate = threading.Event()
+        leaderboards = []
+        
+        network.register_message_handler(MessageType.QUESTION, lambda data: gate.wait(1))
+        network.register_message_handler(MessageType.LEADERBOARD, lambda data: leaderboards.append(data))
+        network.socket = client_socket
+        network.is_connected = network.is_running = True
+        receive_thread = threading.Thread(target=network._receive_loop, daemon=True)
+        receive_thread.start()
+        
+        # Một ký tự UTF-8 bị cắt giữa hai lần gửi vẫn phải giải mã đúng
+        frames = [json.dumps({'type': MessageType.QUESTION, 'data': {}})]
+        frames += [json.dumps({'type': MessageType.LEADERBOARD, 'data': {'n': i, 'name': 'Người chơi'}},
+                              ensure_ascii=False) for i in range(50)]
+        payload = ('\n'.join(frames) + '\n').encode('utf-8')
+        server_socket.sendall(payload[:-20])
+        time.sleep(0.02)
+        server_socket.sendall(payload[-20:])
+        
+        # Thread nhận đã đọc hết trong khi handler câu hỏi vẫn đang chặn
+        deadline = time.time() + 1
+        while network.dispatcher.get_metrics()['submitted'] < 51 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(network.dispatcher.get_metrics()['submitted'], 51)
+        self.assertEqual(leaderboards, [])
+        
+        gate.set()
+        network.dispatcher.flush(timeout=1)
+        self.assertEqual(leaderboards, [{'n': 49, 'name': 'Người chơi'}])
+        
+        server_socket.close()
+        receive_thread.join(1)
+        network.dispatcher.stop(timeout=1)
+
+class TestReconnect(unittest.TestCase):
+    """Test cho kết nối lại trong nền"""
+    
+    def test_backoff_delay_grows_with_jitter(self):
+        """Test thời gian chờ tăng gấp đôi, có jitter và bị chặn trên"""
+        for attempt in range(10):
+            delay = backoff_delay(attempt, base=0.5, maximum=10.0)
+            expected = min(10.0, 0.5 * 2 ** attempt)
+            self.assertGreaterEqual(delay, expected / 2)
+            self.assertLessEqual(delay, expected)
+    
+    def test_reconnects_in_background(self):
+        """Test mất kết nối thì tự kết nối lại mà không chặn bên gọi"""
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(2)
+        listener.settimeout(2)
+        events = []
+        reconnected = threading.Event()
+        
+        network = NetworkManager(auto_reconnect=True)
+        network.register_connection_handler('lost', lambda: events.append('lost'))
+        network.register_connection_handler('reconnected', lambda: (events.append('reconnected'), reconnected.set()))
+        self.assertTrue(network.connect('127.0.0.1', listener.getsockname()[1]))
+        
+        # Server đóng kết nối đầu tiên
+        first, _ = listener.accept()
+        first.close()
+        deadline = time.time() + 1
+        while network.is_connected and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(network.is_reconnecting())
+        
+        second, _ = listener.accept()
+        self.assertTrue(reconnected.wait(2))
+        self.assertTrue(network.is_connected)
+        self.assertFalse(network.is_reconnecting())
+        self.assertEqual(events, ['lost', 'reconnected'])
+        
+        network.disconnect()
+        second.close()
+        listener.close()
+        network.dispatcher.stop(timeout=1)
+
+class TestAnswerRetry(unittest.TestCase):
+    """Test cho gửi lại đáp án chưa được xác nhận"""
+    
+    def setUp(self):
+        """Thiết lập test"""
+        self.view_model = GameViewModel()
+        self.sent = []
+        self.view_model.network.send_message = lambda message_type, data=None: self.sent.append(
+            (message_type, dict(data))) or True
+    
+    def test_pending_answer_resent_after_resume_until_acknowledged(self):
+        """Test đáp án được gửi lại cùng id sau khi resume và xóa khi có xác nhận"""
+        self.view_model._handle_question({'question_id': 3, 'question_text': '1 + 1 = ?'})
+        self.view_model.submit_answer('B')
+        self.view_model._handle_connect({'success': True, 'resumed': True, 'in_room': True})
+        
+        self.assertEqual(len(self.sent), 2)
+        self.assertEqual(self.sent[0], self.sent[1])
+        self.assertEqual(self.sent[1][1], {'answer': 'B', 'question_id': 3, 'answer_id': 1})
+        
+        self.view_model._handle_answer({'success': True, 'answer_id': 1, 'received_at': 100.0})
+        self.assertIsNone(self.view_model.pending_answer)
+        self.assertEqual(self.view_model.last_answer_ack['received_at'], 100.0)
+        self.assertFalse(self.view_model.resend_pending_answer())
+    
+    def test_latency_measured_and_reported_as_telemetry(self):
+        """Test đo thời gian vẽ, phản xạ, round-trip và gửi frame TELEMETRY khi bật"""
+        self.view_model.telemetry_enabled = True
+        with mock.patch('client.view_model.time.perf_counter', side_effect=[10.0, 10.005, 10.405, 10.445]):
+            self.view_model._handle_question({'question_id': 3})
+            self.view_model.mark_question_rendered()
+            self.view_model.mark_question_rendered()
+            self.view_model.submit_answer('B')
+            self.view_model._handle_answer({'success': True, 'answer_id': 1, 'question_id': 3, 'response_time': 0.47})
+        
+        latency = self.view_model.get_latency_stats()
+        self.assertAlmostEqual(latency['render_ms'], 5)
+        self.assertAlmostEqual(latency['reaction_ms'], 400)
+        self.assertAlmostEqual(latency['round_trip_ms'], 40)
+        self.assertAlmostEqual(latency['one_way_ms'], 20)
+        self.assertAlmostEqual(latency['server_response_ms'], 470)
+        self.assertEqual(self.sent[-1], (MessageType.TELEMETRY, {'q': 3, 'rd': 5.0, 'rt': 400.0, 'rtt': 40.0, 'srv': 470.0}))
+        
+        # Xác nhận của bản gửi lại không thay đổi số đo
+        self.view_model._handle_answer({'success': True, 'answer_id': 1, 'duplicate': True, 'response_time': 0.47})
+        self.assertEqual(len(self.sent), 2)
+    
+    def test_new_question_drops_stale_pending_answer(self):
+        """Test câu hỏi mới thì bỏ đáp án đang chờ của câu trước"""
+        self.view_model._handle_question({'question_id': 3})
+        self.view_model.submit_answer('B')
+        self.view_model._handle_question({'question_id': 4})
+        self.assertIsNone(self.view_model.pending_answer)
+
+def start_test_server(questions) -> GameServer:
+    """Khởi động server thật trên cổng ngẫu nhiên (chỉ nhận kết nối, game do test điều khiển)"""
+    with mock.patch.object(GameServer, 'setup_logging'):
+        server = GameServer(port=0, storage=MemoryStorage())
+    server.game_manager.set_questions(questions)
+    server.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.server_socket.bind(('127.0.0.1', 0))
+    server.server_socket.listen(64)
+    server.port = server.server_socket.getsockname()[1]
+    server.running = True
+    threading.Thread(target=server.accept_connections, daemon=True).start()
+    return server
+
+class TestAsyncGameClient(unittest.TestCase):
+    """Test cho client asyncio với server thật"""
+    
+    def setUp(self):
+        """Khởi động server trên cổng ngẫu nhiên"""
+        self.server = start_test_server([Question("1 + 1 = ?", ["1", "2", "3", "4"], "B")])
+        self.port = self.server.port
+    
+    def tearDown(self):
+        """Dừng server"""
+        self.server.stop()
+    
+    def test_play_one_question(self):
+        """Test kết nối, vào phòng, nhận câu hỏi, trả lời và đọc sự kiện"""
+        async def scenario():
+            async with AsyncGameClient("Player1", '127.0.0.1', self.port) as first, \
+                    AsyncGameClient("Player2", '127.0.0.1', self.port) as second:
+                self.assertIsNotNone(first.resume_token)
+                await first.join(timeout=1)
+                await second.join(timeout=1)
+                
+                intruder = AsyncGameClient("Player1", '127.0.0.1', self.port)
+                with self.assertRaises(ServerError):
+                    await intruder.connect(timeout=1)
+                await intruder.close()
+                
+                # Server gửi câu hỏi
+                self.server.start_game()
+                self.server.send_question(self.server.game_manager.get_next_question())
+                question = await first.wait_question(timeout=1)
+                self.assertEqual(question['question_text'], "1 + 1 = ?")
+                
+                ack = await first.submit_answer("B", timeout=1)
+                self.assertTrue(ack['success'])
+                self.assertIn('received_at', ack)
+                self.assertEqual(ack['question_id'], question['question_id'])
+                with self.assertRaises(ServerError):
+                    await first.submit_answer("C", timeout=1)
+                
+                types = []
+                async for message in second:
+                    types.append(message['type'])
+                    if message['type'] == MessageType.INFO and 'answered' in message['data'].get('message', ''):
+                        break
+                self.assertIn(MessageType.QUESTION, types)
+        
+        asyncio.run(asyncio.wait_for(scenario(), 5))
+
+class TestLoadGenerator(unittest.TestCase):
+    """Test cho bộ tạo tải"""
+    
+    def setUp(self):
+        """Khởi động server trên cổng ngẫu nhiên"""
+        self.server = start_test_server([
+            Question("1 + 1 = ?", ["1", "2", "3", "4"], "B"),
+            Question("2 + 2 = ?", ["2", "3", "4", "5"], "C")
+        ])
+    
+    def tearDown(self):
+        """Dừng server"""
+        self.server.stop()
+    
+    def host_game(self):
+        """Điều khiển trận đấu khi đủ người chơi (chạy trên thread riêng như game loop)"""
+        deadline = time.time() + 3
+        while len(self.server.game_manager.players) < 4 and time.time() < deadline:
+            time.sleep(0.01)
+        self.server.start_game()
+        with mock.patch('server.server.WAIT_TIME_BETWEEN_QUESTIONS', 0):
+            for _ in range(2):
+                self.server.send_question(self.server.game_manager.get_next_question())
+                time.sleep(0.3)
+                self.server.end_question()
+        self.server.end_game()
+    
+    def test_simulated_players_report_latencies(self):
+        """Test người chơi giả lập chơi hết trận và báo cáo có đủ số liệu"""
+        host = threading.Thread(target=self.host_game, daemon=True)
+        host.start()
+        report = asyncio.run(run_load(
+            '127.0.0.1', self.server.port, players=4, join_rate=0, delay_distribution='uniform',
+            delay_mean=0.05, delay_spread=0.02, accuracy=1.0, churn=0.5, duration=5, seed=1
+        ))
+        host.join(1)
+        
+        self.assertEqual(report['players_connected'], 4)
+        self.assertEqual(report['questions'], 2)
+        self.assertEqual(report['answers_acked'] + report['answers_rejected'], report['questions_received'])
+        self.assertEqual(report['connect_latency']['count'], 4)
+        self.assertGreater(report['answer_ack_latency']['count'], 0)
+        self.assertEqual(report['fanout_skew']['count'], 2)
+        self.assertEqual(report['resumes'], report['disconnects'])
+        self.assertLess(report['elapsed_s'], 5)
+        
+        # Người trả lời đúng được cộng điểm
+        self.assertTrue(all(player.score > 0 for player in self.server.game_manager.players.values()))
+
+class FakeWidget:
+    """Widget giả ghi lại số lần được cập nhật"""
+    
+    def __init__(self):
+        self.updates = 0
+    
+    def config(self, **kwargs):
+        self.updates += 1
+    
+    def delete(self, *args):
+        self.updates += 1
+    
+    def insert(self, *args):
+        pass
+
+class FakeLeaderboardWidget(FakeWidget):
+    """Widget bảng xếp hạng giả đếm số lần nhận dữ liệu mới"""
+    
+    def __init__(self):
+        super().__init__()
+        self.view = LeaderboardView()
+    
+    def set_rows(self, rows):
+        self.updates += 1
+        self.view.set_rows(rows)
+
+class FakeRoot:
+    """Cửa sổ Tk giả: giữ lại các lời gọi after để test tự chạy"""
+    
+    def __init__(self):
+        self.scheduled = []
+    
+    def after(self, delay, func, *args):
+        self.scheduled.append((func, args))
+    
+    def run_pending(self):
+        """Chạy các lời gọi đã hẹn (như một vòng mainloop)"""
+        scheduled, self.scheduled = self.scheduled, []
+        for func, args in scheduled:
+            func(*args)
+
+class TestGuiRepaint(unittest.TestCase):
+    """Test cho cơ chế vẽ lại theo vùng bị đánh dấu"""
+    
+    def test_dirty_tracker_coalesces_marks(self):
+        """Test chỉ lần đánh dấu đầu tiên cần hẹn vẽ, take() trả về tất cả vùng"""
+        tracker = DirtyTracker()
+        self.assertTrue(tracker.mark('status'))
+        self.assertFalse(tracker.mark('leaderboard'))
+        self.assertTrue(tracker.is_dirty('status'))
+        self.assertEqual(tracker.take(), {'status', 'leaderboard'})
+        self.assertEqual(tracker.take(), set())
+        self.assertTrue(tracker.mark('question'))
+    
+    @unittest.skipIf(GUIInterface is None, "tkinter is not available")
+    def test_gui_repaints_once_per_frame_and_only_on_change(self):
+        """Test nhiều sự kiện gộp thành một lần vẽ, vùng không đổi không bị vẽ lại"""
+        view_model = GameViewModel()
+        gui = GUIInterface(view_model)
+        gui.root = FakeRoot()
+        gui.status_label, gui.question_label, gui.leaderboard_widget = FakeWidget(), FakeWidget(), FakeLeaderboardWidget()
+        
+        # Máy rảnh: không có sự kiện thì không hẹn vẽ
+        self.assertEqual(gui.root.scheduled, [])
+        
+        view_model.leaderboard = [{'username': 'Player1', 'score': 10}]
+        for _ in range(100):
+            gui.on_leaderboard_updated(view_model.leaderboard)
+            gui.on_state_changed(view_model.state)
+        self.assertEqual(len(gui.root.scheduled), 1)
+        gui.root.run_pending()
+        self.assertEqual(gui.leaderboard_widget.updates, 1)
+        self.assertEqual(gui.status_label.updates, 1)
+        
+        # Bảng xếp hạng không đổi thì widget không bị vẽ lại
+        gui.on_leaderboard_updated(view_model.leaderboard)
+        gui.root.run_pending()
+        self.assertEqual(gui.leaderboard_widget.updates, 1)
+        
+        view_model.leaderboard = [{'username': 'Player1', 'score': 25}]
+        gui.on_leaderboard_updated(view_model.leaderboard)
+        gui.root.run_pending()
+        self.assertEqual(gui.leaderboard_widget.updates, 2)
+        self.assertEqual(gui.question_label.updates, 1)
+
+class TestLeaderboardView(unittest.TestCase):
+    """Test cho bảng xếp hạng ảo hóa"""
+    
+    def setUp(self):
+        self.rows = [{'username': f'Player{i}', 'score': 50000 - i, 'rank': i + 1} for i in range(50000)]
+        self.view = LeaderboardView(height=10, username='Player31337')
+        self.view.set_rows(self.rows)
+    
+    def test_only_visible_rows_are_returned(self):
+        """Test chỉ trả về đúng số dòng nhìn thấy, cuộn không vượt quá cuối danh sách"""
+        self.assertEqual([position for position, _ in self.view.visible()], list(range(10)))
+        self.view.page(10000)
+        self.assertEqual(self.view.visible()[-1][1]['username'], 'Player49999')
+        self.assertEqual(len(self.view.visible()), 10)
+    
+    def test_scroll_to_me_follows_player(self):
+        """Test cuộn đến dòng của mình và bám theo khi thứ hạng thay đổi"""
+        self.assertTrue(self.view.scroll_to_me())
+        self.assertIn('Player31337', [row['username'] for _, row in self.view.visible()])
+        
+        # Người chơi tụt hạng: cửa sổ đi theo
+        rows = self.rows[:31337] + self.rows[31338:45000] + [self.rows[31337]] + self.rows[45000:]
+        self.view.set_rows(rows)
+        self.assertIn('Player31337', [row['username'] for _, row in self.view.visible()])
+        
+        self.view.scroll(-5)
+        self.assertFalse(self.view.follow_me)
+    
+    def test_search_by_name_wraps_around(self):
+        """Test tìm theo tên không phân biệt hoa thường, lần tìm tiếp theo sang kết quả sau"""
+        self.assertEqual(self.view.search('player4999'), 4999)
+        self.assertEqual(self.view.search('PLAYER4999'), 49990)
+        for _ in range(10):
+            self.view.search('player4999')
+        self.assertEqual(self.view.selected, 4999)
+        self.assertIsNone(self.view.search('nobody'))
+    
+    def test_large_leaderboard_stays_fast(self):
+        """Test cập nhật, cuộn và tìm kiếm với 50k dòng đủ nhanh cho mỗi khung hình"""
+        start = time.perf_counter()
+        for _ in range(20):
+            self.view.set_rows(list(self.rows))
+            self.view.scroll_to_me()
+            self.view.visible()
+        elapsed = (time.perf_counter() - start) / 20
+        self.assertLess(elapsed, 0.05)
+    
+    def test_view_model_tracks_player_rank(self):
+        """Test ViewModel tính hạng của người chơi từ bảng xếp hạng"""
+        view_model = GameViewModel()
+        view_model.username = 'Player31337'
+        view_model._handle_leaderboard({'leaderboard': self.rows})
+        self.assertEqual(view_model.get_player_stats()['rank'], 31338)
+        
+        view_model._handle_leaderboard({'leaderboard': [{'username': 'Other', 'score': 1}]})
+        self.assertEqual(view_model.get_player_stats()['rank'], 0)
+
+class RecordingStream:
+    """Stream giả ghi lại từng lần write"""
+    
+    def __init__(self):
+        self.writes = []
+    
+    def write(self, data):
+        self.writes.append(data)
+    
+    def flush(self):
+        pass
+
+class TestScreenRenderer(unittest.TestCase):
+    """Test cho bộ vẽ console theo khác biệt khung hình"""
+    
+    def setUp(self):
+        self.stream = RecordingStream()
+        self.screen = ScreenRenderer(self.stream, height=24, prompt=">>> ")
+    
+    def draw(self, *lines):
+        self.screen.begin_frame()
+        for line in lines:
+            self.screen.line(line)
+        return self.screen.present()
+    
+    def test_only_changed_rows_are_written(self):
+        """Test khung đầu vẽ toàn bộ, khung sau chỉ ghi dòng thay đổi trong một lần write"""
+        self.draw("header", "score: 10", "footer")
+        self.assertEqual(len(self.stream.writes), 1)
+        self.assertTrue(self.stream.writes[0].startswith(CLEAR_SCREEN))
+        
+        # Khung giống hệt: không ghi gì
+        self.assertEqual(self.draw("header", "score: 10", "footer"), 0)
+        self.assertEqual(len(self.stream.writes), 1)
+        
+        self.draw("header", "score: 25", "footer")
+        self.assertEqual(len(self.stream.writes), 2)
+        output = self.stream.writes[1]
+        self.assertIn(move_to(2) + "score: 25", output)
+        self.assertNotIn("header", output)
+        self.assertNotIn("footer", output)
+        self.assertNotIn(CLEAR_SCREEN, output)
+    
+    def test_shorter_frame_clears_leftover_rows(self):
+        """Test khung ngắn hơn xóa phần thừa và đưa dòng nhắc lên"""
+        self.draw("a", "b", "c", "d")
+        self.draw("a", "b")
+        self.assertEqual(self.stream.writes[-1], move_to(3) + "\033[J>>> ")
+    
+    def test_frame_is_clipped_to_terminal_height(self):
+        """Test khung dài hơn terminal bị cắt để terminal không cuộn"""
+        self.draw(*[f"row {i}" for i in range(100)])
+        self.assertNotIn("row 22", self.stream.writes[0])
+        self.assertIn("row 21", self.stream.writes[0])
+    
+    def test_console_ui_redraws_without_clear(self):
+        """Test UI console không gọi lệnh clear và mỗi sự kiện chỉ ghi một lần"""
+        view_model = GameViewModel()
+        view_model.state = ClientState.IN_ROOM
+        ui = ConsoleInterface(view_model)
+        ui.screen = ScreenRenderer(self.stream, height=40, prompt=">>> ")
+        
+        with mock.patch('os.system') as system:
+            ui.clear_screen()
+            ui.on_leaderboard_updated([{'username': f'Player{i}', 'score': 100 - i} for i in range(50)])
+            ui.on_leaderboard_updated([{'username': f'Player{i}', 'score': 200 - i} for i in range(50)])
+            ui.show_message("Hello", "info")
+        system.assert_not_called()
+        
+        self.assertEqual(len(self.stream.writes), 3)
+        self.assertIn("200", self.stream.writes[1])
+        self.assertNotIn("FASTEST FINGER FIRST", self.stream.writes[1])
+        self.assertIn("[INFO] Hello", self.stream.writes[2])
+    
+    def test_console_ui_fits_small_terminal(self):
+        """Test terminal 24 dòng: thông báo lỗi, dòng của mình và footer vẫn hiện, bảng xếp hạng co lại"""
+        view_model = GameViewModel()
+        view_model.state = ClientState.IN_ROOM
+        view_model.username = "Player50"
+        ui = ConsoleInterface(view_model)
+        ui.screen = ScreenRenderer(self.stream, height=24, prompt=">>> ")
+        ui.leaderboard = [{'username': f'Player{i}', 'score': 1000 - i} for i in range(100)]
+        for i in range(4):
+            ui.messages.append(('blue', f"[INFO] message {i}"))
+        
+        ui.show_message("Server unavailable", "error")
+        
+        frame = ui.screen._previous
+        self.assertLessEqual(len(frame), 22)
+        output = '\n'.join(frame)
+        self.assertIn("[ERROR] Server unavailable", output)
+        self.assertIn("Player50", output)
+        self.assertIn("Leaderboard: top, me, up, down, find <name>", frame[-1])
+        self.assertLess(ui.leaderboard_view.height, LEADERBOARD_VISIBLE_ROWS)
+
+# Thời gian tối đa từ lúc import client đến khi server xác nhận đăng nhập (ms)
+STARTUP_BUDGET_MS = 1500
+ROOT_DIR = Path(__file__).parent.parent
+
+class TestStartup(unittest.TestCase):
+    """Test thời gian khởi động client"""
+    
+    def setUp(self):
+        """Khởi động server trên cổng ngẫu nhiên"""
+        self.server = start_test_server([Question("1 + 1 = ?", ["1", "2", "3", "4"], "B")])
+    
+    def tearDown(self):
+        """Dừng server"""
+        self.server.stop()
+    
+    def test_console_client_connects_within_budget(self):
+        """Test client console kết nối xong trong ngân sách thời gian, báo cáo qua --profile-startup"""
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'client.client', '--username', 'Kiosk', '--host', '127.0.0.1',
+             '--port', str(self.server.port), '--profile-startup'],
+            cwd=ROOT_DIR, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE, text=True
+        )
+        watchdog = threading.Timer(15, process.kill)
+        watchdog.start()
+        
+        timings = {}
+        try:
+            for line in process.stderr:
+                match = re.match(r"startup: (.+?)\s+\+\s*[\d.]+ ms\s+\(total\s+([\d.]+) ms\)", line)
+                if match:
+                    timings[match.group(1)] = float(match.group(2))
+                    if 'connected' in timings and 'import ui' in timings:
+                        break
+        finally:
+            watchdog.cancel()
+            process.kill()
+            process.wait()
+            process.stderr.close()
+        
+        self.assertIn('import ui', timings)
+        self.assertLess(timings['connected'], STARTUP_BUDGET_MS)
+    
+    def test_console_path_does_not_import_tkinter(self):
+        """Test client và UI console không import tkinter"""
+        output = subprocess.run(
+            [sys.executable, '-c', 'import sys, client.client, ui.console_ui; print("tkinter" in sys.modules)'],
+            cwd=ROOT_DIR, capture_output=True, text=True, check=True
+        ).stdout
+        self.assertEqual(output.strip(), 'False')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+"""
+Test cho bộ tạo câu hỏi Fastest Finger First
+"""
+
+import unittest
+import sys
+import os
+import json
+import tempfile
+from pathlib import Path
+
+# Thêm thư mục gốc vào path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from data.questions_generator import QuestionGenerator, np
+from data.parallel_generator import content_hash, generate_parallel, split_count
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class TestBatchGeneration(unittest.TestCase):
+    """Test cho sinh câu hỏi theo lô"""
+    
+    def setUp(self):
+        """Thiết lập test"""
+        self.generator = QuestionGenerator()
+    
+    def test_options_unique_and_correct(self):
+        """Test các lựa chọn không trùng và đáp án đúng nằm đúng vị trí"""
+        for difficulty in ['easy', 'medium', 'hard']:
+            batch = self.generator.generate_math_batch(2000, difficulty, seed=7)
+            options = batch['options']
+            sorted_options = np.sort(options, axis=1)
+            self.assertTrue((sorted_options[:, 1:] != sorted_options[:, :-1]).all())
+            
+            picked = options[np.arange(len(options)), batch['correct_index']]
+            self.assertTrue((picked == batch['result']).all())
+    
+    def test_deterministic_with_seed(self):
+        """Test cùng seed cho cùng kết quả"""
+        first = self.generator.batch_to_questions(self.generator.generate_math_batch(50, seed=42))
+        second = self.generator.batch_to_questions(self.generator.generate_math_batch(50, seed=42))
+        self.assertEqual([q.to_dict() for q in first], [q.to_dict() for q in second])
+    
+    def test_records_match_question_format(self):
+        """Test bản ghi có đáp án khớp với kết quả phép tính"""
+        batch = self.generator.generate_math_batch(20, 'easy', seed=3)
+        for record in self.generator.iter_batch_records(batch):
+            index = ord(record['correct_answer']) - ord('A')
+            expression = record['question_text'].replace(' = ?', '').replace('×', '*')
+            self.assertEqual(int(record['options'][index]), eval(expression))
+    
+    def test_save_batch_to_json(self):
+        """Test ghi gói câu hỏi đọc lại được"""
+        batch = self.generator.generate_math_batch(100, seed=1)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, 'pack.json')
+            self.generator.save_batch_to_json(batch, filename)
+            with open(filename, encoding='utf-8') as f:
+                data = json.load(f)
+        self.assertEqual(len(data['questions']), 100)
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class TestParallelGeneration(unittest.TestCase):
+    """Test cho sinh câu hỏi song song"""
+    
+    def test_split_count(self):
+        """Test chia số lượng câu hỏi"""
+        self.assertEqual(split_count(25, 10), [10, 10, 5])
+        self.assertEqual(split_count(20, 10), [10, 10])
+    
+    def test_generate_parallel_deduplicates_and_is_deterministic(self):
+        """Test loại trùng và kết quả không phụ thuộc số worker"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            first = os.path.join(tmp_dir, 'first.json')
+            second = os.path.join(tmp_dir, 'second.json')
+            stats = generate_parallel(3000, first, difficulty='easy', seed=5, workers=2, chunk_size=500)
+            generate_parallel(3000, second, difficulty='easy', seed=5, workers=1, chunk_size=500)
+            
+            with open(first, encoding='utf-8') as f:
+                questions = json.load(f)['questions']
+            with open(second, encoding='utf-8') as f:
+                self.assertEqual(questions, json.load(f)['questions'])
+        
+        self.assertEqual(stats['generated'], 3000)
+        self.assertEqual(stats['written'] + stats['duplicates'], 3000)
+        keys = {(q['question_text'], q['options'][ord(q['correct_answer']) - ord('A')])
+                for q in questions}
+        self.assertEqual(len(keys), len(questions))
+    
+    def test_content_hash_ignores_option_order(self):
+        """Test hash không phụ thuộc thứ tự lựa chọn"""
+        record = {'question_text': '2 + 3 = ?', 'options': ['4', '5', '6', '7'], 'correct_answer': 'B'}
+        shuffled = {'question_text': '2 + 3 = ?', 'options': ['7', '6', '5', '4'], 'correct_answer': 'C'}
+        wrong = {'question_text': '2 + 3 = ?', 'options': ['4', '5', '6', '7'], 'correct_answer': 'A'}
+        self.assertEqual(content_hash(record), content_hash(shuffled))
+        self.assertNotEqual(content_hash(record), content_hash(wrong))
+
+if __name__ == '__main__':
+    unittest.main()
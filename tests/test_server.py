@@ -2,18 +2,40 @@
 Test cho server Fastest Finger First
 """
 
+import io
 import unittest
 import sys
 import os
 import time
+import json
+import socket
 import threading
+import sqlite3
+import tempfile
 from pathlib import Path
+from unittest import mock
 
 # Thêm thư mục gốc vào path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from server.game_manager import GameManager, Question, Player
-from server.database import GameDatabase
+from server.database import (
+    GameDatabase, RECENT_GAMES_QUERY, PLAYER_HISTORY_QUERY,
+    RECENT_GAMES_PAGE_QUERY, PLAYER_HISTORY_PAGE_QUERY
+)
+from server.migrations import MIGRATIONS, apply_migrations
+from server.leaderboard import LeaderboardIndex
+from server.cache import LRUCache
+from server.write_behind import WriteBehindDatabase
+from server.archive import GameArchiver, ARCHIVE_INDEX_FILE
+from server.storage import MemoryStorage, create_storage
+from server.question_stats import QuestionStatsTracker, ResponseTimeSketch
+from server.analytics import np, load_answers, from_game_manager, per_category, per_player, fast_streaks, build_report
+from server.export import DATASETS, export_dataset, open_readonly, read_columnar
+from server.sessions import SessionManager
+from server.telemetry import LatencyTelemetry
+from server.server import GameServer, ClientHandler
+from server.config import MessageType, MAX_HISTORY_PAGE_SIZE
 
 class TestGameManager(unittest.TestCase):
     """Test cho GameManager"""
@@ -81,6 +103,54 @@ class TestGameManager(unittest.TestCase):
         result = self.game_manager.submit_answer("Player1", "B")
         self.assertFalse(result['valid'])
     
+    def test_submit_answer_is_idempotent(self):
+        """Test gửi lại cùng answer_id trả về xác nhận lần đầu, câu hỏi cũ bị từ chối"""
+        self.game_manager.add_player("Player1")
+        self.game_manager.add_player("Player2")
+        self.game_manager.start_game()
+        self.game_manager.get_next_question()
+        question_id = self.game_manager.question_id
+        
+        first = self.game_manager.submit_answer("Player1", "B", question_id, answer_id=7)
+        self.assertTrue(first['valid'])
+        self.assertFalse(first['duplicate'])
+        self.assertIn('received_at', first)
+        
+        time.sleep(0.01)
+        retry = self.game_manager.submit_answer("Player1", "B", question_id, answer_id=7)
+        self.assertTrue(retry['duplicate'])
+        self.assertEqual(retry['received_at'], first['received_at'])
+        self.assertEqual(retry['response_time'], first['response_time'])
+        
+        # Đáp án khác của cùng người chơi vẫn bị từ chối
+        self.assertFalse(self.game_manager.submit_answer("Player1", "C", question_id, answer_id=8)['valid'])
+        
+        # Đáp án gửi trễ cho câu hỏi trước không được tính vào câu hỏi mới
+        self.game_manager.end_question()
+        self.game_manager.get_next_question()
+        stale = self.game_manager.submit_answer("Player2", "A", question_id, answer_id=1)
+        self.assertFalse(stale['valid'])
+        self.assertNotIn("Player2", self.game_manager.player_answers)
+    
+    def test_answer_between_questions_is_rejected(self):
+        """Test đáp án gửi sau end_question và trước câu hỏi tiếp theo bị từ chối, không được ghi nhận"""
+        self.game_manager.add_player("Player1")
+        self.game_manager.add_player("Player2")
+        self.game_manager.start_game()
+        self.game_manager.get_next_question()
+        self.game_manager.submit_answer("Player1", "B")
+        self.game_manager.end_question()
+        
+        late = self.game_manager.submit_answer("Player2", "B")
+        self.assertFalse(late['valid'])
+        self.assertEqual(late['message'], 'Question closed')
+        self.assertNotIn("Player2", self.game_manager.player_answers)
+        self.assertEqual(self.game_manager.players["Player2"].response_times, [])
+        self.assertEqual(self.game_manager.end_question(), {})
+        
+        self.game_manager.get_next_question()
+        self.assertTrue(self.game_manager.submit_answer("Player2", "A")['valid'])
+    
     def test_end_question(self):
         """Test kết thúc câu hỏi"""
         self.game_manager.add_player("Player1")
@@ -158,6 +228,1188 @@ class TestDatabase(unittest.TestCase):
         
         leaderboard = self.database.get_leaderboard()
         self.assertEqual(len(leaderboard), 3)
+    
+    def test_nested_transaction_rolls_back_together(self):
+        """Test transaction lồng nhau chỉ commit/rollback ở tầng ngoài cùng"""
+        with self.assertRaises(RuntimeError):
+            with self.database.transaction():
+                self.database.add_player("Player1")
+                raise RuntimeError("abort batch")
+        self.assertIsNone(self.database.get_player_stats("Player1"))
+        self.assertIsNone(self.database.get_player_rank("Player1"))
+        
+        with self.database.transaction():
+            self.database.add_player("Player1")
+            self.database.add_player("Player2")
+        self.assertEqual(len(self.database.get_leaderboard()), 2)
+    
+    def test_failed_commit_rolls_back(self):
+        """Test COMMIT lỗi thì transaction được rollback và kết nối vẫn dùng được"""
+        with self.database.transaction() as cursor:
+            cursor.execute("CREATE TABLE parent (id INTEGER PRIMARY KEY)")
+            cursor.execute("CREATE TABLE child (parent_id REFERENCES parent (id) DEFERRABLE INITIALLY DEFERRED)")
+        self.database.conn.execute("PRAGMA foreign_keys = ON")
+        
+        # Khóa ngoại trì hoãn chỉ được kiểm tra lúc COMMIT
+        with self.assertRaises(sqlite3.IntegrityError):
+            with self.database.transaction() as cursor:
+                cursor.execute("INSERT INTO child (parent_id) VALUES (1)")
+        self.assertFalse(self.database.conn.in_transaction)
+        self.assertEqual(self.database._transaction_depth, 0)
+        
+        self.assertTrue(self.database.add_player("Player1"))
+        with self.database.transaction() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM child")
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+class TestLeaderboard(unittest.TestCase):
+    """Test cho bảng xếp hạng toàn thời gian"""
+    
+    def setUp(self):
+        """Thiết lập test"""
+        self.database = GameDatabase(":memory:")
+        for i in range(1, 6):
+            self.database.add_player(f"Player{i}")
+    
+    def tearDown(self):
+        """Dọn dẹp test"""
+        self.database.close()
+    
+    def save_scores(self, scores: dict):
+        """Lưu một trận với điểm cho trước"""
+        game_id = self.database.create_game(len(scores), 1)
+        self.database.save_game_result(game_id, [
+            {'username': username, 'score': score, 'correct_answers': 0, 'wrong_answers': 0}
+            for username, score in scores.items()
+        ])
+    
+    def test_matches_sql_order(self):
+        """Test thứ hạng trong bộ nhớ khớp với thứ tự trong bảng players"""
+        self.save_scores({"Player1": 10, "Player2": 30, "Player3": 20})
+        self.save_scores({"Player1": 25, "Player4": 5})
+        
+        rows = self.database.conn.execute(
+            "SELECT username FROM players ORDER BY total_score DESC, best_score DESC, username"
+        ).fetchall()
+        self.assertEqual([entry['username'] for entry in self.database.get_leaderboard(limit=10)],
+                         [row[0] for row in rows])
+        self.assertEqual(self.database.get_player_rank("Player1"), 1)
+        self.assertEqual(self.database.get_player_stats("Player1")['total_score'], 35)
+    
+    def test_reloaded_from_database(self):
+        """Test bảng xếp hạng nạp lại từ database giống bản cập nhật dần"""
+        self.save_scores({"Player3": 40, "Player5": 15})
+        before = self.database.get_leaderboard(limit=10)
+        self.database.load_leaderboard()
+        self.assertEqual(self.database.get_leaderboard(limit=10), before)
+    
+    def test_page_and_around(self):
+        """Test phân trang và lấy các dòng xung quanh người chơi"""
+        index = LeaderboardIndex()
+        index.load([(f"P{i:03d}", i, 1, i) for i in range(100)])
+        
+        page = index.page(10, 5)
+        self.assertEqual([entry['rank'] for entry in page], [11, 12, 13, 14, 15])
+        self.assertEqual(page[0]['username'], "P089")
+        
+        around = index.around("P050", radius=2)
+        self.assertEqual([entry['username'] for entry in around], ["P052", "P051", "P050", "P049", "P048"])
+        self.assertEqual(index.rank("P050"), 50)
+        self.assertEqual(index.around("P099", radius=2)[0]['rank'], 1)
+        self.assertIsNone(index.rank("unknown"))
+    
+    def test_new_player_created_by_game_result(self):
+        """Test người chơi chưa có trong bảng players được tạo khi lưu kết quả"""
+        self.save_scores({"Newcomer": 50, "Player1": 5})
+        self.assertEqual(self.database.get_player_stats("Newcomer")['total_games'], 1)
+        self.assertEqual(self.database.get_player_rank("Newcomer"), 1)
+    
+    def test_large_room_saved_in_one_batch(self):
+        """Test lưu kết quả phòng lớn và bảng xếp hạng vẫn khớp với database"""
+        scores = {f"User{i}": i % 37 for i in range(2000)}
+        self.save_scores(scores)
+        
+        rows = self.database.conn.execute(
+            "SELECT username FROM players ORDER BY total_score DESC, best_score DESC, username LIMIT 50"
+        ).fetchall()
+        self.assertEqual([entry['username'] for entry in self.database.get_leaderboard(limit=50)],
+                         [row[0] for row in rows])
+        count = self.database.conn.execute("SELECT COUNT(*) FROM game_details").fetchone()[0]
+        self.assertEqual(count, 2000)
+    
+    def test_revert_pending_keeps_other_updates(self):
+        """Test hoàn tác một cập nhật đang chờ chỉ bỏ phần của nó"""
+        index = LeaderboardIndex()
+        index.load([("Player1", 10, 1, 10), ("Player2", 50, 1, 50)])
+        index.apply_pending(1, 'apply_game_results', [{'username': "Player1", 'score': 30}])
+        index.apply_pending(2, 'add_player', "Newcomer")
+        index.apply_pending(3, 'apply_game_results', [{'username': "Player1", 'score': 5},
+                                                      {'username': "Newcomer", 'score': 60}])
+        self.assertEqual(index.rank("Newcomer"), 1)
+        
+        index.confirm_pending([2])
+        index.revert_pending([1, 3])
+        self.assertEqual(index.page(0, 3), [
+            {'rank': 1, 'username': "Player2", 'total_score': 50, 'total_games': 1, 'best_score': 50},
+            {'rank': 2, 'username': "Player1", 'total_score': 10, 'total_games': 1, 'best_score': 10},
+            {'rank': 3, 'username': "Newcomer", 'total_score': 0, 'total_games': 0, 'best_score': 0}
+        ])
+        
+        index.apply_pending(4, 'add_player', "Ghost")
+        index.apply_pending(5, 'apply_game_results', [{'username': "Player1", 'score': 30}])
+        index.apply_pending(6, 'apply_game_results', [{'username': "Player1", 'score': 20}])
+        index.revert_pending([4, 5])
+        self.assertIsNone(index.rank("Ghost"))
+        self.assertEqual(index.around("Player1", 0)[0]['total_score'], 30)
+        self.assertEqual(index.around("Player1", 0)[0]['best_score'], 20)
+        index.confirm_pending([6])
+        self.assertEqual((index._pending, index._base, index._pending_counts), ({}, {}, {}))
+    
+    def test_end_game_includes_global_rank(self):
+        """Test kết quả cuối trận có thứ hạng toàn thời gian"""
+        game_manager = GameManager(self.database)
+        game_manager.set_questions([Question("1 + 1 = ?", ["1", "2", "3", "4"], "B")])
+        game_manager.add_player("Player1")
+        game_manager.add_player("Player2")
+        game_manager.start_game()
+        game_manager.get_next_question()
+        game_manager.submit_answer("Player2", "B")
+        game_manager.end_question()
+        
+        final_results = game_manager.end_game()
+        ranks = {player['username']: player['global_rank'] for player in final_results['players']}
+        self.assertEqual(ranks["Player2"], 1)
+
+class TestPlayerCache(unittest.TestCase):
+    """Test cho cache người chơi"""
+    
+    def setUp(self):
+        """Thiết lập test"""
+        self.database = GameDatabase(":memory:")
+    
+    def tearDown(self):
+        """Dọn dẹp test"""
+        self.database.close()
+    
+    def test_lru_eviction_and_ttl(self):
+        """Test loại phần tử ít dùng nhất và hết hạn"""
+        cache = LRUCache(maxsize=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get_stats()['evictions'], 1)
+        
+        expiring = LRUCache(maxsize=2, ttl=0.01)
+        expiring.put("a", 1)
+        time.sleep(0.02)
+        self.assertIsNone(expiring.get("a"))
+    
+    def test_returning_player_join_hits_cache(self):
+        """Test người chơi quay lại không cần truy vấn database"""
+        self.assertTrue(self.database.add_player("Player1"))
+        misses = self.database.get_cache_stats()['players']['misses']
+        
+        for _ in range(5):
+            self.assertFalse(self.database.add_player("Player1"))
+            self.database.get_player_stats("Player1")
+        
+        stats = self.database.get_cache_stats()['players']
+        self.assertEqual(stats['misses'], misses)
+        self.assertEqual(stats['hits'], 10)
+    
+    def test_save_game_result_invalidates(self):
+        """Test lưu kết quả trận xóa hồ sơ và lịch sử cũ trong cache"""
+        self.database.add_player("Player1")
+        self.assertEqual(self.database.get_player_history("Player1"), [])
+        
+        game_id = self.database.create_game(1, 1)
+        self.database.save_game_result(game_id, [
+            {'username': "Player1", 'score': 20, 'correct_answers': 2, 'wrong_answers': 0}
+        ])
+        
+        self.assertEqual(self.database.get_player_stats("Player1")['total_score'], 20)
+        self.assertEqual(len(self.database.get_player_history("Player1")), 1)
+    
+    def test_invalidation_during_read_is_not_cached_over(self):
+        """Test lịch sử đọc trước khi bị xóa khỏi cache (lưu kết quả xen giữa) không được đưa vào cache"""
+        self.database.add_player("Player1")
+        transaction = self.database.transaction
+        
+        def save_during_read():
+            self.database.invalidate_player("Player1")
+            return transaction()
+        
+        with mock.patch.object(self.database, 'transaction', side_effect=save_during_read):
+            self.assertEqual(self.database.get_player_history("Player1"), [])
+        self.assertIsNone(self.database.history_cache.get("Player1"))
+        
+        self.database.get_player_history("Player1")
+        self.assertEqual(self.database.history_cache.get("Player1"), [])
+        
+        cache = LRUCache()
+        generation = cache.generation
+        cache.invalidate("a")
+        cache.put("a", 1, generation)
+        self.assertIsNone(cache.get("a"))
+
+class TestPagination(unittest.TestCase):
+    """Test cho phân trang keyset"""
+    
+    def setUp(self):
+        """Thiết lập test"""
+        self.database = GameDatabase(":memory:")
+        self.database.add_player("Player1")
+        # Nhiều trận cùng start_time để kiểm tra thứ tự theo id
+        for i in range(12):
+            game_id = self.database.create_game(1, 1)
+            self.database.conn.execute(
+                "UPDATE games SET start_time = ? WHERE id = ?",
+                (f"2025-01-{i // 3 + 1:02d} 10:00:00", game_id)
+            )
+            self.database.save_game_result(game_id, [
+                {'username': "Player1", 'score': i, 'correct_answers': 0, 'wrong_answers': 0}
+            ])
+    
+    def tearDown(self):
+        """Dọn dẹp test"""
+        self.database.close()
+    
+    def collect_pages(self, fetch_page):
+        """Đọc hết các trang và trả về danh sách id"""
+        ids = []
+        cursor = None
+        while True:
+            page = fetch_page(cursor)
+            self.assertLessEqual(len(page['rows']), 5)
+            ids.extend(row[0] for row in page['rows'])
+            cursor = page['next_cursor']
+            if cursor is None:
+                return ids
+    
+    def test_player_history_pages(self):
+        """Test đọc lịch sử qua các trang không trùng và không sót"""
+        ids = self.collect_pages(
+            lambda cursor: self.database.get_player_history_page("Player1", limit=5, cursor=cursor)
+        )
+        self.assertEqual(ids, list(range(12, 0, -1)))
+    
+    def test_recent_games_pages(self):
+        """Test đọc trận gần đây qua các trang"""
+        ids = self.collect_pages(
+            lambda cursor: self.database.get_recent_games_page(limit=5, cursor=cursor)
+        )
+        self.assertEqual(ids, list(range(12, 0, -1)))
+        
+        page = self.database.get_recent_games_page(limit=5)
+        self.assertEqual(page['columns'][0], 'id')
+        self.assertEqual(page['next_cursor'], page['rows'][-1][1::-1])
+
+class TestDatabaseConnection(unittest.TestCase):
+    """Test cho kết nối database lâu dài"""
+    
+    def test_file_database_uses_wal(self):
+        """Test database file dùng WAL và synchronous=NORMAL"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            database = GameDatabase(os.path.join(tmp_dir, 'game.db'))
+            try:
+                self.assertEqual(database.conn.execute("PRAGMA journal_mode").fetchone()[0], 'wal')
+                self.assertEqual(database.conn.execute("PRAGMA synchronous").fetchone()[0], 1)
+                
+                database.add_player("Player1")
+                threads = [
+                    threading.Thread(target=database.add_player, args=(f"Player{i}",))
+                    for i in range(2, 10)
+                ]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                self.assertEqual(len(database.get_leaderboard(limit=20)), 9)
+            finally:
+                database.close()
+
+class TestMigrations(unittest.TestCase):
+    """Test cho migration và index"""
+    
+    def setUp(self):
+        """Thiết lập test"""
+        self.database = GameDatabase(":memory:")
+    
+    def tearDown(self):
+        """Dọn dẹp test"""
+        self.database.close()
+    
+    def query_plan(self, query: str, params: tuple) -> str:
+        """Lấy query plan dạng chuỗi"""
+        rows = self.database.conn.execute("EXPLAIN QUERY PLAN " + query, params).fetchall()
+        return "\n".join(row[-1] for row in rows)
+    
+    def test_schema_version_recorded_once(self):
+        """Test phiên bản schema được ghi và migration không chạy lại"""
+        latest = MIGRATIONS[-1][0]
+        self.assertEqual(apply_migrations(self.database), latest)
+        count = self.database.conn.execute("SELECT COUNT(*) FROM schema_version").fetchone()[0]
+        self.assertEqual(count, len(MIGRATIONS))
+    
+    def test_player_history_uses_index(self):
+        """Test lịch sử người chơi dùng index theo username"""
+        plan = self.query_plan(PLAYER_HISTORY_QUERY, ("Player1",))
+        self.assertRegex(plan, r"SEARCH gd USING INDEX idx_game_details_player_\w+ \(player_username=\?")
+    
+    def test_recent_games_uses_index(self):
+        """Test trận gần đây dùng index theo start_time"""
+        plan = self.query_plan(RECENT_GAMES_QUERY, (5,))
+        self.assertIn("idx_games_start_time", plan)
+    
+    def test_save_question_result_writes_answers(self):
+        """Test mỗi đáp án được lưu thành một dòng trong bảng answers"""
+        game_id = self.database.create_game(2, 1)
+        self.database.save_question_result(game_id, "1 + 1 = ?", "B", {
+            "Player1": {'answer': 'B', 'response_time': 1.25, 'timestamp': 0},
+            "Player2": {'answer': 'A', 'response_time': 2.5, 'timestamp': 0}
+        })
+        
+        rows = self.database.conn.execute(
+            "SELECT player_username, answer_index, is_correct, response_time_us "
+            "FROM answers ORDER BY player_username"
+        ).fetchall()
+        self.assertEqual(rows, [("Player1", 1, 1, 1250000), ("Player2", 0, 0, 2500000)])
+    
+    def test_backfill_answers_from_json(self):
+        """Test migration chuyển dữ liệu JSON cũ sang bảng answers"""
+        conn = self.database.conn
+        conn.execute("DROP TABLE answers")
+        conn.execute("DELETE FROM schema_version WHERE version >= 3")
+        for i in range(3):
+            conn.execute(
+                "INSERT INTO used_questions (game_id, question_text, correct_answer, player_answers) "
+                "VALUES (1, ?, 'A', ?)",
+                (f"Q{i}", json.dumps({"Player1": {'answer': 'A', 'response_time': 0.5}}))
+            )
+        for blob in ["null", "[1, 2]", "42", '{"Player1": "A"}', "{not json"]:
+            conn.execute(
+                "INSERT INTO used_questions (game_id, question_text, correct_answer, player_answers) "
+                "VALUES (1, 'Broken', 'A', ?)",
+                (blob,)
+            )
+        
+        apply_migrations(self.database)
+        total, correct = conn.execute("SELECT COUNT(*), SUM(is_correct) FROM answers").fetchone()
+        self.assertEqual((total, correct), (3, 3))
+    
+    def test_history_page_uses_index_without_sort(self):
+        """Test trang lịch sử đi theo index, không cần sắp xếp tạm"""
+        plan = self.query_plan(PLAYER_HISTORY_PAGE_QUERY, ("Player1", "2030-01-01", 1, 10))
+        self.assertIn("idx_game_details_player_start", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+        
+        plan = self.query_plan(RECENT_GAMES_PAGE_QUERY, ("2030-01-01", 1, 10))
+        self.assertIn("idx_games_start_time", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+    
+    def test_used_questions_lookup_uses_index(self):
+        """Test tìm câu hỏi theo game dùng index"""
+        plan = self.query_plan("SELECT * FROM used_questions WHERE game_id = ?", (1,))
+        self.assertIn("idx_used_questions_game", plan)
+
+class SlowDatabase(GameDatabase):
+    """Database giả lập ổ đĩa chậm"""
+    
+    def write_question_result(self, *args):
+        time.sleep(0.2)
+        super().write_question_result(*args)
+
+class TestMemoryStorage(unittest.TestCase):
+    """Test cho backend lưu trữ trong bộ nhớ"""
+    
+    def play_games(self, storage):
+        """Chơi vài trận qua GameManager trên một backend"""
+        for winner_answer in ["B", "A", "B"]:
+            game_manager = GameManager(storage)
+            game_manager.set_questions([Question("1 + 1 = ?", ["1", "2", "3", "4"], "B")])
+            game_manager.add_player("Player1")
+            game_manager.add_player("Player2")
+            game_manager.start_game()
+            game_manager.get_next_question()
+            game_manager.submit_answer("Player1", winner_answer)
+            game_manager.submit_answer("Player2", "B")
+            game_manager.end_question()
+            game_manager.end_game()
+    
+    def test_matches_sqlite_backend(self):
+        """Test backend memory cho kết quả giống SQLite"""
+        memory = create_storage('memory')
+        sqlite = create_storage('sqlite', db_file=":memory:")
+        try:
+            self.play_games(memory)
+            self.play_games(sqlite)
+            
+            self.assertEqual(memory.get_leaderboard(), sqlite.get_leaderboard())
+            self.assertEqual(memory.get_player_rank("Player2"), sqlite.get_player_rank("Player2"))
+            for key in ['total_games', 'total_score', 'best_score']:
+                self.assertEqual(memory.get_player_stats("Player1")[key], sqlite.get_player_stats("Player1")[key])
+            
+            memory_page = memory.get_player_history_page("Player1", limit=2)
+            sqlite_page = sqlite.get_player_history_page("Player1", limit=2)
+            self.assertEqual(memory_page['columns'], sqlite_page['columns'])
+            self.assertEqual([row[0] for row in memory_page['rows']], [row[0] for row in sqlite_page['rows']])
+            
+            next_page = memory.get_player_history_page("Player1", limit=2, cursor=memory_page['next_cursor'])
+            self.assertEqual([row[0] for row in next_page['rows']], [1])
+            self.assertIsNone(next_page['next_cursor'])
+            self.assertEqual(len(memory.answers), 6)
+        finally:
+            memory.close()
+            sqlite.close()
+    
+    def test_history_contract(self):
+        """Test hai backend trả về cùng lịch sử đầy đủ (không bị giới hạn theo trang)"""
+        games = MAX_HISTORY_PAGE_SIZE + 5
+        histories = {}
+        for backend, kwargs in [('memory', {}), ('sqlite', {'db_file': ":memory:"})]:
+            with self.subTest(backend=backend):
+                storage = create_storage(backend, **kwargs)
+                try:
+                    storage.add_player("Player1")
+                    for i in range(games):
+                        game_id = storage.create_game(1, 1)
+                        storage.end_game(game_id, "Player1")
+                        storage.save_game_result(game_id, [
+                            {'username': "Player1", 'score': i, 'correct_answers': 1, 'wrong_answers': 0}
+                        ])
+                    
+                    history = storage.get_player_history("Player1")
+                    self.assertEqual([entry['game_id'] for entry in history], list(range(games, 0, -1)))
+                    
+                    paged, cursor = [], None
+                    while True:
+                        page = storage.get_player_history_page("Player1", limit=MAX_HISTORY_PAGE_SIZE, cursor=cursor)
+                        paged.extend(dict(zip(page['columns'], row)) for row in page['rows'])
+                        cursor = page['next_cursor']
+                        if cursor is None:
+                            break
+                    self.assertEqual(paged, history)
+                    
+                    # Thời điểm do từng backend tự ghi, so sánh các cột còn lại
+                    histories[backend] = [
+                        {key: value for key, value in entry.items() if key not in ('start_time', 'end_time')}
+                        for entry in history
+                    ]
+                finally:
+                    storage.close()
+        
+        self.assertEqual(histories['memory'], histories['sqlite'])
+    
+    def test_snapshot_round_trip(self):
+        """Test snapshot ghi khi đóng và được nạp lại khi khởi động"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            snapshot_file = os.path.join(tmp_dir, 'snapshot.json')
+            storage = MemoryStorage(snapshot_file=snapshot_file, snapshot_interval=0)
+            self.play_games(storage)
+            leaderboard = storage.get_leaderboard()
+            storage.close()
+            
+            restored = MemoryStorage(snapshot_file=snapshot_file, snapshot_interval=0)
+            self.assertEqual(restored.get_leaderboard(), leaderboard)
+            self.assertEqual(len(restored.get_player_history("Player1")), 3)
+            self.assertEqual(restored.create_game(2, 1), 4)
+    
+    def test_snapshot_does_not_block_writes(self):
+        """Test dựng JSON của snapshot không giữ lock; số đáp án giữ lại có giới hạn"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            storage = MemoryStorage(snapshot_file=os.path.join(tmp_dir, 'snapshot.json'), snapshot_interval=0,
+                                    max_answers=4)
+            self.play_games(storage)
+            self.assertEqual(len(storage.answers), 4)
+            
+            dumps = json.dumps
+            
+            def dumps_while_writing(data, **kwargs):
+                writer = threading.Thread(target=storage.add_player, args=("Late",))
+                writer.start()
+                writer.join(1)
+                self.assertFalse(writer.is_alive())
+                return dumps(data, **kwargs)
+            
+            with mock.patch('server.storage.json.dumps', side_effect=dumps_while_writing):
+                storage.snapshot()
+            storage.close()
+            
+            restored = MemoryStorage(snapshot_file=storage.snapshot_file, snapshot_interval=0, max_answers=4)
+            self.assertEqual(len(restored.answers), 4)
+            self.assertIsNotNone(restored.get_player_stats("Late"))
+    
+    def test_unknown_backend(self):
+        """Test tên backend không hợp lệ"""
+        with self.assertRaises(ValueError):
+            create_storage('redis')
+
+class TestGameArchiver(unittest.TestCase):
+    """Test cho lưu trữ trận đấu cũ"""
+    
+    def setUp(self):
+        """Thiết lập test"""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.database = GameDatabase(":memory:")
+        self.archiver = GameArchiver(self.database, self.tmp_dir.name, batch_size=2)
+        self.database.add_player("Player1")
+        
+        # 3 trận cũ (2 tháng khác nhau) và 1 trận mới
+        for start_time in ["2020-01-05 10:00:00", "2020-01-20 10:00:00", "2020-02-01 10:00:00", None]:
+            game_id = self.database.create_game(1, 1)
+            if start_time:
+                self.database.conn.execute("UPDATE games SET start_time = ? WHERE id = ?", (start_time, game_id))
+            self.database.save_question_result(game_id, "1 + 1 = ?", "B", {"Player1": {"answer": "B", "response_time": 0.5}})
+            self.database.save_game_result(game_id, [
+                {'username': "Player1", 'score': game_id, 'correct_answers': 1, 'wrong_answers': 0}
+            ])
+    
+    def tearDown(self):
+        """Dọn dẹp test"""
+        self.archiver.close()
+        self.database.close()
+        self.tmp_dir.cleanup()
+    
+    def history_pages(self, limit):
+        """Đọc toàn bộ lịch sử của Player1 qua các trang"""
+        game_ids, cursor = [], None
+        while True:
+            page = self.database.get_player_history_page("Player1", limit=limit, cursor=cursor)
+            game_ids.extend(row[0] for row in page['rows'])
+            cursor = page['next_cursor']
+            if cursor is None:
+                return game_ids
+    
+    def test_archive_moves_old_games(self):
+        """Test trận cũ được ghi ra file theo tháng và xóa khỏi database"""
+        before = self.database.get_player_history("Player1")
+        
+        stats = self.archiver.archive_older_than(30)
+        self.assertEqual(stats['games'], 3)
+        self.assertEqual(stats['batches'], 2)
+        
+        self.assertTrue(os.path.exists(self.archiver.archive_file("2020-01")))
+        self.assertTrue(os.path.exists(self.archiver.archive_file("2020-02")))
+        self.assertEqual([r['game']['id'] for r in self.archiver.iter_month("2020-01")], [1, 2])
+        
+        for table in ['games', 'game_details', 'used_questions', 'answers']:
+            count = self.database.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            self.assertEqual(count, 1)
+        self.assertEqual(self.archiver.get_player_history("Player1"), before[1:])
+        
+        # Lịch sử vẫn đầy đủ khi đọc qua database (đọc tiếp từ kho lưu trữ), thứ hạng không đổi
+        self.database.archive = self.archiver
+        self.assertEqual(self.database.get_player_history("Player1"), before)
+        self.assertEqual(self.history_pages(limit=1), [4, 3, 2, 1])
+        self.assertEqual(self.history_pages(limit=3), [4, 3, 2, 1])
+        self.assertEqual(self.database.get_player_stats("Player1")['total_games'], 4)
+    
+    def test_lookups_read_only_what_they_need(self):
+        """Test lịch sử chỉ đọc index; lấy trận chỉ giải nén member chứa trận đó"""
+        self.archiver.archive_games([1])
+        self.archiver.archive_games([2])
+        self.database.archive = self.archiver
+        
+        offsets = self.archiver.index.execute("SELECT member_offset FROM archived_games ORDER BY game_id").fetchall()
+        self.assertEqual(offsets[0][0], 0)
+        self.assertGreater(offsets[1][0], 0)
+        with mock.patch.object(self.archiver, 'iter_month') as iter_month:
+            self.assertEqual([r['game']['id'] for r in self.archiver.get_archived_games([2])], [2])
+            iter_month.assert_not_called()
+        
+        os.remove(self.archiver.archive_file("2020-01"))
+        self.assertEqual(self.history_pages(limit=2), [4, 3, 2, 1])
+        self.assertEqual([entry['score'] for entry in self.archiver.get_player_history("Player1")], [2, 1])
+    
+    def test_old_index_is_upgraded(self):
+        """Test index của bản cũ được bổ sung dòng lịch sử từ file lưu trữ"""
+        self.archiver.archive_older_than(30)
+        history = self.archiver.get_player_history("Player1")
+        self.archiver.close()
+        
+        # Index cũ: chỉ có tháng của trận và tên người chơi
+        index = sqlite3.connect(os.path.join(self.tmp_dir.name, ARCHIVE_INDEX_FILE))
+        index.executescript('''
+            DROP TABLE archived_players;
+            CREATE TABLE archived_players (
+                username TEXT NOT NULL, game_id INTEGER NOT NULL, PRIMARY KEY (username, game_id)
+            ) WITHOUT ROWID;
+            INSERT INTO archived_players SELECT 'Player1', game_id FROM archived_games;
+            ALTER TABLE archived_games DROP COLUMN member_offset;
+        ''')
+        index.close()
+        
+        self.archiver = GameArchiver(self.database, self.tmp_dir.name)
+        self.assertEqual(self.archiver.get_player_history("Player1"), history)
+        self.assertEqual([r['game']['id'] for r in self.archiver.get_archived_games([1, 3])], [1, 3])
+    
+    def test_interrupted_archive_run(self):
+        """Test lần lưu trữ bị dừng sau khi ghi file nhưng trước khi xóa: lịch sử không lặp, lần sau chạy tiếp"""
+        self.database.archive = self.archiver
+        before = self.database.get_player_history("Player1")
+        transaction = self.database.transaction
+        
+        def interrupt_delete():
+            if mock_transaction.call_count == 2:  # Sau khi đọc lô và ghi file
+                raise KeyboardInterrupt
+            return transaction()
+        
+        with mock.patch.object(self.database, 'transaction', side_effect=interrupt_delete) as mock_transaction:
+            with self.assertRaises(KeyboardInterrupt):
+                self.archiver.archive_games([1, 2])
+        
+        self.assertEqual([r['game']['id'] for r in self.archiver.iter_month("2020-01")], [1, 2])
+        self.assertEqual(self.database.conn.execute("SELECT COUNT(*) FROM games").fetchone()[0], 4)
+        self.assertEqual(self.history_pages(limit=2), [4, 3, 2, 1])
+        self.assertEqual(self.database.get_player_history("Player1"), before)
+        
+        # Lần chạy sau ghi lại lô đó; bản ghi trùng trong file được bỏ qua khi đọc
+        self.assertEqual(self.archiver.archive_older_than(30)['games'], 3)
+        self.assertEqual(self.database.conn.execute("SELECT COUNT(*) FROM games").fetchone()[0], 1)
+        self.assertEqual([r['game']['id'] for r in self.archiver.iter_month("2020-01")], [1, 2])
+        self.assertEqual(self.history_pages(limit=2), [4, 3, 2, 1])
+        self.assertEqual(self.database.get_player_history("Player1"), before)
+
+class TestQuestionStats(unittest.TestCase):
+    """Test cho thống kê độ khó câu hỏi"""
+    
+    def test_sketch_quantiles(self):
+        """Test phân vị của sketch nằm trong sai số tương đối"""
+        sketch = ResponseTimeSketch(accuracy=0.02)
+        values = [0.01 * i for i in range(1, 1001)]
+        for value in values:
+            sketch.add(value)
+        
+        for q in [0.1, 0.5, 0.9, 0.99]:
+            exact = values[int(q * (len(values) - 1))]
+            self.assertAlmostEqual(sketch.quantile(q), exact, delta=exact * 0.021)
+        self.assertLess(len(sketch.counts), 300)
+        
+        restored = ResponseTimeSketch.from_dict(json.loads(json.dumps(sketch.to_dict())))
+        self.assertEqual(restored.quantile(0.5), sketch.quantile(0.5))
+    
+    def test_end_question_updates_and_persists(self):
+        """Test end_question cập nhật thống kê, end_game lưu xuống database"""
+        database = GameDatabase(":memory:")
+        try:
+            game_manager = GameManager(database)
+            game_manager.set_questions([Question("1 + 1 = ?", ["1", "2", "3", "4"], "B")])
+            game_manager.add_player("Player1")
+            game_manager.add_player("Player2")
+            game_manager.start_game()
+            game_manager.get_next_question()
+            game_manager.submit_answer("Player1", "B")
+            game_manager.submit_answer("Player2", "C")
+            game_manager.end_question()
+            
+            stats = game_manager.question_stats.get("1 + 1 = ?")
+            self.assertEqual((stats.times_asked, stats.answers, stats.correct), (1, 2, 1))
+            self.assertEqual(database.load_question_stats(), [])
+            
+            game_manager.end_game()
+            reloaded = GameManager(database).question_stats.get("1 + 1 = ?")
+            self.assertEqual(reloaded.accuracy, 0.5)
+            self.assertEqual(reloaded.sketch.count, 2)
+        finally:
+            database.close()
+    
+    def test_order_for_curve(self):
+        """Test chọn câu hỏi bám theo đường độ khó"""
+        tracker = QuestionStatsTracker()
+        questions = [Question(f"Q{i}", ["1", "2", "3", "4"], "A") for i in range(5)]
+        for i, question in enumerate(questions):
+            # Q0 dễ nhất (100% đúng) ... Q4 khó nhất (0% đúng)
+            for j in range(20):
+                tracker.record(question.question_text, {
+                    f"P{j}": {'correct': j < 20 - i * 5, 'response_time': 1.0}
+                })
+        
+        ordered = tracker.order_for_curve(questions, [0.9, 0.1, 0.5])
+        self.assertEqual([q.question_text for q in ordered], ["Q4", "Q0", "Q2", "Q1", "Q3"])
+        self.assertEqual(len(tracker.take_dirty_rows(force=True)), 5)
+        self.assertEqual(tracker.take_dirty_rows(force=True), [])
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class TestAnalytics(unittest.TestCase):
+    """Test cho phân tích thời gian trả lời"""
+    
+    def setUp(self):
+        """Thiết lập test"""
+        self.database = GameDatabase(":memory:")
+        game_id = self.database.create_game(2, 8)
+        for i in range(8):
+            category = 'math' if i % 2 == 0 else 'geography'
+            self.database.save_question_result(game_id, f"Q{i}", "A", {
+                # Bot: đúng và cực nhanh ở 6 câu giữa
+                "Bot": {"answer": "A", "response_time": 0.05 if 1 <= i <= 6 else 2.0},
+                "Human": {"answer": "A" if i % 2 == 0 else "B", "response_time": 1.0 + i * 0.5}
+            }, category)
+        self.data = load_answers(self.database.conn)
+    
+    def tearDown(self):
+        """Dọn dẹp test"""
+        self.database.close()
+    
+    def test_load_and_breakdowns(self):
+        """Test nạp mảng và thống kê theo chủ đề, người chơi"""
+        self.assertEqual(len(self.data), 16)
+        self.assertEqual(self.data.response_times.dtype, np.float64)
+        
+        categories = per_category(self.data)
+        self.assertEqual(set(categories), {'math', 'geography'})
+        self.assertEqual(categories['math']['answers'], 8)
+        self.assertEqual(categories['math']['accuracy'], 1.0)
+        self.assertEqual(categories['geography']['accuracy'], 0.5)
+        
+        human = per_player(self.data)['Human']
+        self.assertAlmostEqual(human['mean_response_time'], 2.75)
+        self.assertAlmostEqual(human['p50'], float(np.median(1.0 + np.arange(8) * 0.5)))
+    
+    def test_fast_streaks(self):
+        """Test phát hiện chuỗi trả lời đúng nhanh bất thường"""
+        flagged = fast_streaks(self.data, threshold=0.15, min_length=5)
+        self.assertEqual([entry['username'] for entry in flagged], ["Bot"])
+        self.assertEqual(flagged[0]['longest_streak'], 6)
+        self.assertEqual(fast_streaks(self.data, min_length=7), [])
+        
+        report = build_report(self.data)
+        self.assertEqual(sum(report['histogram']['counts']), 16)
+        json.dumps(report)
+    
+    def test_fast_streaks_follow_question_order(self):
+        """Test chuỗi được tính theo thứ tự câu hỏi trong trận, không theo thứ tự ghi đáp án"""
+        database = GameDatabase(":memory:")
+        try:
+            # Không có các index này SQLite quét bảng answers trước, thứ tự chỉ còn do ORDER BY quyết định
+            database.conn.execute("DROP INDEX idx_answers_question")
+            database.conn.execute("DROP INDEX idx_used_questions_game")
+            game_id = database.create_game(1, 6)
+            with database.transaction() as cursor:
+                question_ids = []
+                for i in range(6):
+                    cursor.execute(
+                        "INSERT INTO used_questions (game_id, question_text, correct_answer, category) "
+                        "VALUES (?, ?, 'A', 'math')", (game_id, f"Q{i}")
+                    )
+                    question_ids.append(cursor.lastrowid)
+                
+                # 5 câu đầu đúng và nhanh, câu cuối chậm; đáp án câu cuối được ghi xen giữa
+                for i in [0, 5, 1, 2, 3, 4]:
+                    cursor.execute(
+                        "INSERT INTO answers (game_id, question_id, player_username, answer_index, is_correct, "
+                        "response_time_us) VALUES (?, ?, 'Bot', 0, 1, ?)",
+                        (game_id, question_ids[i], 2_000_000 if i == 5 else 50_000)
+                    )
+            
+            data = load_answers(database.conn)
+            flagged = fast_streaks(data, threshold=0.15, min_length=5)
+            self.assertEqual([entry['username'] for entry in flagged], ["Bot"])
+            self.assertEqual(flagged[0]['longest_streak'], 5)
+        finally:
+            database.close()
+    
+    def test_from_game_manager(self):
+        """Test lấy thời gian trả lời từ trận đang chạy"""
+        game_manager = GameManager(self.database)
+        game_manager.add_player("Player1")
+        game_manager.add_player("Player2")
+        game_manager.players["Player1"].response_times = [1.0, 2.0]
+        game_manager.players["Player2"].response_times = [3.0]
+        
+        data = from_game_manager(game_manager)
+        self.assertEqual(data.player_codes.tolist(), [0, 0, 1])
+        self.assertEqual(per_player(data)['Player2']['mean_response_time'], 3.0)
+
+class TestExport(unittest.TestCase):
+    """Test cho xuất dữ liệu phân tích"""
+    
+    def setUp(self):
+        """Thiết lập test"""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_file = os.path.join(self.tmp_dir.name, 'game.db')
+        database = GameDatabase(self.db_file)
+        for month in range(1, 4):
+            game_id = database.create_game(2, 1)
+            database.conn.execute(
+                "UPDATE games SET start_time = ? WHERE id = ?", (f"2025-{month:02d}-15 10:00:00", game_id)
+            )
+            database.save_question_result(game_id, "Thủ đô của Việt Nam?", "A", {
+                "Player1": {"answer": "A", "response_time": 1.25},
+                "Player2": {"answer": "", "response_time": 9.0}
+            })
+            database.save_game_result(game_id, [
+                {'username': "Player1", 'score': 15, 'correct_answers': 1, 'wrong_answers': 0,
+                 'average_response_time': 1.25},
+                {'username': "Player2", 'score': 0, 'correct_answers': 0, 'wrong_answers': 1}
+            ])
+        self.plans = {
+            name: database.conn.execute("EXPLAIN QUERY PLAN " + query, ('', '')).fetchall()
+            for name, (_, query) in DATASETS.items()
+        }
+        database.close()
+        self.conn = open_readonly(self.db_file)
+    
+    def tearDown(self):
+        """Dọn dẹp test"""
+        self.conn.close()
+        self.tmp_dir.cleanup()
+    
+    def test_queries_use_indexes(self):
+        """Test các truy vấn xuất đọc theo index, không sắp xếp tạm"""
+        for name, plan in self.plans.items():
+            details = ' '.join(row[3] for row in plan)
+            self.assertNotIn('TEMP B-TREE', details, name)
+            self.assertNotRegex(details, r'SCAN (games|game_details|g)\b', name)
+    
+    def test_csv_and_jsonl_with_date_range(self):
+        """Test xuất CSV/JSONL theo khoảng thời gian"""
+        output = io.StringIO()
+        total = export_dataset(self.conn, 'results', 'csv', output, since='2025-02-01', chunk_size=1)
+        self.assertEqual(total, 4)
+        lines = output.getvalue().splitlines()
+        self.assertEqual(lines[0].split(',')[:2], ['game_id', 'player_username'])
+        self.assertEqual(len(lines), 5)
+        
+        output = io.StringIO()
+        total = export_dataset(self.conn, 'answers', 'jsonl', output, since='2025-01-01', until='2025-02-01')
+        rows = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual(total, 2)
+        self.assertEqual(rows[0]['response_time_us'], 1250000)
+        self.assertIsNone(rows[1]['answer_index'])
+    
+    def test_columnar_round_trip(self):
+        """Test định dạng cột đọc lại đúng kiểu và giá trị NULL"""
+        output = io.BytesIO()
+        total = export_dataset(self.conn, 'games', 'columnar', output, chunk_size=2)
+        self.assertEqual(total, 3)
+        
+        output.seek(0)
+        groups = list(read_columnar(output))
+        self.assertEqual([len(group['id']) for group in groups], [2, 1])
+        self.assertEqual(groups[0]['id'], [1, 2])
+        self.assertEqual(groups[1]['start_time'], ['2025-03-15 10:00:00'])
+        self.assertEqual(groups[1]['winner'], [None])
+        
+        output = io.BytesIO()
+        export_dataset(self.conn, 'questions', 'columnar', output)
+        output.seek(0)
+        self.assertEqual(next(read_columnar(output))['question_text'][0], "Thủ đô của Việt Nam?")
+
+class TestWriteBehindDatabase(unittest.TestCase):
+    """Test cho lớp ghi trễ"""
+    
+    def setUp(self):
+        """Thiết lập test"""
+        self.database = SlowDatabase(":memory:")
+        self.persistence = WriteBehindDatabase(self.database, max_queue_size=100, batch_size=10)
+    
+    def tearDown(self):
+        """Dọn dẹp test"""
+        self.persistence.close()
+        self.database.close()
+    
+    def test_game_flow_does_not_wait_for_disk(self):
+        """Test thread game không bị chặn bởi ghi database"""
+        game_manager = GameManager(self.persistence)
+        game_manager.set_questions([Question("1 + 1 = ?", ["1", "2", "3", "4"], "B")])
+        game_manager.add_player("Player1")
+        game_manager.add_player("Player2")
+        game_manager.start_game()
+        game_manager.get_next_question()
+        game_manager.submit_answer("Player1", "B")
+        
+        start = time.time()
+        game_manager.end_question()
+        self.assertLess(time.time() - start, 0.1)
+        
+        game_manager.end_game()
+        self.persistence.flush()
+        
+        stats = self.database.get_player_stats("Player1")
+        self.assertEqual(stats['total_games'], 1)
+        self.assertEqual(stats['total_score'], 15)
+    
+    def test_close_flushes_pending_writes(self):
+        """Test dừng hàng đợi sẽ ghi hết dữ liệu đang chờ"""
+        for i in range(25):
+            self.persistence.add_player(f"Player{i}")
+        self.persistence.close()
+        
+        self.assertEqual(len(self.database.get_leaderboard(limit=50)), 25)
+        metrics = self.persistence.get_metrics()
+        self.assertEqual(metrics['written'], 25)
+        self.assertEqual(metrics['queue_depth'], 0)
+        self.assertLessEqual(metrics['batches'], 25)
+    
+    def break_player(self, username):
+        """Làm lệnh ghi vào bảng players thất bại với một người chơi"""
+        with self.database.transaction() as cursor:
+            cursor.execute(f"""
+                CREATE TRIGGER reject_player BEFORE INSERT ON players WHEN NEW.username = '{username}'
+                BEGIN SELECT RAISE(ABORT, 'rejected'); END
+            """)
+    
+    def test_failed_operation_is_isolated(self):
+        """Test thao tác lỗi không để lại dữ liệu ghi dở và không kéo theo thao tác khác"""
+        game_id = self.database.create_game(2, 1)
+        self.break_player("Broken")
+        
+        self.persistence.add_player("Player1")
+        self.persistence.save_game_result(game_id, [
+            {'username': "Player1", 'score': 10, 'correct_answers': 1, 'wrong_answers': 0},
+            {'username': "Broken", 'score': 5, 'correct_answers': 0, 'wrong_answers': 1}
+        ])
+        self.persistence.add_player("Player2")
+        with mock.patch.object(self.database, 'load_leaderboard') as load_leaderboard:
+            self.persistence.flush()
+        load_leaderboard.assert_not_called()
+        
+        with self.database.transaction() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM game_details WHERE game_id = ?", (game_id,))
+            self.assertEqual(cursor.fetchone()[0], 0)
+        self.assertEqual(self.database.get_player_stats("Player1")['total_games'], 0)
+        self.assertIsNotNone(self.database.get_player_stats("Player2"))
+        self.assertEqual(self.database.get_leaderboard_around("Player1", 0)[0]['total_score'], 0)
+        self.assertIsNone(self.database.get_player_rank("Broken"))
+        
+        metrics = self.persistence.get_metrics()
+        self.assertEqual(metrics['failed_ops'], 1)
+        self.assertEqual(metrics['failed_batches'], 1)
+        self.assertEqual(metrics['written'], 2)
+    
+    def test_rollback_keeps_pending_leaderboard_updates(self):
+        """Test bảng xếp hạng nạp lại sau rollback vẫn giữ kết quả đang chờ ghi"""
+        game_id = self.database.create_game(1, 1)
+        writer_paused = threading.Event()
+        write_batch = self.persistence._write_batch
+        
+        def paused_batch(batch):
+            writer_paused.wait(5)
+            write_batch(batch)
+        
+        with mock.patch.object(self.persistence, '_write_batch', side_effect=paused_batch):
+            self.persistence.save_game_result(game_id, [
+                {'username': "Player1", 'score': 10, 'correct_answers': 1, 'wrong_answers': 0}
+            ])
+            with self.assertRaises(RuntimeError):
+                with self.database.transaction():
+                    raise RuntimeError("abort")
+            self.assertEqual(self.database.get_leaderboard()[0]['total_score'], 10)
+            
+            writer_paused.set()
+            self.persistence.flush()
+        
+        self.database.load_leaderboard()
+        self.assertEqual(self.database.get_leaderboard()[0]['total_score'], 10)
+        self.assertEqual(self.database.get_player_stats("Player1")['total_score'], 10)
+    
+    def test_failed_commit_retries_operations(self):
+        """Test lô không commit được thì các thao tác được ghi lại từng cái"""
+        commit = self.database.transaction
+        calls = []
+        
+        def failing_batch():
+            calls.append(1)
+            if len(calls) == 1:
+                raise sqlite3.OperationalError("disk I/O error")
+            return commit()
+        
+        with mock.patch.object(self.database, 'transaction', side_effect=failing_batch):
+            self.persistence.add_player("Player1")
+            self.persistence.add_player("Player2")
+            self.persistence.flush()
+        
+        self.assertEqual(len(self.database.get_leaderboard()), 2)
+        metrics = self.persistence.get_metrics()
+        self.assertEqual(metrics['failed_ops'], 0)
+        self.assertEqual(metrics['written'], 2)
+    
+    def test_reads_do_not_wait_for_writer(self):
+        """Test lệnh đọc và create_game không phải chờ lô đang ghi (database file, WAL)"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            database = SlowDatabase(os.path.join(tmp_dir, 'game.db'))
+            persistence = WriteBehindDatabase(database)
+            try:
+                first_id = persistence.create_game(2, 1)
+                persistence.save_question_result(first_id, "1 + 1 = ?", "B", {"Player1": {'answer': "B"}})
+                time.sleep(0.05)
+                
+                start = time.time()
+                second_id = persistence.create_game(2, 1)
+                database.get_recent_games_page()
+                database.get_player_history("Player1")
+                self.assertLess(time.time() - start, 0.1)
+                self.assertEqual(second_id, first_id + 1)
+                
+                persistence.add_player("Player1")
+                persistence.flush()
+                self.assertFalse(persistence.add_player("Player1"))
+                self.assertEqual(len(database.get_recent_games()), 2)
+            finally:
+                persistence.close()
+                database.close()
+
+class TestSessionResume(unittest.TestCase):
+    """Test cho resume phiên sau khi mất kết nối"""
+    
+    def setUp(self):
+        """Thiết lập test"""
+        with mock.patch.object(GameServer, 'setup_logging'):
+            self.server = GameServer(storage=MemoryStorage())
+        self.server.game_manager.set_questions([
+            Question("1 + 1 = ?", ["1", "2", "3", "4"], "B"),
+            Question("2 + 2 = ?", ["2", "3", "4", "5"], "C")
+        ])
+        self.sockets = []
+    
+    def tearDown(self):
+        """Dọn dẹp test"""
+        for sock in self.sockets:
+            sock.close()
+        self.server.database.close()
+    
+    def connect(self, data: dict):
+        """Tạo kết nối giả và gửi message CONNECT"""
+        server_side, client_side = socket.socketpair()
+        self.sockets += [server_side, client_side]
+        handler = ClientHandler(server_side, ('test', len(self.sockets)), self.server)
+        handler.handle_message({'type': MessageType.CONNECT, 'data': data})
+        return handler, client_side
+    
+    def read_messages(self, client_side) -> list:
+        """Đọc tất cả message server đã gửi"""
+        client_side.settimeout(0.1)
+        buffer = b""
+        try:
+            while True:
+                chunk = client_side.recv(65536)
+                if not chunk:
+                    break
+                buffer += chunk
+        except socket.timeout:
+            pass
+        return [json.loads(line) for line in buffer.decode('utf-8').splitlines() if line]
+    
+    def test_resume_reattaches_player_and_replays_score_updates(self):
+        """Test resume giữ điểm số, giữ tên và phát lại SCORE_UPDATE đã lỡ"""
+        handler1, client1 = self.connect({'username': "Player1"})
+        handler2, client2 = self.connect({'username': "Player2"})
+        token = self.read_messages(client1)[0]['data']['resume_token']
+        for handler in (handler1, handler2):
+            handler.handle_message({'type': MessageType.JOIN_ROOM, 'data': {}})
+        
+        self.server.start_game()
+        self.server.game_manager.get_next_question()
+        self.server.game_manager.submit_answer("Player1", "B")
+        
+        # Mất kết nối: tên vẫn được giữ, người chơi lỡ kết quả câu hỏi
+        handler1.disconnect()
+        self.assertFalse(self.server.game_manager.players["Player1"].is_connected)
+        _, intruder = self.connect({'username': "Player1"})
+        self.assertEqual(self.read_messages(intruder)[0]['type'], MessageType.ERROR)
+        with mock.patch('server.server.WAIT_TIME_BETWEEN_QUESTIONS', 0):
+            self.server.end_question()
+        
+        resumed, client3 = self.connect({'resume_token': token, 'last_seq': 0})
+        messages = self.read_messages(client3)
+        self.assertEqual(resumed.username, "Player1")
+        self.assertTrue(messages[0]['data']['resumed'])
+        self.assertTrue(messages[0]['data']['in_room'])
+        self.assertEqual(messages[1]['type'], MessageType.SCORE_UPDATE)
+        self.assertEqual(messages[1]['data']['seq'], 1)
+        self.assertEqual(messages[1]['data']['results']["Player1"]['total_score'], 15)
+        self.assertTrue(self.server.game_manager.players["Player1"].is_connected)
+        self.assertIs(self.server.clients["Player1"], resumed)
+        
+        # Client đã có seq mới nhất thì không nhận lại
+        _, client4 = self.connect({'resume_token': token, 'last_seq': 1})
+        types = [message['type'] for message in self.read_messages(client4)]
+        self.assertNotIn(MessageType.SCORE_UPDATE, types)
+        self.assertFalse(resumed.is_connected)
+    
+    def test_invalid_token_falls_back_to_username(self):
+        """Test token không hợp lệ thì kết nối như mới"""
+        handler, client = self.connect({'username': "Player1", 'resume_token': "bogus"})
+        data = self.read_messages(client)[0]['data']
+        self.assertTrue(data['success'])
+        self.assertNotIn('resumed', data)
+        self.assertEqual(handler.username, "Player1")
+    
+    def test_expired_session_drops_player(self):
+        """Test tên người chơi chỉ gắn lại được bằng token; phiên hết hạn thì người chơi mới bắt đầu từ 0"""
+        self.server.sessions.ttl = 0.05
+        handler1, _ = self.connect({'username': "Player1"})
+        handler1.handle_message({'type': MessageType.JOIN_ROOM, 'data': {}})
+        self.server.game_manager.players["Player1"].score = 30
+        handler1.disconnect()
+        self.assertFalse(self.server.game_manager.add_player("Player1"))
+        
+        time.sleep(0.1)
+        handler2, client2 = self.connect({'username': "Player1"})
+        self.assertTrue(self.read_messages(client2)[0]['data']['success'])
+        handler2.handle_message({'type': MessageType.JOIN_ROOM, 'data': {}})
+        player = self.server.game_manager.players["Player1"]
+        self.assertTrue(player.is_connected)
+        self.assertEqual(player.score, 0)
+    
+    def test_expired_session_frees_username(self):
+        """Test phiên hết hạn thì token không còn dùng được"""
+        sessions = SessionManager(ttl=0.01)
+        token = sessions.create("Player1")
+        sessions.detach("Player1")
+        self.assertTrue(sessions.is_reserved("Player1"))
+        time.sleep(0.02)
+        self.assertFalse(sessions.is_reserved("Player1"))
+        self.assertIsNone(sessions.resume(token))
+
+class TestLatencyTelemetry(unittest.TestCase):
+    """Test cho số đo độ trễ client gửi lên"""
+    
+    def test_summary_separates_network_from_client_time(self):
+        """Test phân vị từng chỉ số và phần thời gian mạng suy ra từ thời gian server"""
+        telemetry = LatencyTelemetry()
+        for i in range(100):
+            self.assertTrue(telemetry.record(f"Player{i}", {'q': 1, 'rd': 5, 'rt': 400 + i, 'rtt': 40, 'srv': 450 + i}))
+        
+        summary = telemetry.summary()
+        self.assertEqual(summary['reaction']['count'], 100)
+        self.assertAlmostEqual(summary['reaction']['p50'], 450, delta=10)
+        self.assertAlmostEqual(summary['network']['p50'], 45, delta=2)
+        self.assertAlmostEqual(telemetry.last_sample("Player0")['network'], 0.045)
+        
+        telemetry.reset()
+        self.assertEqual(telemetry.summary(), {})
+    
+    def test_invalid_frames_are_ignored(self):
+        """Test frame thiếu số đo hoặc có giá trị sai bị bỏ qua"""
+        telemetry = LatencyTelemetry()
+        self.assertFalse(telemetry.record("Player1", {'q': 1}))
+        self.assertFalse(telemetry.record("Player1", {'rt': -5}))
+        self.assertFalse(telemetry.record("Player1", {'rt': 'fast'}))
+        self.assertFalse(telemetry.record("Player1", {'rt': 10 ** 9}))
+        self.assertEqual(telemetry.samples, 0)
+    
+    def test_handler_records_telemetry_frame(self):
+        """Test server nhận frame TELEMETRY của người chơi đã đăng nhập"""
+        with mock.patch.object(GameServer, 'setup_logging'):
+            server = GameServer(storage=MemoryStorage())
+        server_side, client_side = socket.socketpair()
+        try:
+            handler = ClientHandler(server_side, ('test', 1), server)
+            handler.handle_message({'type': MessageType.TELEMETRY, 'data': {'rt': 300}})
+            self.assertEqual(server.telemetry.samples, 0)
+            
+            handler.handle_message({'type': MessageType.CONNECT, 'data': {'username': 'Player1'}})
+            handler.handle_message({'type': MessageType.TELEMETRY, 'data': {'q': 1, 'rd': 3, 'rt': 300, 'rtt': 20}})
+            self.assertEqual(server.telemetry.samples, 1)
+            self.assertAlmostEqual(server.telemetry.last_sample('Player1')['reaction'], 0.3)
+        finally:
+            server_side.close()
+            client_side.close()
+            server.database.close()
 
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
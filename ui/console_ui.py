@@ -1,15 +1,15 @@
-
+"""
 Console UI cho Fastest Finger First
 Giao diện console đẹp và dễ sử dụng
 """
 
-import os
-import sys
-import time
 import threading
 from typing import Optional
+from collections import deque
 from ui.ui_base import UIBase
-from client.config import ClientState
+from ui.screen_renderer import ScreenRenderer
+from ui.leaderboard_view import LeaderboardView, format_row
+from client.config import ClientState, LEADERBOARD_VISIBLE_ROWS
 
 class ConsoleInterface(UIBase):
     """Giao diện console cho game"""
@@ -21,8 +21,10 @@ class ConsoleInterface(UIBase):
         self.input_ready = threading.Event()
         self.current_question = None
         self.leaderboard = []
+        self.leaderboard_view = LeaderboardView()
         self.game_status = {}
-        self.messages = []
+        self.messages = deque(maxlen=5)  # Các thông báo gần nhất hiển thị cuối màn hình
+        self._content_end: Optional[int] = None  # Dòng cuối dành cho nội dung chính trong khung đang dựng
         
         # Colors for console (ANSI escape codes)
         self.colors = {
@@ -37,27 +39,33 @@ class ConsoleInterface(UIBase):
             'bold': '\033[1m',
             'underline': '\033[4m'
         }
+        
+        # Mỗi sự kiện dựng lại khung hình, chỉ các dòng thay đổi được ghi ra terminal
+        self.screen = ScreenRenderer(prompt=f"{self.colors['green']}>>> {self.colors['reset']}")
+        self._render_lock = threading.Lock()
     
     def start(self):
         """Khởi động console UI"""
         self.running = True
         
-        # Hiển thị welcome screen
-        self.show_welcome_screen()
+        # UI được tải sau khi kết nối: lấy lại câu hỏi/bảng xếp hạng đã nhận trước đó
+        self.current_question = self.current_question or self.view_model.get_current_question()
+        self.leaderboard = self.leaderboard or self.view_model.get_leaderboard()
+        
+        self.clear_screen()
+        self.show_message("Console UI started", "success")
         
         # Khởi động input thread
         self.input_thread = threading.Thread(target=self._input_loop, daemon=True)
         self.input_thread.start()
-        
-        print(f"{self.colors['green']}Console UI started{self.colors['reset']}")
-        print(f"{self.colors['yellow']}Type 'connect' to connect to server{self.colors['reset']}")
-        print()
     
     def stop(self):
         """Dừng console UI"""
         self.running = False
         if self.input_thread:
             self.input_thread.join(timeout=1)
+        with self._render_lock:
+            self.screen.release()
         print(f"\n{self.colors['yellow']}Console UI stopped{self.colors['reset']}")
     
     def update(self):
@@ -70,29 +78,45 @@ class ConsoleInterface(UIBase):
         pass
     
     def clear_screen(self):
-        """Xóa màn hình"""
-        os.system('cls' if os.name == 'nt' else 'clear')
-    
-    def show_welcome_screen(self):
-        """Hiển thị màn hình chào mừng"""
-        self.clear_screen()
-        print(f"{self.colors['cyan']}{'='*60}")
-        print(f"{self.colors['bold']}    FASTEST FINGER FIRST - CONSOLE CLIENT")
-        print(f"{self.colors['reset']}{'='*60}")
-        print(f"{self.colors['yellow']}Welcome to the fastest finger first game!")
-        print(f"Connect to server and start playing...{self.colors['reset']}")
-        print()
+        """Xóa màn hình (vẽ lại toàn bộ ở lần vẽ tiếp theo)"""
+        self.screen.invalidate()
+    
+    def render(self):
+        """Dựng khung hình từ trạng thái hiện tại và ghi phần thay đổi ra terminal"""
+        with self._render_lock:
+            self.screen.begin_frame()
+            self.draw_interface()
+            self.screen.present()
+    
+    def write(self, text: str = "", color: str = None):
+        """Thêm một dòng vào khung hình đang dựng"""
+        if color:
+            text = f"{self.colors[color]}{text}{self.colors['reset']}"
+        self.screen.line(text)
     
     def draw_interface(self):
-        """Vẽ giao diện chính"""
+        """Vẽ giao diện chính
+        
+        Header, thông báo và footer luôn nằm trong khung hình; nội dung chính
+        (bảng xếp hạng) co lại theo số dòng còn lại của terminal.
+        """
         # Header
         self.draw_header()
+        content_start = self.screen.line_count()
+        
+        # Messages và footer được dựng trước để biết cần chừa bao nhiêu dòng
+        self.draw_messages()
+        self.draw_footer()
+        tail = self.screen.cut(content_start)
+        self._content_end = max(content_start, self.screen.max_rows() - len(tail))
         
-        # Main content area
+        # Main content area (phần vẫn vượt quá chỗ dành cho nó bị cắt, không cắt footer)
         self.draw_main_content()
+        self.screen.truncate(self._content_end)
+        self._content_end = None
         
-        # Footer
-        self.draw_footer()
+        for line in tail:
+            self.screen.line(line)
         
         # Input area
         self.draw_input_area()
@@ -102,10 +126,11 @@ class ConsoleInterface(UIBase):
         state = self.view_model.get_state()
         username = self.view_model.get_username()
         
-        print(f"{self.colors['cyan']}{'='*60}")
-        print(f"Player: {self.colors['bold']}{username}{self.colors['reset']} | "
-              f"State: {self.get_state_color(state)}{state}{self.colors['reset']}")
-        print(f"{'='*60}{self.colors['reset']}")
+        self.write('=' * 60, 'cyan')
+        self.write(f"{self.colors['bold']}FASTEST FINGER FIRST{self.colors['reset']} | "
+                   f"Player: {self.colors['bold']}{username}{self.colors['reset']} | "
+                   f"State: {self.get_state_color(state)}{state}{self.colors['reset']}")
+        self.write('=' * 60, 'cyan')
     
     def draw_main_content(self):
         """Vẽ nội dung chính"""
@@ -115,6 +140,8 @@ class ConsoleInterface(UIBase):
             self.draw_disconnected_screen()
         elif state == ClientState.CONNECTING:
             self.draw_connecting_screen()
+        elif state == ClientState.RECONNECTING:
+            self.draw_reconnecting_screen()
         elif state == ClientState.CONNECTED:
             self.draw_connected_screen()
         elif state == ClientState.IN_ROOM:
@@ -126,26 +153,33 @@ class ConsoleInterface(UIBase):
     
     def draw_disconnected_screen(self):
         """Vẽ màn hình ngắt kết nối"""
-        print(f"{self.colors['red']}❌ Disconnected from server{self.colors['reset']}")
-        print(f"{self.colors['yellow']}Type 'connect' to connect to server{self.colors['reset']}")
-        print()
+        self.write("Welcome to the fastest finger first game!", 'yellow')
+        self.write(f"{self.colors['red']}❌ Disconnected from server{self.colors['reset']}")
+        self.write(f"{self.colors['yellow']}Type 'connect' to connect to server{self.colors['reset']}")
+        self.write()
     
     def draw_connecting_screen(self):
         """Vẽ màn hình đang kết nối"""
-        print(f"{self.colors['yellow']}🔄 Connecting to server...{self.colors['reset']}")
-        print()
+        self.write(f"{self.colors['yellow']}🔄 Connecting to server...{self.colors['reset']}")
+        self.write()
+    
+    def draw_reconnecting_screen(self):
+        """Vẽ màn hình đang kết nối lại"""
+        self.write(f"{self.colors['yellow']}🔄 Connection lost, reconnecting...{self.colors['reset']}")
+        self.write(f"{self.colors['yellow']}Your score and room are kept while reconnecting{self.colors['reset']}")
+        self.write()
     
     def draw_connected_screen(self):
         """Vẽ màn hình đã kết nối"""
-        print(f"{self.colors['green']}✅ Connected to server{self.colors['reset']}")
-        print(f"{self.colors['yellow']}Type 'join' to join a room{self.colors['reset']}")
-        print()
+        self.write(f"{self.colors['green']}✅ Connected to server{self.colors['reset']}")
+        self.write(f"{self.colors['yellow']}Type 'join' to join a room{self.colors['reset']}")
+        self.write()
     
     def draw_room_screen(self):
         """Vẽ màn hình trong phòng"""
-        print(f"{self.colors['green']}🏠 In game room{self.colors['reset']}")
-        print(f"{self.colors['yellow']}Waiting for other players...{self.colors['reset']}")
-        print()
+        self.write(f"{self.colors['green']}🏠 In game room{self.colors['reset']}")
+        self.write(f"{self.colors['yellow']}Waiting for other players...{self.colors['reset']}")
+        self.write()
         
         # Hiển thị bảng xếp hạng
         if self.leaderboard:
@@ -156,6 +190,12 @@ class ConsoleInterface(UIBase):
         if self.current_question:
             self.display_question(self.current_question)
         
+        # Độ trễ của đáp án gần nhất
+        latency = self.format_latency(self.view_model.get_latency_stats())
+        if latency:
+            self.write(f"⏱  {latency}", 'cyan')
+            self.write()
+        
         # Hiển thị bảng xếp hạng
         if self.leaderboard:
             self.display_leaderboard(self.leaderboard)
@@ -167,13 +207,20 @@ class ConsoleInterface(UIBase):
     
     def draw_footer(self):
         """Vẽ footer"""
-        print(f"{self.colors['cyan']}{'='*60}")
-        print(f"Commands: connect, join, leave, quit{self.colors['reset']}")
-        print()
+        self.write('=' * 60, 'cyan')
+        self.write("Commands: connect, join, leave, quit", 'cyan')
+        self.write("Leaderboard: top, me, up, down, find <name>", 'cyan')
+    
+    def draw_messages(self):
+        """Vẽ các thông báo gần nhất"""
+        for color, text in self.messages:
+            self.write(text, color)
+        if self.messages:
+            self.write()
     
     def draw_input_area(self):
         """Vẽ vùng input"""
-        # Không hiển thị prompt ở đây vì đã được xử lý trong _input_loop
+        # Dòng nhắc lệnh do ScreenRenderer vẽ ngay dưới khung hình
         pass
     
     def get_state_color(self, state: str) -> str:
@@ -181,6 +228,7 @@ class ConsoleInterface(UIBase):
         colors = {
             ClientState.DISCONNECTED: self.colors['red'],
             ClientState.CONNECTING: self.colors['yellow'],
+            ClientState.RECONNECTING: self.colors['yellow'],
             ClientState.CONNECTED: self.colors['green'],
             ClientState.IN_ROOM: self.colors['blue'],
             ClientState.PLAYING: self.colors['magenta'],
@@ -190,73 +238,119 @@ class ConsoleInterface(UIBase):
     
     def display_question(self, question_data: dict):
         """Hiển thị câu hỏi"""
-        print(f"{self.colors['bold']}{'='*50}")
-        print(f"QUESTION {question_data.get('question_number', '?')}")
-        print(f"{'='*50}{self.colors['reset']}")
-        print(f"{self.colors['white']}{question_data.get('question_text', '')}{self.colors['reset']}")
-        print()
+        self.write('=' * 50, 'bold')
+        self.write(f"QUESTION {question_data.get('question_number', '?')}", 'bold')
+        self.write('=' * 50, 'bold')
+        self.write(f"{self.colors['white']}{question_data.get('question_text', '')}{self.colors['reset']}")
+        self.write()
         
         # Hiển thị các lựa chọn
         options = question_data.get('options', [])
         for i, option in enumerate(options, 1):
-            print(f"{self.colors['yellow']}{i}. {option}{self.colors['reset']}")
+            self.write(f"{self.colors['yellow']}{i}. {option}{self.colors['reset']}")
         
-        print()
-        print(f"{self.colors['green']}Type your answer (A, B, C, D or 1, 2, 3, 4):{self.colors['reset']}")
-        print()
+        self.write()
+        self.write(f"{self.colors['green']}Type your answer (A, B, C, D or 1, 2, 3, 4):{self.colors['reset']}")
+        self.write()
     
     def display_leaderboard(self, leaderboard: list):
         """Hiển thị bảng xếp hạng"""
         if not leaderboard:
             return
         
-        print(f"{self.colors['bold']}{'='*30}")
-        print(f"LEADERBOARD")
-        print(f"{'='*30}{self.colors['reset']}")
+        # Chỉ in các dòng trong cửa sổ đang xem, không in cả danh sách
+        view = self.leaderboard_view
+        view.username = self.view_model.get_username()
+        if view.model.rows is not leaderboard:
+            view.set_rows(leaderboard)
+        
+        # Cửa sổ vừa với chỗ còn lại trên terminal (trừ 3 dòng tiêu đề và 1 dòng trống)
+        height = LEADERBOARD_VISIBLE_ROWS
+        if self._content_end is not None:
+            height = min(height, self._content_end - self.screen.line_count() - 4)
+        if height < 1:
+            return
+        view.resize(height)
+        
+        # Dòng của mình nằm ngoài cửa sổ thì chừa thêm 2 dòng ("..." và dòng đó)
+        my_position = view.model.position_of(view.username) if view.username else None
+        if my_position is not None and not view.first <= my_position < view.first + view.height \
+                and self._content_end is not None:
+            if height <= 2:
+                return
+            view.resize(height - 2)
+        visible = view.visible()
+        
+        self.write('=' * 40, 'bold')
+        self.write(f"LEADERBOARD ({visible[0][0] + 1}-{visible[-1][0] + 1} of {len(leaderboard)})", 'bold')
+        self.write('=' * 40, 'bold')
+        
+        shown = set()
+        for position, player in visible:
+            shown.add(player['username'])
+            self.write(self.format_leaderboard_row(position, player))
         
-        for i, player in enumerate(leaderboard[:10], 1):
-            rank_color = self.colors['yellow'] if i == 1 else self.colors['white']
-            print(f"{rank_color}{i:2d}. {player['username']:<15} {player['score']:>5} pts{self.colors['reset']}")
+        # Luôn cho người chơi thấy dòng của mình
+        if my_position is not None and view.username not in shown:
+            self.write(f"{self.colors['white']}   ...{self.colors['reset']}")
+            self.write(self.format_leaderboard_row(my_position, leaderboard[my_position]))
         
-        print()
+        self.write()
+    
+    def format_leaderboard_row(self, position: int, player: dict) -> str:
+        """Một dòng bảng xếp hạng có màu"""
+        view = self.leaderboard_view
+        if player['username'] == view.username:
+            color = self.colors['green'] + self.colors['bold']
+        elif position == view.selected:
+            color = self.colors['cyan']
+        elif position == 0:
+            color = self.colors['yellow']
+        else:
+            color = self.colors['white']
+        return f"{color}{format_row(position, player)}{self.colors['reset']}"
     
     def display_final_results(self, results: dict):
         """Hiển thị kết quả cuối cùng"""
-        print(f"{self.colors['bold']}{'='*50}")
-        print(f"GAME ENDED")
-        print(f"{'='*50}{self.colors['reset']}")
+        self.write('=' * 50, 'bold')
+        self.write("GAME ENDED", 'bold')
+        self.write('=' * 50, 'bold')
         
         winner = results.get('winner', 'Unknown')
         winner_score = results.get('winner_score', 0)
         
-        print(f"{self.colors['yellow']}🏆 Winner: {winner} ({winner_score} points){self.colors['reset']}")
-        print()
+        self.write(f"{self.colors['yellow']}🏆 Winner: {winner} ({winner_score} points){self.colors['reset']}")
+        self.write()
         
         # Hiển thị kết quả tất cả người chơi
         players = results.get('players', [])
         for player in players:
             color = self.colors['yellow'] if player['username'] == winner else self.colors['white']
-            print(f"{color}{player['username']}: {player['score']} points "
-                  f"({player['correct_answers']} correct, {player['wrong_answers']} wrong){self.colors['reset']}")
+            global_rank = f" - global rank #{player['global_rank']}" if player.get('global_rank') else ""
+            self.write(f"{color}{player['username']}: {player['score']} points "
+                  f"({player['correct_answers']} correct, {player['wrong_answers']} wrong)"
+                  f"{global_rank}{self.colors['reset']}")
         
-        print()
+        self.write()
     
     def _input_loop(self):
         """Vòng lặp xử lý input"""
         while self.running:
             try:
                 # Hiển thị prompt và đợi input
-                print(f"{self.colors['green']}>>> {self.colors['reset']}", end='', flush=True)
+                with self._render_lock:
+                    self.screen.show_prompt()
                 user_input = input().strip()
                 if user_input:
                     self.process_command(user_input)
             except (EOFError, KeyboardInterrupt):
                 break
             except Exception as e:
-                print(f"Input error: {e}")
+                self.show_message(f"Input error: {e}", "error")
     
     def process_command(self, command: str):
         """Xử lý lệnh từ người dùng"""
+        query = command[len('find'):].strip()
         command = command.lower()
         state = self.view_model.get_state()
         
@@ -282,6 +376,9 @@ class ConsoleInterface(UIBase):
             else:
                 self.show_message("Not in a room", "warning")
         
+        elif command in ('top', 'me', 'up', 'down') or command.startswith('find '):
+            self.process_leaderboard_command(command, query)
+        
         elif state == ClientState.PLAYING and self.current_question:
             # Xử lý đáp án
             self.process_answer(command)
@@ -289,6 +386,27 @@ class ConsoleInterface(UIBase):
         else:
             self.show_message(f"Unknown command: {command}", "warning")
     
+    def process_leaderboard_command(self, command: str, query: str):
+        """Cuộn hoặc tìm kiếm trong bảng xếp hạng"""
+        view = self.leaderboard_view
+        if not self.leaderboard:
+            self.show_message("Leaderboard is empty", "warning")
+            return
+        
+        if command == 'top':
+            view.moveto(0)
+        elif command == 'me':
+            if not view.scroll_to_me():
+                self.show_message("You are not on the leaderboard yet", "warning")
+                return
+        elif command in ('up', 'down'):
+            view.page(-1 if command == 'up' else 1)
+        elif view.search(query) is None:
+            self.show_message(f"No player matching: {query}", "warning")
+            return
+        
+        self.render()
+    
     def process_answer(self, answer: str):
         """Xử lý đáp án từ người dùng"""
         if not self.current_question:
@@ -311,27 +429,25 @@ class ConsoleInterface(UIBase):
     def show_message(self, message: str, message_type: str = "info"):
         """Hiển thị thông báo"""
         colors = {
-            'info': self.colors['blue'],
-            'warning': self.colors['yellow'],
-            'error': self.colors['red'],
-            'success': self.colors['green']
+            'info': 'blue',
+            'warning': 'yellow',
+            'error': 'red',
+            'success': 'green'
         }
         
-        color = colors.get(message_type, self.colors['white'])
-        print(f"{color}[{message_type.upper()}] {message}{self.colors['reset']}")
+        self.messages.append((colors.get(message_type, 'white'), f"[{message_type.upper()}] {message}"))
+        self.render()
     
     # UI Event Handlers
     def on_state_changed(self, new_state: str):
         """Xử lý thay đổi trạng thái"""
-        # Chỉ hiển thị thông báo, không clear screen
         self.show_message(f"State changed to: {new_state}", "info")
     
     def on_question_received(self, question_data: dict):
         """Xử lý nhận câu hỏi"""
         self.current_question = question_data
-        # Clear screen và hiển thị câu hỏi mới
-        self.clear_screen()
-        self.draw_interface()
+        self.render()
+        self.view_model.mark_question_rendered()
     
     def on_score_updated(self, results: dict):
         """Xử lý cập nhật điểm"""
@@ -341,21 +457,15 @@ class ConsoleInterface(UIBase):
     def on_leaderboard_updated(self, leaderboard: list):
         """Xử lý cập nhật bảng xếp hạng"""
         self.leaderboard = leaderboard
-        # Clear screen và vẽ lại để hiển thị leaderboard mới
-        self.clear_screen()
-        self.draw_interface()
+        self.render()
     
     def on_game_started(self, data: dict):
         """Xử lý bắt đầu game"""
         self.show_message("Game started!", "success")
-        self.clear_screen()
-        self.draw_interface()
     
     def on_game_ended(self, final_results: dict):
         """Xử lý kết thúc game"""
         self.show_message("Game ended!", "info")
-        self.clear_screen()
-        self.draw_interface()
     
     def on_error_occurred(self, error_message: str):
         """Xử lý lỗi"""
@@ -363,4 +473,8 @@ class ConsoleInterface(UIBase):
     
     def on_info_received(self, info_message: str):
         """Xử lý thông tin"""
-        self.show_message(info_message, "info") 
\ No newline at end of file
+        self.show_message(info_message, "info")
+    
+    def on_latency_updated(self, stats: dict):
+        """Xử lý số đo độ trễ mới"""
+        self.render()
\ No newline at end of file
@@ -0,0 +1,41 @@
+"""
+Theo dõi vùng giao diện cần vẽ lại cho Fastest Finger First
+Các sự kiện từ ViewModel (thread điều phối) chỉ đánh dấu vùng bị thay đổi;
+UI gộp lại và vẽ một lần mỗi khung hình trên thread giao diện
+"""
+
+import threading
+from typing import Set
+
+class DirtyTracker:
+    """Tập các vùng cần vẽ lại, an toàn khi dùng từ nhiều thread"""
+    
+    def __init__(self):
+        self._dirty: Set[str] = set()
+        self._scheduled = False
+        self._lock = threading.Lock()
+    
+    def mark(self, *regions: str) -> bool:
+        """Đánh dấu vùng cần vẽ lại
+        
+        Trả về True nếu đây là lần đánh dấu đầu tiên kể từ lần vẽ trước, tức
+        bên gọi cần hẹn một lần vẽ; các lần đánh dấu sau được gộp vào lần đó.
+        """
+        with self._lock:
+            self._dirty.update(regions)
+            if self._scheduled:
+                return False
+            self._scheduled = True
+            return True
+    
+    def take(self) -> Set[str]:
+        """Lấy và xóa các vùng cần vẽ (gọi trên thread giao diện khi vẽ)"""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            self._scheduled = False
+            return dirty
+    
+    def is_dirty(self, region: str) -> bool:
+        """Kiểm tra một vùng có đang chờ vẽ lại không"""
+        with self._lock:
+            return region in self._dirty
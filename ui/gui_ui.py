@@ -4,10 +4,14 @@ GUI Interface Fastest Finger First sử dụng Tkinter
 
 import tkinter as tk
 from tkinter import ttk, messagebox
-import threading
-import time
 from ui.ui_base import UIBase
-from client.config import ClientState
+from ui.dirty_tracker import DirtyTracker
+from ui.leaderboard_view import LeaderboardView
+from ui.leaderboard_widget import LeaderboardWidget
+from client.config import ClientState, GUI_FRAME_INTERVAL_MS
+
+# Các vùng giao diện được vẽ lại độc lập
+REGIONS = ('status', 'question', 'leaderboard', 'latency')
 
 class GUIInterface(UIBase):
     """Giao diện GUI cho game"""
@@ -15,11 +19,15 @@ class GUIInterface(UIBase):
     def __init__(self, view_model):
         super().__init__(view_model)
         self.root = None
-        self.update_thread = None
         self.status_label = None
         self.question_label = None
+        self.latency_label = None
         self.answer_var = None
-        self.leaderboard_text = None
+        self.leaderboard_widget = None
+        
+        # Chỉ vẽ lại vùng có thay đổi, tối đa một lần mỗi khung hình
+        self.dirty = DirtyTracker()
+        self._rendered = {}
     
     def start(self):
         """Khởi động GUI"""
@@ -27,9 +35,9 @@ class GUIInterface(UIBase):
         self.setup_gui()
         self.running = True
         
-        # Khởi động update thread
-        self.update_thread = threading.Thread(target=self._update_loop, daemon=True)
-        self.update_thread.start()
+        # Vẽ lần đầu, sau đó chỉ vẽ khi ViewModel báo thay đổi
+        self.dirty.take()
+        self.invalidate(*REGIONS)
         
         # Chạy GUI
         self.root.mainloop()
@@ -53,6 +61,10 @@ class GUIInterface(UIBase):
         self.status_label = ttk.Label(main_frame, text="Disconnected", font=("Arial", 12))
         self.status_label.grid(row=0, column=0, columnspan=2, pady=5)
         
+        # Độ trễ của đáp án gần nhất
+        self.latency_label = ttk.Label(main_frame, text="", font=("Arial", 9))
+        self.latency_label.grid(row=5, column=0, columnspan=2, pady=2)
+        
         # Question area
         question_frame = ttk.LabelFrame(main_frame, text="Question", padding="10")
         question_frame.grid(row=1, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=5)
@@ -76,8 +88,8 @@ class GUIInterface(UIBase):
         leaderboard_frame = ttk.LabelFrame(main_frame, text="Leaderboard", padding="10")
         leaderboard_frame.grid(row=3, column=0, columnspan=2, sticky=(tk.W, tk.E, tk.N, tk.S), pady=5)
         
-        self.leaderboard_text = tk.Text(leaderboard_frame, height=8, width=50)
-        self.leaderboard_text.pack()
+        self.leaderboard_widget = LeaderboardWidget(leaderboard_frame, LeaderboardView())
+        self.leaderboard_widget.frame.pack(fill=tk.BOTH, expand=True)
         
         # Buttons
         button_frame = ttk.Frame(main_frame)
@@ -88,41 +100,70 @@ class GUIInterface(UIBase):
         ttk.Button(button_frame, text="Leave Room", command=self.leave_room).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="Quit", command=self.stop).pack(side=tk.LEFT, padx=5)
     
-    def _update_loop(self):
-        """Vòng lặp cập nhật GUI"""
-        while self.running:
+    def invalidate(self, *regions: str):
+        """Đánh dấu vùng cần vẽ lại (gọi được từ mọi thread), hẹn một lần vẽ cho khung hình tới"""
+        if self.dirty.mark(*regions) and self.root:
+            try:
+                self.root.after(GUI_FRAME_INTERVAL_MS, self.update_gui)
+            except (RuntimeError, tk.TclError):
+                # Cửa sổ đã đóng
+                pass
+    
+    def _call_in_ui(self, func, *args):
+        """Chạy một lời gọi Tk (vd. hộp thoại) trên thread giao diện"""
+        if self.root:
             try:
-                self.root.after(0, self.update_gui)
-                time.sleep(0.1)
-            except:
-                break
+                self.root.after(0, func, *args)
+            except (RuntimeError, tk.TclError):
+                pass
     
     def update_gui(self):
-        """Cập nhật giao diện"""
+        """Vẽ lại các vùng đã bị đánh dấu (chạy trên thread giao diện)"""
         if not self.root:
             return
         
-        # Cập nhật trạng thái
-        state = self.view_model.get_state()
-        self.status_label.config(text=f"Status: {state}")
-        
-        # Cập nhật câu hỏi
+        dirty = self.dirty.take()
+        if 'status' in dirty:
+            self._set_if_changed('status', self.status_label, f"Status: {self.view_model.get_state()}")
+        if 'question' in dirty:
+            changed = self._set_if_changed('question', self.question_label, self.format_question())
+            if changed and self.view_model.get_current_question():
+                self.view_model.mark_question_rendered()
+        if 'leaderboard' in dirty:
+            self.render_leaderboard()
+        if 'latency' in dirty:
+            self._set_if_changed('latency', self.latency_label,
+                                 self.format_latency(self.view_model.get_latency_stats()))
+    
+    def _set_if_changed(self, region: str, label, text: str) -> bool:
+        """Cập nhật label chỉ khi nội dung khác lần vẽ trước"""
+        if self._rendered.get(region) == text:
+            return False
+        self._rendered[region] = text
+        label.config(text=text)
+        return True
+    
+    def format_question(self) -> str:
+        """Nội dung vùng câu hỏi"""
         question = self.view_model.get_current_question()
-        if question:
-            question_text = f"Question {question.get('question_number', '?')}: {question.get('question_text', '')}\n\n"
-            options = question.get('options', [])
-            for i, option in enumerate(options):
-                question_text += f"{chr(ord('A') + i)}. {option}\n"
-            self.question_label.config(text=question_text)
-        
-        # Cập nhật leaderboard
+        if not question:
+            return self._rendered.get('question', "Waiting for question...")
+        
+        question_text = f"Question {question.get('question_number', '?')}: {question.get('question_text', '')}\n\n"
+        options = question.get('options', [])
+        for i, option in enumerate(options):
+            question_text += f"{chr(ord('A') + i)}. {option}\n"
+        return question_text
+    
+    def render_leaderboard(self):
+        """Đưa bảng xếp hạng mới vào widget (widget chỉ vẽ lại các dòng nhìn thấy có thay đổi)"""
         leaderboard = self.view_model.get_leaderboard()
-        if leaderboard:
-            leaderboard_text = "Rank | Player | Score\n" + "-" * 30 + "\n"
-            for i, player in enumerate(leaderboard[:10], 1):
-                leaderboard_text += f"{i:2d}   | {player['username']:<10} | {player['score']:>5}\n"
-            self.leaderboard_text.delete(1.0, tk.END)
-            self.leaderboard_text.insert(1.0, leaderboard_text)
+        if self._rendered.get('leaderboard') is leaderboard:
+            return
+        self._rendered['leaderboard'] = leaderboard
+        
+        self.leaderboard_widget.view.username = self.view_model.get_username()
+        self.leaderboard_widget.set_rows(leaderboard)
     
     def submit_answer(self, event=None):
         """Gửi đáp án"""
@@ -165,37 +206,41 @@ class GUIInterface(UIBase):
     # UI Event Handlers
     def on_state_changed(self, new_state: str):
         """Xử lý thay đổi trạng thái"""
-        pass
+        self.invalidate('status', 'question')
     
     def on_question_received(self, question_data: dict):
         """Xử lý nhận câu hỏi"""
-        pass
+        self.invalidate('question')
     
     def on_score_updated(self, results: dict):
         """Xử lý cập nhật điểm"""
-        pass
+        self.invalidate('status')
     
     def on_leaderboard_updated(self, leaderboard: list):
         """Xử lý cập nhật bảng xếp hạng"""
-        pass
+        self.invalidate('leaderboard')
     
     def on_game_started(self, data: dict):
         """Xử lý bắt đầu game"""
-        messagebox.showinfo("Game Started", "The game has begun!")
+        self._call_in_ui(messagebox.showinfo, "Game Started", "The game has begun!")
     
     def on_game_ended(self, final_results: dict):
         """Xử lý kết thúc game"""
         winner = final_results.get('winner', 'Unknown')
-        messagebox.showinfo("Game Ended", f"Game ended! Winner: {winner}")
+        self._call_in_ui(messagebox.showinfo, "Game Ended", f"Game ended! Winner: {winner}")
     
     def on_error_occurred(self, error_message: str):
         """Xử lý lỗi"""
-        messagebox.showerror("Error", error_message)
+        self._call_in_ui(messagebox.showerror, "Error", error_message)
     
     def on_info_received(self, info_message: str):
         """Xử lý thông tin"""
         pass
     
+    def on_latency_updated(self, stats: dict):
+        """Xử lý số đo độ trễ mới"""
+        self.invalidate('latency')
+    
     def update(self):
         """Cập nhật UI"""
         pass 
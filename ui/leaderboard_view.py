@@ -0,0 +1,145 @@
+"""
+Bảng xếp hạng ảo hóa cho Fastest Finger First
+Chỉ dựng các dòng đang nhìn thấy nên vẫn mượt với hàng chục nghìn người chơi;
+hỗ trợ cuộn đến vị trí của mình và tìm theo tên
+"""
+
+from typing import Dict, List, Optional, Tuple
+from client.config import LEADERBOARD_VISIBLE_ROWS
+
+class LeaderboardModel:
+    """Danh sách xếp hạng cùng chỉ mục theo tên (dựng lười khi cần)"""
+    
+    def __init__(self):
+        self.rows: List[Dict] = []
+        self._positions: Optional[Dict[str, int]] = None
+        self._lower_names: Optional[List[str]] = None
+    
+    def set_rows(self, rows: List[Dict]):
+        """Thay toàn bộ danh sách (đã sắp theo hạng)"""
+        self.rows = rows
+        self._positions = None
+        self._lower_names = None
+    
+    def __len__(self) -> int:
+        return len(self.rows)
+    
+    def position_of(self, username: str) -> Optional[int]:
+        """Vị trí (từ 0) của người chơi trong danh sách"""
+        if self._positions is None:
+            self._positions = {row['username']: index for index, row in enumerate(self.rows)}
+        return self._positions.get(username)
+    
+    def find(self, query: str, start: int = 0) -> Optional[int]:
+        """Vị trí đầu tiên từ `start` (vòng lại đầu danh sách) có tên chứa `query`, không phân biệt hoa thường"""
+        query = query.strip().lower()
+        if not query or not self.rows:
+            return None
+        if self._lower_names is None:
+            self._lower_names = [row['username'].lower() for row in self.rows]
+        
+        count = len(self._lower_names)
+        start %= count
+        for index in range(start, count):
+            if query in self._lower_names[index]:
+                return index
+        for index in range(start):
+            if query in self._lower_names[index]:
+                return index
+        return None
+
+class LeaderboardView:
+    """Cửa sổ nhìn vào bảng xếp hạng: dòng đầu, số dòng hiển thị, dòng đang chọn
+    
+    Không phụ thuộc bộ công cụ giao diện (UI console không phải import tkinter);
+    widget Tk và UI console chỉ vẽ các dòng do `visible()` trả về.
+    """
+    
+    def __init__(self, height: int = LEADERBOARD_VISIBLE_ROWS, username: Optional[str] = None):
+        self.model = LeaderboardModel()
+        self.height = height
+        self.username = username
+        self.first = 0
+        self.selected: Optional[int] = None
+        self.follow_me = False  # Giữ dòng của mình trong tầm nhìn khi bảng thay đổi
+    
+    def set_rows(self, rows: List[Dict]):
+        """Cập nhật dữ liệu, giữ vị trí cuộn (hoặc bám theo dòng của mình)"""
+        selected_name = self.model.rows[self.selected]['username'] if self.selected is not None \
+            and self.selected < len(self.model) else None
+        self.model.set_rows(rows)
+        
+        # Dòng đang chọn đi theo người chơi, không theo số thứ tự
+        self.selected = self.model.position_of(selected_name) if selected_name else None
+        if self.follow_me and self.scroll_to_me():
+            return
+        self.first = self._clamp(self.first)
+    
+    def resize(self, height: int):
+        """Đổi số dòng hiển thị (vd. theo chỗ trống còn lại trên terminal)"""
+        height = max(1, height)
+        if height == self.height:
+            return
+        self.height = height
+        if self.follow_me and self.scroll_to_me():
+            return
+        self.first = self._clamp(self.first)
+    
+    def _clamp(self, first: int) -> int:
+        """Giới hạn dòng đầu trong khoảng hợp lệ"""
+        return max(0, min(first, len(self.model) - self.height))
+    
+    def visible(self) -> List[Tuple[int, Dict]]:
+        """Các dòng đang nhìn thấy kèm vị trí"""
+        end = min(self.first + self.height, len(self.model))
+        return [(index, self.model.rows[index]) for index in range(self.first, end)]
+    
+    def scroll(self, delta: int):
+        """Cuộn `delta` dòng (âm là lên trên)"""
+        self.follow_me = False
+        self.first = self._clamp(self.first + delta)
+    
+    def page(self, pages: int):
+        """Cuộn theo trang"""
+        self.scroll(pages * self.height)
+    
+    def moveto(self, fraction: float):
+        """Cuộn đến vị trí tỉ lệ (0-1) của danh sách, dùng cho thanh cuộn"""
+        self.follow_me = False
+        self.first = self._clamp(int(fraction * len(self.model)))
+    
+    def scroll_to(self, index: int):
+        """Cuộn để dòng `index` nằm giữa vùng nhìn thấy"""
+        self.first = self._clamp(index - self.height // 2)
+    
+    def scroll_to_me(self) -> bool:
+        """Cuộn đến dòng của mình, False nếu không có trong bảng"""
+        if not self.username:
+            return False
+        position = self.model.position_of(self.username)
+        if position is None:
+            return False
+        self.follow_me = True
+        self.scroll_to(position)
+        return True
+    
+    def search(self, query: str) -> Optional[int]:
+        """Tìm người chơi tiếp theo có tên chứa `query` và cuộn đến đó"""
+        start = self.selected + 1 if self.selected is not None else 0
+        position = self.model.find(query, start)
+        if position is not None:
+            self.follow_me = False
+            self.selected = position
+            self.scroll_to(position)
+        return position
+    
+    def scroll_fraction(self) -> Tuple[float, float]:
+        """Phần đang nhìn thấy (đầu, cuối) theo tỉ lệ, dùng cho thanh cuộn"""
+        total = len(self.model)
+        if total == 0:
+            return 0.0, 1.0
+        return self.first / total, min(1.0, (self.first + self.height) / total)
+
+def format_row(position: int, row: Dict) -> str:
+    """Một dòng bảng xếp hạng dạng chữ"""
+    return f"{row.get('rank', position + 1):>6}  {row['username']:<20.20} {row['score']:>7}"
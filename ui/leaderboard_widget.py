@@ -0,0 +1,105 @@
+"""
+Widget Tk cho bảng xếp hạng ảo hóa
+"""
+
+import tkinter as tk
+from tkinter import ttk
+from typing import Dict, List, Tuple
+from ui.leaderboard_view import LeaderboardView, format_row
+
+class LeaderboardWidget:
+    """Widget Tk cho LeaderboardView: một nhóm label cố định tái sử dụng khi cuộn"""
+    
+    def __init__(self, parent, view: LeaderboardView):
+        self.view = view
+        self.frame = ttk.Frame(parent)
+        
+        # Thanh tìm kiếm
+        search_frame = ttk.Frame(self.frame)
+        search_frame.pack(fill=tk.X)
+        self.search_var = tk.StringVar()
+        search_entry = ttk.Entry(search_frame, textvariable=self.search_var, width=20)
+        search_entry.pack(side=tk.LEFT, padx=(0, 5))
+        search_entry.bind('<Return>', lambda event: self.search())
+        ttk.Button(search_frame, text="Find", command=self.search).pack(side=tk.LEFT)
+        ttk.Button(search_frame, text="Me", command=self.scroll_to_me).pack(side=tk.LEFT, padx=5)
+        
+        # Các dòng hiển thị và thanh cuộn
+        body = ttk.Frame(self.frame)
+        body.pack(fill=tk.BOTH, expand=True)
+        self.scrollbar = ttk.Scrollbar(body, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        rows_frame = ttk.Frame(body)
+        rows_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        
+        self.labels = []
+        self._slots: List[Tuple[str, str]] = []
+        for _ in range(view.height):
+            label = tk.Label(rows_frame, text="", anchor=tk.W, font=("Courier", 10))
+            label.pack(fill=tk.X)
+            self.labels.append(label)
+            self._slots.append(("", ""))
+        
+        for widget in [rows_frame] + self.labels:
+            widget.bind('<MouseWheel>', self._on_mousewheel)
+            widget.bind('<Button-4>', lambda event: self._scroll(-1))
+            widget.bind('<Button-5>', lambda event: self._scroll(1))
+    
+    def set_rows(self, rows: List[Dict]):
+        """Cập nhật dữ liệu và vẽ lại các dòng nhìn thấy"""
+        self.view.set_rows(rows)
+        self.render()
+    
+    def render(self):
+        """Vẽ các dòng nhìn thấy, chỉ cập nhật label có nội dung hoặc kiểu thay đổi"""
+        visible = self.view.visible()
+        for slot, label in enumerate(self.labels):
+            if slot < len(visible):
+                position, row = visible[slot]
+                text = format_row(position, row)
+                if row['username'] == self.view.username:
+                    style = 'me'
+                elif position == self.view.selected:
+                    style = 'selected'
+                else:
+                    style = ''
+            else:
+                text, style = "", ""
+            
+            if self._slots[slot] != (text, style):
+                self._slots[slot] = (text, style)
+                background = {'me': '#fff3b0', 'selected': '#cde8ff'}.get(style, self.frame.winfo_toplevel().cget('bg'))
+                label.config(text=text, bg=background)
+        
+        self.scrollbar.set(*self.view.scroll_fraction())
+    
+    def search(self):
+        """Tìm theo tên trong ô tìm kiếm"""
+        if self.view.search(self.search_var.get()) is not None:
+            self.render()
+    
+    def scroll_to_me(self):
+        """Cuộn đến dòng của mình"""
+        if self.view.scroll_to_me():
+            self.render()
+    
+    def _scroll(self, delta: int):
+        """Cuộn và vẽ lại"""
+        self.view.scroll(delta)
+        self.render()
+    
+    def _on_mousewheel(self, event):
+        """Cuộn bằng con lăn chuột (Windows/macOS)"""
+        self._scroll(-1 if event.delta > 0 else 1)
+    
+    def _on_scrollbar(self, *args):
+        """Xử lý lệnh từ thanh cuộn ('moveto' hoặc 'scroll')"""
+        if args[0] == 'moveto':
+            self.view.moveto(float(args[1]))
+        elif args[0] == 'scroll':
+            amount = int(args[1])
+            if args[2] == 'pages':
+                self.view.page(amount)
+            else:
+                self.view.scroll(amount)
+        self.render()
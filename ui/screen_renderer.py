@@ -0,0 +1,112 @@
+"""
+Bộ vẽ màn hình console cho Fastest Finger First
+Giữ khung hình trước, so sánh với khung mới và chỉ ghi các dòng thay đổi bằng
+lệnh di chuyển con trỏ ANSI, gộp trong một lần ghi (không gọi `clear`)
+"""
+
+import sys
+import shutil
+from typing import List, Optional, TextIO
+
+# Mã điều khiển ANSI
+CSI = '\033['
+RESET = CSI + '0m'
+CLEAR_SCREEN = CSI + 'H' + CSI + '2J'
+CLEAR_LINE = CSI + 'K'
+CLEAR_BELOW = CSI + 'J'
+SAVE_CURSOR = '\0337'
+RESTORE_CURSOR = '\0338'
+
+def move_to(row: int, column: int = 1) -> str:
+    """Lệnh đưa con trỏ đến dòng/cột (tính từ 1)"""
+    return f"{CSI}{row};{column}H"
+
+class ScreenRenderer:
+    """Mô hình màn hình theo dòng
+    
+    Mỗi khung hình được dựng bằng `begin_frame()` / `line()` rồi `present()`.
+    Khung hình luôn bắt đầu ở góc trên màn hình; dòng nhắc lệnh nằm ngay dưới.
+    Khi chiều cao khung không đổi, con trỏ (và phần người chơi đang gõ) được
+    giữ nguyên sau khi vẽ.
+    """
+    
+    def __init__(self, stream: Optional[TextIO] = None, height: Optional[int] = None, prompt: str = ""):
+        self.stream = stream or sys.stdout
+        self.height = height  # None: lấy theo kích thước terminal
+        self.prompt = prompt
+        self._previous: List[str] = []
+        self._lines: List[str] = []
+        self._full_redraw = True
+    
+    def invalidate(self):
+        """Buộc vẽ lại toàn bộ ở lần present tiếp theo"""
+        self._full_redraw = True
+    
+    def begin_frame(self):
+        """Bắt đầu dựng khung hình mới"""
+        self._lines = []
+    
+    def line(self, text: str = ""):
+        """Thêm một (hoặc nhiều, nếu có xuống dòng) dòng vào khung hình"""
+        self._lines.extend(text.split('\n'))
+    
+    def line_count(self) -> int:
+        """Số dòng đã có trong khung hình đang dựng"""
+        return len(self._lines)
+    
+    def cut(self, start: int) -> List[str]:
+        """Lấy ra các dòng từ vị trí `start` (bỏ khỏi khung hình đang dựng)"""
+        lines = self._lines[start:]
+        del self._lines[start:]
+        return lines
+    
+    def truncate(self, rows: int):
+        """Chỉ giữ `rows` dòng đầu của khung hình đang dựng"""
+        del self._lines[max(0, rows):]
+    
+    def max_rows(self) -> int:
+        """Số dòng tối đa của khung, chừa dòng nhắc lệnh và một dòng cho Enter để terminal không cuộn"""
+        height = self.height or shutil.get_terminal_size(fallback=(80, 24)).lines
+        return max(1, height - 2)
+    
+    def present(self) -> int:
+        """Ghi phần khác biệt so với khung trước, trả về số ký tự đã ghi"""
+        # Phòng khi bên dựng khung không tự co nội dung theo max_rows()
+        lines = self._lines[:self.max_rows()]
+        previous = [] if self._full_redraw else self._previous
+        
+        out = []
+        for row, text in enumerate(lines):
+            if row >= len(previous) or previous[row] != text:
+                out.append(move_to(row + 1) + text + RESET + CLEAR_LINE)
+        
+        if self._full_redraw:
+            out.insert(0, CLEAR_SCREEN)
+        
+        if self._full_redraw or len(lines) != len(previous):
+            # Dòng nhắc lệnh đổi chỗ: xóa phần thừa của khung cũ và vẽ lại dòng nhắc
+            out.append(move_to(len(lines) + 1) + CLEAR_BELOW + self.prompt)
+        elif out:
+            # Giữ nguyên vị trí con trỏ để không làm mất phần đang gõ
+            out.insert(0, SAVE_CURSOR)
+            out.append(RESTORE_CURSOR)
+        
+        self._previous = lines
+        self._full_redraw = False
+        return self._write(''.join(out))
+    
+    def show_prompt(self):
+        """Vẽ lại dòng nhắc lệnh (sau khi người chơi nhấn Enter)"""
+        self._write(move_to(len(self._previous) + 1) + CLEAR_BELOW + self.prompt)
+    
+    def release(self):
+        """Đưa con trỏ xuống dưới khung hình để in tiếp bình thường"""
+        self._write(move_to(len(self._previous) + 1) + CLEAR_BELOW)
+        self.invalidate()
+    
+    def _write(self, data: str) -> int:
+        """Ghi một lần và flush"""
+        if data:
+            self.stream.write(data)
+            self.stream.flush()
+        return len(data)
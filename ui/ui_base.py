@@ -89,5 +89,19 @@ class UIBase(ABC):
     
     def show_message(self, message: str, message_type: str = "info"):
         """Hiển thị thông báo"""
-        pass 
+        pass
+    
+    def on_latency_updated(self, stats: dict):
+        """Xử lý số đo độ trễ mới của đáp án vừa gửi"""
+        pass
+    
+    def format_latency(self, stats: dict) -> str:
+        """Một dòng HUD độ trễ: phản xạ, vẽ, mạng (ước lượng một chiều) và thời gian server ghi nhận"""
+        if not stats:
+            return ""
+        text = (f"Reaction {stats['reaction_ms']:.0f} ms | Render {stats['render_ms']:.0f} ms | "
+                f"Network ~{stats['one_way_ms']:.0f} ms one-way")
+        if stats.get('server_response_ms') is not None:
+            text += f" | Server time {stats['server_response_ms'] / 1000:.2f} s"
+        return text
 